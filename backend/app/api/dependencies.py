@@ -1,34 +1,176 @@
 from functools import lru_cache
+from typing import Optional
 from fastapi import Depends
 from app.config import settings
+from app.core.admission import AdmissionController
+from app.core.ann_index import AnnVectorSearcher, load_ann_searcher
+from app.core.context_compressor import ContextCompressor
 from app.core.elasticsearch_client import ElasticsearchClient
+from app.core.memory_store import InMemorySearchClient
 from app.core.embedding_service import EmbeddingService
 from app.core.llm_service import LLMService
 from app.core.groq_service import GroqService
+from app.core.llm_router import LLMRouter
+from app.core.reranker import CrossEncoderReranker
 from app.core.retriever import HybridRetriever
+from app.core.single_flight import SingleFlight
+from app.core.validation_dispatcher import JudgeDispatcher, ValidationDispatcher
+from app.utils.llm_judge import LLMJudge
+from app.utils.query_analysis import IntentCentroids
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 
 @lru_cache()
 def get_elasticsearch_client() -> ElasticsearchClient:
+    """Returns the search backend selected by SEARCH_BACKEND"""
+    if settings.SEARCH_BACKEND == "memory":
+        return InMemorySearchClient()
     return ElasticsearchClient()
 
 
+@lru_cache()
+def get_ann_searcher() -> Optional[AnnVectorSearcher]:
+    return load_ann_searcher(get_elasticsearch_client())
+
+
 @lru_cache()
 def get_embedding_service() -> EmbeddingService:
     return EmbeddingService()
 
 
+@lru_cache()
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    if not settings.RERANKER_ENABLED:
+        return None
+    return CrossEncoderReranker()
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    return AdmissionController()
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+@lru_cache()
+def get_validation_dispatcher() -> ValidationDispatcher:
+    return ValidationDispatcher()
+
+
+@lru_cache()
+def get_judge_dispatcher() -> Optional[JudgeDispatcher]:
+    if not settings.LLM_JUDGE_ENABLED:
+        return None
+    return JudgeDispatcher(LLMJudge(get_llm_service()))
+
+
+@lru_cache()
+def get_intent_centroids() -> Optional[IntentCentroids]:
+    if not settings.INTENT_CENTROIDS_ENABLED:
+        return None
+    return IntentCentroids(get_embedding_service())
+
+
+@lru_cache()
+def get_context_compressor() -> ContextCompressor:
+    if settings.CONTEXT_COMPRESSION == "embedding":
+        return ContextCompressor(embedding_service=get_embedding_service())
+    return ContextCompressor()
+
+
 @lru_cache()
 def get_llm_service():
     """Returns the appropriate LLM service based on LLM_PROVIDER setting"""
+    compressor = get_context_compressor()
+    if settings.LLM_ROUTING_ENABLED:
+        return LLMRouter(
+            providers={
+                "groq": GroqService(compressor=compressor),
+                "ollama": LLMService(compressor=compressor),
+            },
+            preferred=settings.LLM_PROVIDER,
+        )
     if settings.LLM_PROVIDER == "groq":
-        return GroqService()
+        return GroqService(compressor=compressor)
     else:
-        return LLMService()
+        return LLMService(compressor=compressor)
 
 
 def get_hybrid_retriever(
     es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
+    ann_searcher: Optional[AnnVectorSearcher] = Depends(get_ann_searcher),
+    reranker: Optional[CrossEncoderReranker] = Depends(get_reranker),
+    admission: AdmissionController = Depends(get_admission_controller),
 ) -> HybridRetriever:
-    return HybridRetriever(es_client=es_client, embedding_service=embedding_service)
+    return HybridRetriever(
+        es_client=es_client,
+        embedding_service=embedding_service,
+        ann_searcher=ann_searcher,
+        reranker=reranker,
+        admission=admission,
+    )
+
+
+async def warmup_services():
+    """
+    Builds the shared singletons and warms them before traffic arrives.
+
+    The embedding model is required; an unreachable search backend or LLM
+    only logs a warning so the API can still start.
+    """
+    logger.info("Preloading embedding model...")
+    query_embedding = get_embedding_service().warmup()
+    logger.info("Embedding model preloaded successfully")
+
+    try:
+        await get_elasticsearch_client().warmup(query_embedding)
+        get_ann_searcher()
+        logger.info("Search backend warmed up")
+    except Exception as e:
+        logger.warning(f"Search backend warm-up failed: {str(e)}")
+
+    reranker = get_reranker()
+    if reranker:
+        reranker.initialize()
+
+    get_context_compressor()
+    get_intent_centroids()
+
+    try:
+        await get_llm_service().warmup()
+        logger.info("LLM connection warmed up")
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {str(e)}")
+
+
+async def close_services():
+    """Closes the singletons built by the providers above"""
+    if get_judge_dispatcher.cache_info().currsize and get_judge_dispatcher():
+        await get_judge_dispatcher().stop()
+    if get_llm_service.cache_info().currsize:
+        await get_llm_service().close()
+    if get_elasticsearch_client.cache_info().currsize:
+        await get_elasticsearch_client().close()
+    if get_embedding_service.cache_info().currsize:
+        get_embedding_service().close()
+    if get_validation_dispatcher.cache_info().currsize:
+        get_validation_dispatcher().shutdown()
+
+    for provider in (
+        get_judge_dispatcher,
+        get_validation_dispatcher,
+        get_llm_service,
+        get_context_compressor,
+        get_intent_centroids,
+        get_reranker,
+        get_embedding_service,
+        get_ann_searcher,
+        get_elasticsearch_client,
+    ):
+        provider.cache_clear()
@@ -1,18 +1,141 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from time import time
+from typing import Any, Dict, List
+import asyncio
 import json
-from app.models.schemas import QueryRequest, QueryResponse, Source
-from app.api.dependencies import get_hybrid_retriever, get_llm_service
+from app.config import settings
+from app.models.schemas import (
+    BatchQueryRequest,
+    QueryRequest,
+    QueryResponse,
+    Source,
+)
+from app.api.dependencies import (
+    get_admission_controller,
+    get_hybrid_retriever,
+    get_intent_centroids,
+    get_judge_dispatcher,
+    get_llm_service,
+    get_single_flight,
+    get_validation_dispatcher,
+)
+from app.core.admission import AdmissionController, OverloadedError
+from app.core.metrics import current_endpoint
 from app.core.retriever import HybridRetriever
 from app.core.llm_service import LLMService
+from app.core.single_flight import SingleFlight, normalize_query
+from app.core.tracing import tracer
 from app.utils.logger import setup_logger
-from app.utils.intent_detector import detect_intent
-from app.utils.validators import AnswerValidator
+from app.utils.query_analysis import QueryAnalysis, analyze_query, resolve_template
 
 logger = setup_logger(__name__)
 router = APIRouter()
-validator = AnswerValidator()
+
+
+def _coalescing_key(request: QueryRequest, retriever: HybridRetriever) -> tuple:
+    """Requests with equal keys get the same retrieval and answer"""
+    return (
+        normalize_query(request.query),
+        request.top_k,
+        request.prompt_template,
+        request.filters.model_dump_json() if request.filters else None,
+        retriever.es_client.generation,
+    )
+
+
+def _source_dict(chunk_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "document_id": chunk_data.get("document_id", "unknown"),
+        "title": chunk_data.get("title", "Unknown"),
+        "chunk_id": chunk_data.get("chunk_id", "unknown"),
+        "content": chunk_data.get("content", ""),
+        "page_number": chunk_data.get("page_number"),
+        "section_type": chunk_data.get("section_type"),
+        "score": chunk_data.get("score", 0.0),
+    }
+
+
+def _validate(
+    answer: str,
+    query: str,
+    retrieved_chunks: List[Dict[str, Any]],
+    analysis: QueryAnalysis,
+):
+    """Queue Layer 1 & 2 (and sampled Layer 3) validation; results are logged"""
+    context_texts = [chunk.get("content", "") for chunk in retrieved_chunks]
+    get_validation_dispatcher().submit(answer, query, context_texts, analysis)
+
+    judge = get_judge_dispatcher()
+    if judge:
+        judge.submit(answer, query, context_texts)
+
+
+async def _answer_from_chunks(
+    request: QueryRequest,
+    analysis: QueryAnalysis,
+    retrieved_chunks: List[Dict[str, Any]],
+    retrieval_time: float,
+    llm_service: LLMService,
+    admission: AdmissionController,
+) -> Dict[str, Any]:
+    """Generation for one query whose retrieval is done"""
+    if not retrieved_chunks:
+        return {
+            "answer": "No relevant documents found for your query.",
+            "chunks": [],
+            "retrieval_time": retrieval_time,
+            "generation_time": 0,
+        }
+
+    # Auto-detect intent if using default template
+    template = resolve_template(
+        request.prompt_template, analysis, get_intent_centroids()
+    )
+
+    generation_start = time()
+    with tracer.span("generate", template=template):
+        async with admission.stage("llm").slot():
+            answer = await llm_service.generate_answer(
+                query=request.query,
+                context_chunks=retrieved_chunks,
+                prompt_template=template,
+                analysis=analysis,
+            )
+    generation_time = time() - generation_start
+
+    _validate(answer, request.query, retrieved_chunks, analysis)
+
+    return {
+        "answer": answer,
+        "chunks": retrieved_chunks,
+        "retrieval_time": retrieval_time,
+        "generation_time": generation_time,
+    }
+
+
+def _query_response(
+    request: QueryRequest, result: Dict[str, Any], start_time: float
+) -> QueryResponse:
+    sources = []
+    if request.include_sources:
+        for chunk_data in result["chunks"]:
+            sources.append(Source(**_source_dict(chunk_data)))
+
+    total_time = time() - start_time
+
+    logger.info(
+        f"Query completed in {total_time:.2f}s (retrieval: {result['retrieval_time']:.2f}s, generation: {result['generation_time']:.2f}s)"
+    )
+
+    return QueryResponse(
+        query=request.query,
+        answer=result["answer"],
+        sources=sources,
+        retrieval_time=result["retrieval_time"],
+        generation_time=result["generation_time"],
+        total_time=total_time,
+    )
 
 
 @router.post("/", response_model=QueryResponse)
@@ -20,13 +143,20 @@ async def query_documents(
     request: QueryRequest,
     retriever: HybridRetriever = Depends(get_hybrid_retriever),
     llm_service: LLMService = Depends(get_llm_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+    single_flight: SingleFlight = Depends(get_single_flight),
 ):
-    try:
-        start_time = time()
+    current_endpoint.set("query")
+
+    async def answer_query() -> Dict[str, Any]:
+        analysis = analyze_query(request.query)
 
         retrieval_start = time()
         retrieved_chunks = await retriever.hybrid_search(
-            query=request.query, top_k=request.top_k
+            query=request.query,
+            top_k=request.top_k,
+            analysis=analysis,
+            filters=request.filters,
         )
         retrieval_time = time() - retrieval_start
 
@@ -34,77 +164,96 @@ async def query_documents(
             f"Retrieved {len(retrieved_chunks)} chunks in {retrieval_time:.2f}s"
         )
 
-        if not retrieved_chunks:
-            return QueryResponse(
-                query=request.query,
-                answer="No relevant documents found for your query.",
-                sources=[],
-                retrieval_time=retrieval_time,
-                generation_time=0,
-                total_time=time() - start_time,
-            )
+        return await _answer_from_chunks(
+            request, analysis, retrieved_chunks, retrieval_time, llm_service, admission
+        )
 
-        # Auto-detect intent if using default template
-        template = request.prompt_template
-        if template == "default":
-            template = detect_intent(request.query)
-            logger.info(f"Auto-detected intent: {template}")
+    try:
+        start_time = time()
 
-        generation_start = time()
-        answer = await llm_service.generate_answer(
-            query=request.query,
-            context_chunks=retrieved_chunks,
-            prompt_template=template,
-        )
-        generation_time = time() - generation_start
+        if settings.COALESCE_QUERIES:
+            key = _coalescing_key(request, retriever)
+            result = await single_flight.run(key, answer_query)
+        else:
+            result = await answer_query()
 
-        # Validate answer (Layer 1 & 2)
-        context_texts = [chunk.get("content", "") for chunk in retrieved_chunks]
-        validation_results = validator.validate_all(
-            answer=answer, question=request.query, context_chunks=context_texts
-        )
+        return _query_response(request, result, start_time)
 
-        # Log validation results
-        validator.log_validation_results(validation_results, request.query)
-
-        # Add validation warnings to response metadata
-        failures = validator.get_failures(validation_results)
-        if failures:
-            logger.warning(f"Answer validation detected {len(failures)} issue(s)")
-
-        sources = []
-        if request.include_sources:
-            for chunk_data in retrieved_chunks:
-                sources.append(
-                    Source(
-                        document_id=chunk_data.get("document_id", "unknown"),
-                        title=chunk_data.get("title", "Unknown"),
-                        chunk_id=chunk_data.get("chunk_id", "unknown"),
-                        content=chunk_data.get("content", ""),
-                        page_number=chunk_data.get("page_number"),
-                        section_type=chunk_data.get("section_type"),
-                        score=chunk_data.get("score", 0.0),
-                    )
-                )
+    except OverloadedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
-        total_time = time() - start_time
 
+@router.post("/batch")
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    retriever: HybridRetriever = Depends(get_hybrid_retriever),
+    llm_service: LLMService = Depends(get_llm_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+):
+    """
+    Answer many queries at once, streamed back as NDJSON in completion order.
+
+    Retrieval for the whole batch is one embedding pass plus batched searches;
+    generation runs BATCH_GENERATION_CONCURRENCY queries at a time. Each line
+    is a QueryResponse plus its "index" in the request, or {"index", "error"}.
+    """
+    current_endpoint.set("query_batch")
+    queries = request.queries
+    analyses = [analyze_query(q.query) for q in queries]
+
+    async def generate():
+        start_time = time()
+
+        try:
+            retrieved = await retriever.hybrid_search_batch(
+                [q.query for q in queries],
+                [q.top_k for q in queries],
+                analyses,
+                [q.filters for q in queries],
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving query batch: {str(e)}")
+            for i in range(len(queries)):
+                yield json.dumps({"index": i, "error": str(e)}) + "\n"
+            return
+
+        retrieval_time = time() - start_time
         logger.info(
-            f"Query completed in {total_time:.2f}s (retrieval: {retrieval_time:.2f}s, generation: {generation_time:.2f}s)"
+            f"Retrieved chunks for {len(queries)} queries in {retrieval_time:.2f}s"
         )
 
-        return QueryResponse(
-            query=request.query,
-            answer=answer,
-            sources=sources,
-            retrieval_time=retrieval_time,
-            generation_time=generation_time,
-            total_time=total_time,
-        )
+        limit = asyncio.Semaphore(settings.BATCH_GENERATION_CONCURRENCY)
+
+        async def answer(i: int) -> Dict[str, Any]:
+            async with limit:
+                try:
+                    result = await _answer_from_chunks(
+                        queries[i],
+                        analyses[i],
+                        retrieved[i],
+                        retrieval_time,
+                        llm_service,
+                        admission,
+                    )
+                    response = _query_response(queries[i], result, start_time)
+                    return {"index": i, **response.model_dump()}
+                except Exception as e:
+                    logger.error(f"Error answering batch query {i}: {str(e)}")
+                    return {"index": i, "error": str(e)}
 
-    except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(queries))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client went away: stop generating answers nobody will read
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
 @router.post("/stream")
@@ -112,33 +261,51 @@ async def query_documents_stream(
     request: QueryRequest,
     retriever: HybridRetriever = Depends(get_hybrid_retriever),
     llm_service: LLMService = Depends(get_llm_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+    single_flight: SingleFlight = Depends(get_single_flight),
 ):
     """Stream query response with real-time answer generation"""
 
-    async def generate():
+    # Reject before the 200 is committed; later overloads become error events
+    admission.check()
+    current_endpoint.set("query_stream")
+
+    async def events():
+        """Event stream of one pipeline run, shared by coalesced requests"""
         try:
             start_time = time()
 
+            analysis = analyze_query(request.query)
+
             # Retrieve chunks
             retrieval_start = time()
             retrieved_chunks = await retriever.hybrid_search(
-                query=request.query, top_k=request.top_k
+                query=request.query,
+                top_k=request.top_k,
+                analysis=analysis,
+                filters=request.filters,
             )
             retrieval_time = time() - retrieval_start
 
             # Send retrieval metadata
-            yield f"data: {json.dumps({'type': 'metadata', 'retrieval_time': retrieval_time, 'chunks': len(retrieved_chunks)})}\n\n"
+            yield {
+                "type": "metadata",
+                "retrieval_time": retrieval_time,
+                "chunks": len(retrieved_chunks),
+            }
 
             if not retrieved_chunks:
-                yield f"data: {json.dumps({'type': 'answer', 'content': 'No relevant documents found for your query.'})}\n\n"
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield {
+                    "type": "answer",
+                    "content": "No relevant documents found for your query.",
+                }
+                yield {"type": "done"}
                 return
 
             # Auto-detect intent if using default template
-            template = request.prompt_template
-            if template == "default":
-                template = detect_intent(request.query)
-                logger.info(f"Auto-detected intent for stream: {template}")
+            template = resolve_template(
+                request.prompt_template, analysis, get_intent_centroids()
+            )
 
             # Check if LLM service supports streaming
             if hasattr(llm_service, "generate_answer_stream"):
@@ -146,69 +313,64 @@ async def query_documents_stream(
                 generation_start = time()
                 full_answer = ""
 
-                async for chunk in llm_service.generate_answer_stream(
-                    query=request.query,
-                    context_chunks=retrieved_chunks,
-                    prompt_template=template,
-                ):
-                    full_answer += chunk
-                    yield f"data: {json.dumps({'type': 'answer', 'content': chunk})}\n\n"
+                async with admission.stage("llm").slot():
+                    async for chunk in llm_service.generate_answer_stream(
+                        query=request.query,
+                        context_chunks=retrieved_chunks,
+                        prompt_template=template,
+                        analysis=analysis,
+                    ):
+                        full_answer += chunk
+                        yield {"type": "answer", "content": chunk}
 
                 generation_time = time() - generation_start
-
-                # Validate answer
-                context_texts = [chunk.get("content", "") for chunk in retrieved_chunks]
-                validation_results = validator.validate_all(
-                    answer=full_answer,
-                    question=request.query,
-                    context_chunks=context_texts,
-                )
-                validator.log_validation_results(validation_results, request.query)
+                _validate(full_answer, request.query, retrieved_chunks, analysis)
             else:
                 # Fallback to non-streaming
                 generation_start = time()
-                full_answer = await llm_service.generate_answer(
-                    query=request.query,
-                    context_chunks=retrieved_chunks,
-                    prompt_template=template,
-                )
+                async with admission.stage("llm").slot():
+                    full_answer = await llm_service.generate_answer(
+                        query=request.query,
+                        context_chunks=retrieved_chunks,
+                        prompt_template=template,
+                        analysis=analysis,
+                    )
                 generation_time = time() - generation_start
+                _validate(full_answer, request.query, retrieved_chunks, analysis)
 
-                # Validate answer
-                context_texts = [chunk.get("content", "") for chunk in retrieved_chunks]
-                validation_results = validator.validate_all(
-                    answer=full_answer,
-                    question=request.query,
-                    context_chunks=context_texts,
-                )
-                validator.log_validation_results(validation_results, request.query)
-
-                yield f"data: {json.dumps({'type': 'answer', 'content': full_answer})}\n\n"
-
-            # Send sources if requested
-            if request.include_sources:
-                sources = []
-                for chunk_data in retrieved_chunks:
-                    sources.append(
-                        {
-                            "document_id": chunk_data.get("document_id", "unknown"),
-                            "title": chunk_data.get("title", "Unknown"),
-                            "chunk_id": chunk_data.get("chunk_id", "unknown"),
-                            "content": chunk_data.get("content", ""),
-                            "page_number": chunk_data.get("page_number"),
-                            "section_type": chunk_data.get("section_type"),
-                            "score": chunk_data.get("score", 0.0),
-                        }
-                    )
-                yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+                yield {"type": "answer", "content": full_answer}
+
+            # Sources are always produced; each request drops them if unwanted
+            yield {
+                "type": "sources",
+                "sources": [_source_dict(chunk) for chunk in retrieved_chunks],
+            }
 
             # Send completion metadata
             total_time = time() - start_time
-            yield f"data: {json.dumps({'type': 'timing', 'generation_time': generation_time, 'total_time': total_time})}\n\n"
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
-
+            yield {
+                "type": "timing",
+                "generation_time": generation_time,
+                "total_time": total_time,
+            }
+            yield {"type": "done"}
+
+        except OverloadedError as e:
+            logger.warning(str(e))
+            yield {"type": "error", "message": str(e), "retry_after": e.retry_after}
         except Exception as e:
             logger.error(f"Error streaming query: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            yield {"type": "error", "message": str(e)}
+
+    async def generate():
+        if settings.COALESCE_QUERIES:
+            stream = single_flight.stream(_coalescing_key(request, retriever), events)
+        else:
+            stream = events()
+
+        async for event in stream:
+            if event["type"] == "sources" and not request.include_sources:
+                continue
+            yield f"data: {json.dumps(event)}\n\n"
 
     return StreamingResponse(generate(), media_type="text/event-stream")
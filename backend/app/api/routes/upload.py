@@ -1,12 +1,29 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from time import perf_counter
 from typing import Optional
 import os
 import shutil
-from app.models.schemas import UploadResponse, ArxivUploadRequest, ErrorResponse
-from app.api.dependencies import get_elasticsearch_client, get_embedding_service
+from app.models.schemas import (
+    UploadResponse,
+    ArxivUploadRequest,
+    ErrorResponse,
+    ReingestResponse,
+)
+from app.api.dependencies import (
+    get_admission_controller,
+    get_elasticsearch_client,
+    get_embedding_service,
+)
+from app.core.admission import AdmissionController, OverloadedError
 from app.core.elasticsearch_client import ElasticsearchClient
 from app.core.embedding_service import EmbeddingService
 from app.core.document_processor import DocumentProcessor
+from app.core.reingest import reingest_document
+from app.core.metrics import (
+    INGEST_CHUNKS,
+    INGEST_CHUNKS_PER_SECOND,
+    INGEST_STAGE_SECONDS,
+)
 from app.config import settings
 from app.utils.logger import setup_logger
 from app.utils.helpers import generate_document_id
@@ -15,12 +32,19 @@ logger = setup_logger(__name__)
 router = APIRouter()
 
 
-@router.post("/pdf", response_model=UploadResponse)
-async def upload_pdf(
-    file: UploadFile = File(...),
-    es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
-    embedding_service: EmbeddingService = Depends(get_embedding_service),
-):
+def _record_ingest(source: str, chunks: int, start: float):
+    elapsed = perf_counter() - start
+    INGEST_CHUNKS.inc(chunks, source=source)
+    if elapsed > 0:
+        INGEST_CHUNKS_PER_SECOND.observe(chunks / elapsed, source=source)
+
+
+async def _require_document(es_client: ElasticsearchClient, document_id: str):
+    if await es_client.get_document(document_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+
+def _save_upload(file: UploadFile) -> str:
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
@@ -30,20 +54,34 @@ async def upload_pdf(
             detail=f"File size exceeds maximum allowed size of {settings.MAX_UPLOAD_SIZE} bytes",
         )
 
-    try:
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
 
-        file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
+    logger.info(f"PDF uploaded: {file.filename}")
+    return file_path
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
 
-        logger.info(f"PDF uploaded: {file.filename}")
+@router.post("/pdf", response_model=UploadResponse)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+):
+    # Reject before saving the file when embedding is already saturated
+    admission.check("embedding")
+    file_path = _save_upload(file)
 
-        processor = DocumentProcessor(embedding_service)
+    try:
+        start = perf_counter()
+        processor = DocumentProcessor(embedding_service, admission)
         document = await processor.process_pdf(file_path, file.filename)
 
-        await es_client.index_document(document)
+        with INGEST_STAGE_SECONDS.time(stage="index", source="pdf"):
+            await es_client.index_document(document)
+        _record_ingest("pdf", len(document.chunks), start)
 
         logger.info(
             f"Document indexed: {document.document_id} with {len(document.chunks)} chunks"
@@ -57,6 +95,8 @@ async def upload_pdf(
             message="PDF uploaded and indexed successfully",
         )
 
+    except OverloadedError:
+        raise
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
@@ -67,12 +107,18 @@ async def upload_arxiv(
     request: ArxivUploadRequest,
     es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
+    admission: AdmissionController = Depends(get_admission_controller),
 ):
+    admission.check("embedding")
+
     try:
-        processor = DocumentProcessor(embedding_service)
+        start = perf_counter()
+        processor = DocumentProcessor(embedding_service, admission)
         document = await processor.process_arxiv(request.arxiv_id)
 
-        await es_client.index_document(document)
+        with INGEST_STAGE_SECONDS.time(stage="index", source="arxiv"):
+            await es_client.index_document(document)
+        _record_ingest("arxiv", len(document.chunks), start)
 
         logger.info(f"ArXiv paper indexed: {document.document_id} ({request.arxiv_id})")
 
@@ -84,8 +130,95 @@ async def upload_arxiv(
             message="ArXiv paper downloaded and indexed successfully",
         )
 
+    except OverloadedError:
+        raise
     except Exception as e:
         logger.error(f"Error processing ArXiv paper: {str(e)}")
         raise HTTPException(
             status_code=500, detail=f"Error processing ArXiv paper: {str(e)}"
         )
+
+
+@router.put("/pdf/{document_id}", response_model=ReingestResponse)
+async def reingest_pdf(
+    document_id: str,
+    file: UploadFile = File(...),
+    es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+):
+    """Replace a document with a corrected PDF, re-embedding only changed chunks"""
+    admission.check("embedding")
+    await _require_document(es_client, document_id)
+    file_path = _save_upload(file)
+
+    try:
+        start = perf_counter()
+        processor = DocumentProcessor(embedding_service, admission)
+        document = await processor.process_pdf(
+            file_path, file.filename, document_id=document_id, embed=False
+        )
+        diff = await reingest_document(
+            es_client, embedding_service, document, admission
+        )
+        _record_ingest("pdf", len(diff.added), start)
+
+        return ReingestResponse(
+            document_id=document_id,
+            filename=file.filename,
+            status="success",
+            chunks_created=len(document.chunks),
+            chunks_added=len(diff.added),
+            chunks_kept=len(diff.kept),
+            chunks_removed=len(diff.removed),
+            message="PDF re-ingested successfully",
+        )
+
+    except OverloadedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error re-ingesting PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error re-ingesting PDF: {str(e)}")
+
+
+@router.put("/arxiv/{document_id}", response_model=ReingestResponse)
+async def reingest_arxiv(
+    document_id: str,
+    request: ArxivUploadRequest,
+    es_client: ElasticsearchClient = Depends(get_elasticsearch_client),
+    embedding_service: EmbeddingService = Depends(get_embedding_service),
+    admission: AdmissionController = Depends(get_admission_controller),
+):
+    """Replace a document with another arXiv version (e.g. 2301.00001v2)"""
+    admission.check("embedding")
+    await _require_document(es_client, document_id)
+
+    try:
+        start = perf_counter()
+        processor = DocumentProcessor(embedding_service, admission)
+        document = await processor.process_arxiv(
+            request.arxiv_id, document_id=document_id, embed=False
+        )
+        diff = await reingest_document(
+            es_client, embedding_service, document, admission
+        )
+        _record_ingest("arxiv", len(diff.added), start)
+
+        return ReingestResponse(
+            document_id=document_id,
+            filename=f"{request.arxiv_id}.pdf",
+            status="success",
+            chunks_created=len(document.chunks),
+            chunks_added=len(diff.added),
+            chunks_kept=len(diff.kept),
+            chunks_removed=len(diff.removed),
+            message="ArXiv paper re-ingested successfully",
+        )
+
+    except OverloadedError:
+        raise
+    except Exception as e:
+        logger.error(f"Error re-ingesting ArXiv paper: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error re-ingesting ArXiv paper: {str(e)}"
+        )
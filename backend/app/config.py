@@ -11,29 +11,125 @@ class Settings(BaseSettings):
     ELASTICSEARCH_PORT: int = 9200
     ELASTICSEARCH_INDEX: str = "research_papers"
 
+    # Search backend ("elasticsearch" or "memory" for the in-process index)
+    SEARCH_BACKEND: str = "elasticsearch"
+    MEMORY_INDEX_DIR: str = "data/index"
+
     # LLM Provider (ollama or groq)
     LLM_PROVIDER: str = "groq"  # Change to "ollama" to use local Ollama
 
     # Ollama settings (for local LLM)
     OLLAMA_HOST: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2"
+    # Context window requested from Ollama (instructions alone are ~2.6k tokens)
+    OLLAMA_NUM_CTX: int = 4096
+    # Keep the model (and its cached prompt prefix) loaded between requests
+    OLLAMA_KEEP_ALIVE: str = "30m"
 
     # Groq settings (for cloud LLM)
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.1-8b-instant"
 
+    # Route across Groq and Ollama with failover instead of LLM_PROVIDER only
+    LLM_ROUTING_ENABLED: bool = False
+    LLM_REQUEST_TIMEOUT_S: float = 30.0
+    # Also send a request to the next provider if unanswered after the primary's
+    # recent p95 latency; this delay applies until it has samples (0 = off)
+    LLM_HEDGE_DELAY_MS: int = 0
+    LLM_BREAKER_FAILURES: int = 3
+    LLM_BREAKER_COOLDOWN_S: float = 30.0
+    LLM_STATS_WINDOW: int = 50
+
     EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
     EMBEDDING_DIMENSION: int = 384
+    # Shared embedding server (unix:///path.sock or tcp://host:port); empty
+    # loads the model in every worker process
+    EMBEDDING_SERVER_URL: str = ""
+    EMBEDDING_SERVER_MAX_BATCH: int = 64
+    EMBEDDING_SERVER_MAX_WAIT_MS: float = 5.0
+
+    # Vector side of hybrid search ("native" backend kNN or "ivfpq" in-process ANN)
+    VECTOR_INDEX: str = "native"
+    ANN_INDEX_PATH: str = "data/ann/ivfpq.npz"
+    ANN_NPROBE: int = 8
+    ANN_SHORTLIST_SIZE: int = 100
+
+    # Query-aware context compression ("overlap" or "embedding" sentence scoring)
+    CONTEXT_COMPRESSION: str = "overlap"
+    CONTEXT_TOKEN_BUDGET: int = 1000
+    # Tokenizer for prompt budgeting: hub id or local dir, "" = embedding model's,
+    # "chars" = character estimate
+    PROMPT_TOKENIZER: str = ""
 
     CHUNK_SIZE: int = 512
     CHUNK_OVERLAP: int = 50
 
     BM25_WEIGHT: float = 0.4
     VECTOR_WEIGHT: float = 0.6
+    # Keyword-heavy intents (parameters, observations, comparisons) lean on BM25
+    INTENT_BM25_WEIGHT: float = 0.65
+    INTENT_VECTOR_WEIGHT: float = 0.35
+    # Candidates fetched per side = fused pool size * SEARCH_OVERFETCH
+    SEARCH_OVERFETCH: float = 1.5
+    RRF_K: int = 60
+    # Elasticsearch kNN num_candidates = k * KNN_CANDIDATES_FACTOR
+    KNN_CANDIDATES_FACTOR: float = 2.0
+    # "flat" searches every chunk; "hierarchical" first picks the
+    # HIERARCHICAL_TOP_DOCUMENTS papers nearest the query by document
+    # embedding (pooled from their chunks), then searches only their chunks
+    RETRIEVAL_MODE: str = "flat"
+    HIERARCHICAL_TOP_DOCUMENTS: int = 20
 
     # Reduced from 5 to 3 for faster retrieval
     TOP_K_RETRIEVAL: int = 3
 
+    # Optional cross-encoder reranking of fused candidates
+    RERANKER_ENABLED: bool = False
+    RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_TOP_N: int = 3
+    RERANK_BUDGET_MS: int = 300
+    RERANK_MAX_LENGTH: int = 256
+
+    # Background answer validation (results are logged, never block responses)
+    VALIDATION_WORKERS: int = 2
+    VALIDATION_SAMPLE_RATE: float = 1.0
+    VALIDATION_MAX_PENDING: int = 256
+
+    # Sampled LLM-as-a-judge quality monitoring (uses the shared LLM service)
+    LLM_JUDGE_ENABLED: bool = False
+    LLM_JUDGE_SAMPLE_RATE: float = 0.05
+    LLM_JUDGE_CONCURRENCY: int = 2
+    LLM_JUDGE_MAX_PENDING: int = 100
+    LLM_JUDGE_MAX_TOKENS: int = 120
+    LLM_JUDGE_CACHE_SIZE: int = 1024
+
+    # Queries of one /query/batch request generating at the same time
+    BATCH_GENERATION_CONCURRENCY: int = 4
+
+    # Share one pipeline run between concurrent identical queries
+    COALESCE_QUERIES: bool = True
+
+    # Fall back to nearest-centroid template detection on the query embedding
+    INTENT_CENTROIDS_ENABLED: bool = False
+    INTENT_CENTROID_MIN_SIMILARITY: float = 0.6
+
+    # Admission control: concurrent work per stage, then a bounded wait queue
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    SEARCH_MAX_CONCURRENCY: int = 16
+    LLM_MAX_CONCURRENCY: int = 8
+    ADMISSION_MAX_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_S: float = 10.0
+
+    # Span tracing: recent traces are kept for /debug/traces; TRACE_EXPORTER
+    # "jsonl" appends them to TRACE_FILE, "console" logs their waterfalls
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORTER: str = ""
+    TRACE_FILE: str = "data/traces.jsonl"
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_EXPORT_MIN_MS: float = 0.0
+    TRACE_SLOW_MS: float = 500.0
+
     MAX_UPLOAD_SIZE: int = 50 * 1024 * 1024
 
     UPLOAD_DIR: str = "data/raw"
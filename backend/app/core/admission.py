@@ -0,0 +1,146 @@
+import asyncio
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from time import monotonic
+from typing import Dict, Any, Optional
+from app.config import settings
+from app.core.metrics import ADMISSION_WAIT_SECONDS
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STAGES = ("embedding", "search", "llm")
+
+
+class OverloadedError(Exception):
+    """A stage rejected work: queue full (429) or queue wait timed out (503)"""
+
+    def __init__(self, stage: str, status_code: int, retry_after: int):
+        self.stage = stage
+        self.status_code = status_code
+        self.retry_after = retry_after
+        reason = "queue full" if status_code == 429 else "queue wait timed out"
+        super().__init__(f"Server overloaded at {stage} stage ({reason})")
+
+
+class StageLimiter:
+    """
+    Caps concurrent work in one pipeline stage.
+
+    Up to max_concurrency callers run at once and up to max_queue more wait
+    for at most queue_timeout seconds. Anything beyond that is rejected
+    immediately so a burst cannot build an unbounded backlog.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        window: int = 200,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waits = deque(maxlen=window)
+        self._service_times = deque(maxlen=window)
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        if self._service_times:
+            avg = sum(self._service_times) / len(self._service_times)
+        else:
+            avg = self.queue_timeout
+        backlog = self.waiting + self.in_flight
+        return max(1, math.ceil(avg * backlog / self.max_concurrency))
+
+    def saturated(self) -> bool:
+        return self.waiting >= self.max_queue and self._semaphore.locked()
+
+    def check(self):
+        """Fail fast without queueing, for callers that commit to a response"""
+        if self.saturated():
+            self.rejected += 1
+            raise OverloadedError(self.name, 429, self._retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+
+        self.waiting += 1
+        start = monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise OverloadedError(self.name, 503, self._retry_after())
+        finally:
+            self.waiting -= 1
+            wait = monotonic() - start
+            self._waits.append(wait)
+            ADMISSION_WAIT_SECONDS.observe(wait, stage=self.name)
+
+        self.admitted += 1
+        self.in_flight += 1
+        started = monotonic()
+        try:
+            yield
+        finally:
+            self._service_times.append(monotonic() - started)
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        p95 = waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms_avg": 1000 * sum(waits) / len(waits) if waits else 0.0,
+            "wait_ms_p95": 1000 * p95,
+        }
+
+
+class AdmissionController:
+    """One StageLimiter per pipeline stage, sized from settings"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        limits = limits or {
+            "embedding": settings.EMBEDDING_MAX_CONCURRENCY,
+            "search": settings.SEARCH_MAX_CONCURRENCY,
+            "llm": settings.LLM_MAX_CONCURRENCY,
+        }
+        self.stages = {
+            name: StageLimiter(
+                name,
+                max_concurrency=limit,
+                max_queue=settings.ADMISSION_MAX_QUEUE,
+                queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_S,
+            )
+            for name, limit in limits.items()
+        }
+
+    def stage(self, name: str) -> StageLimiter:
+        return self.stages[name]
+
+    def check(self, *names: str):
+        for name in names or self.stages:
+            self.stages[name].check()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.stats() for name, limiter in self.stages.items()}
@@ -0,0 +1,327 @@
+import os
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.models.schemas import SearchFilters
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Codes are stored as uint8, so each sub-quantizer has at most 256 centroids
+MAX_SUBQUANTIZER_CENTROIDS = 256
+
+# Rows per block when computing nearest-centroid assignments
+ASSIGN_BLOCK_SIZE = 16384
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    centroid_norms = (centroids**2).sum(axis=1)
+    assign = np.empty(len(vectors), dtype=np.int64)
+
+    for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+        block = vectors[start : start + ASSIGN_BLOCK_SIZE]
+        distances = centroid_norms[None, :] - 2.0 * block @ centroids.T
+        assign[start : start + len(block)] = distances.argmin(axis=1)
+
+    return assign
+
+
+def _kmeans(
+    vectors: np.ndarray, k: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    n = len(vectors)
+    k = min(k, n)
+    centroids = vectors[rng.choice(n, k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        filled = np.flatnonzero(counts)
+
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+
+        # Re-seed empty clusters from random points
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(n, len(empty), replace=False)]
+
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals.
+
+    Vectors are L2-normalized, assigned to one of `nlist` coarse centroids and
+    the residual is encoded as `m` one-byte sub-quantizer codes, so a 384-dim
+    float32 vector (1536 bytes) is stored in `m` bytes plus its id.
+    Codes are laid out contiguously per inverted list (CSR style).
+    """
+
+    def __init__(self, dimension: int, nlist: int, m: int):
+        if dimension % m != 0:
+            raise ValueError(f"Dimension {dimension} is not divisible by m={m}")
+
+        self.dimension = dimension
+        self.nlist = nlist
+        self.m = m
+        self.dsub = dimension // m
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self.codes = np.empty((0, m), dtype=np.uint8)
+        self.ids = np.empty(0, dtype="S1")
+        self.list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.codes)
+
+    def memory_bytes(self) -> int:
+        total = self.codes.nbytes + self.ids.nbytes + self.list_offsets.nbytes
+        if self.is_trained:
+            total += self.centroids.nbytes + self.codebooks.nbytes
+        return total
+
+    def train(
+        self,
+        vectors: np.ndarray,
+        iterations: int = 20,
+        max_training_points: int = 100_000,
+        seed: int = 0,
+    ):
+        rng = np.random.default_rng(seed)
+        vectors = _normalize(vectors)
+
+        if len(vectors) > max_training_points:
+            vectors = vectors[rng.choice(len(vectors), max_training_points, False)]
+
+        self.centroids = _kmeans(vectors, self.nlist, iterations, rng)
+        self.nlist = len(self.centroids)
+        self.list_offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+
+        residuals = vectors - self.centroids[_nearest(vectors, self.centroids)]
+        ksub = min(MAX_SUBQUANTIZER_CENTROIDS, len(vectors))
+        self.codebooks = np.zeros((self.m, ksub, self.dsub), dtype=np.float32)
+
+        for j in range(self.m):
+            sub = np.ascontiguousarray(
+                residuals[:, j * self.dsub : (j + 1) * self.dsub]
+            )
+            self.codebooks[j] = _kmeans(sub, ksub, iterations, rng)
+
+        logger.info(
+            f"Trained IVF-PQ index on {len(vectors)} vectors "
+            f"(nlist={self.nlist}, m={self.m}, ksub={ksub})"
+        )
+
+    def _encode(self, vectors: np.ndarray, assign: np.ndarray) -> np.ndarray:
+        residuals = vectors - self.centroids[assign]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * self.dsub : (j + 1) * self.dsub]
+            codes[:, j] = _nearest(sub, self.codebooks[j])
+        return codes
+
+    def add(self, ids: List[str], vectors: np.ndarray):
+        if not self.is_trained:
+            raise RuntimeError("IVF-PQ index must be trained before adding vectors")
+
+        vectors = _normalize(vectors)
+        assign = _nearest(vectors, self.centroids)
+        codes = self._encode(vectors, assign)
+        new_ids = np.array([chunk_id.encode() for chunk_id in ids], dtype="S")
+
+        # Merge with existing entries and re-sort into inverted-list order
+        old_assign = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        all_assign = np.concatenate([old_assign, assign])
+        order = np.argsort(all_assign, kind="stable")
+
+        self.codes = np.concatenate([self.codes, codes])[order]
+        width = max(self.ids.dtype.itemsize, new_ids.dtype.itemsize)
+        self.ids = np.concatenate(
+            [self.ids.astype(f"S{width}"), new_ids.astype(f"S{width}")]
+        )[order]
+
+        counts = np.bincount(all_assign, minlength=self.nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def search(
+        self, query: np.ndarray, top_k: int, nprobe: int = 8
+    ) -> List[Tuple[str, float]]:
+        """Approximate nearest neighbours as (chunk_id, estimated cosine) pairs"""
+        if self.ntotal == 0:
+            return []
+
+        query = _normalize(query)
+        coarse = ((self.centroids - query) ** 2).sum(axis=1)
+        probes = np.argsort(coarse)[: min(nprobe, self.nlist)]
+
+        candidate_rows = []
+        candidate_distances = []
+        subspaces = np.arange(self.m)
+
+        for list_id in probes:
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start == end:
+                continue
+
+            residual = (query - self.centroids[list_id]).reshape(self.m, 1, self.dsub)
+            lookup = ((self.codebooks - residual) ** 2).sum(axis=2)
+
+            candidate_distances.append(lookup[subspaces, self.codes[start:end]].sum(1))
+            candidate_rows.append(np.arange(start, end))
+
+        if not candidate_rows:
+            return []
+
+        rows = np.concatenate(candidate_rows)
+        distances = np.concatenate(candidate_distances)
+
+        if top_k < len(rows):
+            best = np.argpartition(distances, top_k)[:top_k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(distances[best], kind="stable")]
+
+        # Squared L2 between unit vectors: ||q - x||^2 = 2 - 2cos
+        return [
+            (self.ids[rows[i]].decode(), float(1.0 - distances[i] / 2.0)) for i in best
+        ]
+
+    def save(self, path: str):
+        if not self.is_trained:
+            raise RuntimeError("Cannot save an untrained IVF-PQ index")
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            dimension=self.dimension,
+            m=self.m,
+            centroids=self.centroids,
+            codebooks=self.codebooks,
+            codes=self.codes,
+            ids=self.ids,
+            list_offsets=self.list_offsets,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        with np.load(path) as data:
+            index = cls(
+                dimension=int(data["dimension"]),
+                nlist=len(data["centroids"]),
+                m=int(data["m"]),
+            )
+            index.centroids = data["centroids"]
+            index.codebooks = data["codebooks"]
+            index.codes = data["codes"]
+            index.ids = data["ids"]
+            index.list_offsets = data["list_offsets"]
+        return index
+
+
+class AnnVectorSearcher:
+    """
+    Vector side of HybridRetriever backed by an IVF-PQ index.
+
+    The compressed index produces a shortlist, whose stored float embeddings
+    are fetched from the search backend and rescored exactly. Filtered
+    searches go to the backend's own pre-filtered search instead: a global
+    shortlist could miss a small matching subset entirely.
+    """
+
+    def __init__(
+        self,
+        index: IVFPQIndex,
+        store,
+        nprobe: int = None,
+        shortlist_size: int = None,
+    ):
+        self.index = index
+        self.store = store
+        self.nprobe = nprobe or settings.ANN_NPROBE
+        self.shortlist_size = shortlist_size or settings.ANN_SHORTLIST_SIZE
+
+    async def vector_search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        if filters is not None and not filters.is_empty():
+            return await self.store.vector_search(query_embedding, top_k, filters)
+
+        query = _normalize(query_embedding)
+        shortlist = self.index.search(
+            query, max(top_k, self.shortlist_size), nprobe=self.nprobe
+        )
+        if not shortlist:
+            return []
+
+        chunks = await self.store.get_chunks(
+            [chunk_id for chunk_id, _ in shortlist], include_embedding=True
+        )
+        chunks = [c for c in chunks if c.get("embedding") is not None]
+        if not chunks:
+            return []
+
+        embeddings = _normalize(np.array([c.pop("embedding") for c in chunks]))
+        cosine = embeddings @ query
+
+        results = []
+        for i in np.argsort(-cosine, kind="stable")[:top_k]:
+            result = chunks[i]
+            # Same scale as Elasticsearch cosine similarity: (1 + cos) / 2
+            result["score"] = float((1 + cosine[i]) / 2)
+            results.append(result)
+
+        return results
+
+    async def vector_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        filters = filters or [None] * len(query_embeddings)
+        return [
+            await self.vector_search(e, k, f)
+            for e, k, f in zip(query_embeddings, top_ks, filters)
+        ]
+
+
+def load_ann_searcher(store) -> Optional[AnnVectorSearcher]:
+    """Load the offline-built index if VECTOR_INDEX=ivfpq, else None"""
+    if settings.VECTOR_INDEX != "ivfpq":
+        return None
+
+    if not os.path.exists(settings.ANN_INDEX_PATH):
+        logger.warning(
+            f"VECTOR_INDEX=ivfpq but no index at {settings.ANN_INDEX_PATH}; "
+            "run scripts/build_ann_index.py. Falling back to native vector search."
+        )
+        return None
+
+    index = IVFPQIndex.load(settings.ANN_INDEX_PATH)
+    logger.info(
+        f"Loaded IVF-PQ index: {index.ntotal} vectors, "
+        f"{index.memory_bytes() / 1e6:.1f} MB "
+        f"(float32 would be {index.ntotal * index.dimension * 4 / 1e6:.1f} MB)"
+    )
+    return AnnVectorSearcher(index, store)
@@ -0,0 +1,198 @@
+import math
+import re
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.core.prompt_budget import TokenCounter, get_token_counter
+from app.utils.helpers import tokenize_terms
+from app.utils.logger import setup_logger
+
+if TYPE_CHECKING:
+    from app.core.embedding_service import EmbeddingService
+
+logger = setup_logger(__name__)
+
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+# Marks sentences dropped between two kept ones
+GAP_MARKER = "..."
+
+
+class ContextCompressor:
+    """
+    Query-aware extractive compression of retrieved chunks.
+
+    Every sentence is scored against the query (IDF-weighted term overlap, or
+    cosine similarity of sentence embeddings when CONTEXT_COMPRESSION is
+    "embedding") and the best sentences are kept under one global token
+    budget. Each chunk keeps at least its best sentence so [Source X]
+    numbering stays meaningful, and kept sentences stay in original order.
+    """
+
+    def __init__(
+        self,
+        embedding_service: Optional["EmbeddingService"] = None,
+        token_budget: int = None,
+        mode: str = None,
+        counter: Optional[TokenCounter] = None,
+    ):
+        self.embedding_service = embedding_service
+        self.token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+        self.mode = mode or settings.CONTEXT_COMPRESSION
+        self.counter = counter or get_token_counter()
+
+    def compress(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        token_budget: int = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[str]:
+        """
+        Return the compressed text of each chunk, in input order.
+
+        Blocking: in embedding mode this runs the embedding model, so async
+        callers run it in a worker thread and pass the query embedding they
+        already have.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        texts = [chunk.get("content", "") for chunk in chunks]
+
+        # Token counts are precomputed per chunk at ingest time
+        total_tokens = sum(
+            chunk.get("token_count") or self.counter.count(text)
+            for chunk, text in zip(chunks, texts)
+        )
+        if total_tokens <= budget:
+            return texts
+
+        sentences: List[Tuple[int, int, str]] = []
+        for chunk_index, text in enumerate(texts):
+            for position, sentence in enumerate(SENTENCE_SPLIT.split(text)):
+                if sentence.strip():
+                    sentences.append((chunk_index, position, sentence.strip()))
+
+        if not sentences:
+            return texts
+
+        sentence_texts = [s for _, _, s in sentences]
+        scores = self._score(query, sentence_texts, query_embedding)
+        costs = self.counter.count_batch(sentence_texts)
+        selected = self._select(sentences, scores, costs, len(texts), budget)
+
+        compressed = []
+        for chunk_index in range(len(texts)):
+            kept = sorted(selected.get(chunk_index, []))
+            parts = []
+            previous = None
+            for position, sentence in kept:
+                if previous is not None and position != previous + 1:
+                    parts.append(GAP_MARKER)
+                parts.append(sentence)
+                previous = position
+            compressed.append(" ".join(parts))
+
+        return compressed
+
+    # -----------------------------
+    # Sentence scoring
+    # -----------------------------
+    def _score(
+        self,
+        query: str,
+        sentences: List[str],
+        query_embedding: Optional[List[float]],
+    ) -> List[float]:
+        if self.mode == "embedding" and self.embedding_service is not None:
+            return self._embedding_scores(query, sentences, query_embedding)
+        return self._overlap_scores(query, sentences)
+
+    def _overlap_scores(self, query: str, sentences: List[str]) -> List[float]:
+        query_terms = set(tokenize_terms(query))
+        sentence_terms = [set(tokenize_terms(sentence)) for sentence in sentences]
+
+        document_frequency: Dict[str, int] = {}
+        for terms in sentence_terms:
+            for term in terms & query_terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+
+        n = len(sentences)
+        scores = []
+        for terms in sentence_terms:
+            matched = terms & query_terms
+            weight = sum(math.log(1 + n / document_frequency[term]) for term in matched)
+            # Dampen the advantage of long sentences
+            scores.append(weight / (1 + math.log(1 + len(terms))))
+
+        return scores
+
+    def _embedding_scores(
+        self,
+        query: str,
+        sentences: List[str],
+        query_embedding: Optional[List[float]],
+    ) -> List[float]:
+        if query_embedding is None:
+            query_embedding = self.embedding_service.embed_text(query)
+
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+
+        # embed_batch returns normalized embeddings
+        sentence_vectors = np.asarray(
+            self.embedding_service.embed_batch(sentences), dtype=np.float32
+        )
+        return (sentence_vectors @ query_vector).tolist()
+
+    # -----------------------------
+    # Budgeted selection
+    # -----------------------------
+    def _select(
+        self,
+        sentences: List[Tuple[int, int, str]],
+        scores: List[float],
+        costs: List[int],
+        num_chunks: int,
+        budget: int,
+    ) -> Dict[int, List[Tuple[int, str]]]:
+        # Highest score first; ties favour higher-ranked chunks, earlier sentences
+        order = sorted(
+            range(len(sentences)),
+            key=lambda i: (-scores[i], sentences[i][0], sentences[i][1]),
+        )
+
+        selected: Dict[int, List[Tuple[int, str]]] = {}
+        used = set()
+        remaining = budget
+
+        # Pass 1: best sentence of every chunk, in chunk rank order
+        best_per_chunk: Dict[int, int] = {}
+        for i in order:
+            best_per_chunk.setdefault(sentences[i][0], i)
+
+        for chunk_index in range(num_chunks):
+            i = best_per_chunk.get(chunk_index)
+            if i is None or remaining <= 0:
+                continue
+            _, position, sentence = sentences[i]
+            cost = costs[i]
+            if cost > remaining:
+                # Keep a truncated prefix rather than dropping the source
+                sentence = sentence[: len(sentence) * remaining // cost]
+                cost = remaining
+            selected.setdefault(chunk_index, []).append((position, sentence))
+            used.add(i)
+            remaining -= cost
+
+        # Pass 2: fill the rest of the budget globally by score
+        for i in order:
+            if i in used:
+                continue
+            chunk_index, position, sentence = sentences[i]
+            cost = costs[i]
+            if cost > remaining:
+                continue
+            selected.setdefault(chunk_index, []).append((position, sentence))
+            remaining -= cost
+
+        return selected
@@ -3,8 +3,15 @@ import arxiv
 import os
 from typing import List, Optional
 from app.models.document import Document, DocumentChunk
-from app.core.embedding_service import EmbeddingService
-from app.utils.helpers import generate_document_id, generate_chunk_id
+from app.core.admission import AdmissionController
+from app.core.embedding_service import EmbeddingService, embed_with_admission
+from app.core.metrics import INGEST_STAGE_SECONDS
+from app.core.prompt_budget import get_token_counter
+from app.utils.helpers import (
+    generate_document_id,
+    generate_chunk_id,
+    hash_chunk_content,
+)
 from app.config import settings
 from app.utils.logger import setup_logger
 from datetime import datetime
@@ -13,25 +20,45 @@ logger = setup_logger(__name__)
 
 
 class DocumentProcessor:
-    def __init__(self, embedding_service: EmbeddingService):
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        admission: Optional[AdmissionController] = None,
+    ):
         self.embedding_service = embedding_service
+        self.admission = admission
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
-
-    async def process_pdf(self, file_path: str, filename: str) -> Document:
+        self.token_counter = get_token_counter()
+
+    async def process_pdf(
+        self,
+        file_path: str,
+        filename: str,
+        document_id: Optional[str] = None,
+        embed: bool = True,
+    ) -> Document:
+        """
+        Extract, chunk and embed a PDF. Re-ingestion passes the existing
+        document_id and embed=False, then embeds only the changed chunks.
+        """
         logger.info(f"Processing PDF: {filename}")
 
-        text, metadata = self._extract_pdf_text(file_path)
+        with INGEST_STAGE_SECONDS.time(stage="extract", source="pdf"):
+            text, metadata = self._extract_pdf_text(file_path)
 
-        document_id = generate_document_id(filename)
+        document_id = document_id or generate_document_id(filename)
 
-        chunks = self._create_chunks(text, document_id)
+        with INGEST_STAGE_SECONDS.time(stage="chunk", source="pdf"):
+            chunks = self._create_chunks(text, document_id)
 
-        chunk_texts = [chunk.content for chunk in chunks]
-        embeddings = self.embedding_service.embed_batch(chunk_texts)
+        if embed:
+            with INGEST_STAGE_SECONDS.time(stage="embed", source="pdf"):
+                await self._embed_chunks(chunks)
 
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk.embedding = embedding
+        token_counts = self.token_counter.count_batch([c.content for c in chunks])
+        for chunk, token_count in zip(chunks, token_counts):
+            chunk.token_count = token_count
 
         document = Document(
             document_id=document_id,
@@ -52,27 +79,34 @@ class DocumentProcessor:
 
         return document
 
-    async def process_arxiv(self, arxiv_id: str) -> Document:
+    async def process_arxiv(
+        self, arxiv_id: str, document_id: Optional[str] = None, embed: bool = True
+    ) -> Document:
         logger.info(f"Processing ArXiv paper: {arxiv_id}")
 
-        search = arxiv.Search(id_list=[arxiv_id])
-        paper = next(search.results())
+        with INGEST_STAGE_SECONDS.time(stage="download", source="arxiv"):
+            search = arxiv.Search(id_list=[arxiv_id])
+            paper = next(search.results())
 
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-        pdf_path = os.path.join(settings.UPLOAD_DIR, f"{arxiv_id}.pdf")
-        paper.download_pdf(filename=pdf_path)
+            os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+            pdf_path = os.path.join(settings.UPLOAD_DIR, f"{arxiv_id}.pdf")
+            paper.download_pdf(filename=pdf_path)
 
-        text, pdf_metadata = self._extract_pdf_text(pdf_path)
+        with INGEST_STAGE_SECONDS.time(stage="extract", source="arxiv"):
+            text, pdf_metadata = self._extract_pdf_text(pdf_path)
 
-        document_id = generate_document_id(f"{arxiv_id}.pdf")
+        document_id = document_id or generate_document_id(f"{arxiv_id}.pdf")
 
-        chunks = self._create_chunks(text, document_id)
+        with INGEST_STAGE_SECONDS.time(stage="chunk", source="arxiv"):
+            chunks = self._create_chunks(text, document_id)
 
-        chunk_texts = [chunk.content for chunk in chunks]
-        embeddings = self.embedding_service.embed_batch(chunk_texts)
+        if embed:
+            with INGEST_STAGE_SECONDS.time(stage="embed", source="arxiv"):
+                await self._embed_chunks(chunks)
 
-        for chunk, embedding in zip(chunks, embeddings):
-            chunk.embedding = embedding
+        token_counts = self.token_counter.count_batch([c.content for c in chunks])
+        for chunk, token_count in zip(chunks, token_counts):
+            chunk.token_count = token_count
 
         authors = [author.name for author in paper.authors]
 
@@ -102,6 +136,14 @@ class DocumentProcessor:
 
         return document
 
+    async def _embed_chunks(self, chunks: List[DocumentChunk]):
+        chunk_texts = [chunk.content for chunk in chunks]
+        embeddings = await embed_with_admission(
+            self.embedding_service, chunk_texts, self.admission
+        )
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+
     def _extract_pdf_text(self, file_path: str) -> tuple[str, dict]:
         doc = fitz.open(file_path)
 
@@ -140,6 +182,7 @@ class DocumentProcessor:
                 document_id=document_id,
                 content=chunk_text,
                 metadata={"chunk_index": chunk_index},
+                content_hash=hash_chunk_content(chunk_text),
             )
 
             chunks.append(chunk)
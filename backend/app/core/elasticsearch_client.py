@@ -1,13 +1,37 @@
 from elasticsearch import AsyncElasticsearch
-from typing import List, Dict, Any, Optional
+from elasticsearch.helpers import async_scan
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from app.config import settings
-from app.models.document import Document, DocumentChunk
-from app.models.schemas import DocumentMetadata, DocumentDetail
+from app.models.document import ChunkDiff, Document, DocumentChunk
+from app.models.schemas import DocumentMetadata, DocumentDetail, SearchFilters
+from app.core.tracing import tracer
+from app.utils.helpers import hash_chunk_content
 from app.utils.logger import setup_logger
 from datetime import datetime
 
 logger = setup_logger(__name__)
 
+# Pooled chunk embedding of each paper, for two-stage retrieval
+DOCUMENT_EMBEDDING_PROPERTIES = {
+    "embedding": {
+        "type": "dense_vector",
+        "dims": settings.EMBEDDING_DIMENSION,
+        "index": True,
+        "similarity": "cosine",
+    },
+}
+
+# Document fields copied onto every chunk so searches can filter on them
+CHUNK_FILTER_PROPERTIES = {
+    "authors": {"type": "keyword"},
+    "source": {"type": "keyword"},
+    "publication_date": {
+        "type": "date",
+        "format": "yyyy-MM-dd||yyyy||epoch_millis",
+        "ignore_malformed": True,
+    },
+}
+
 
 class ElasticsearchClient:
     def __init__(self):
@@ -15,6 +39,10 @@ class ElasticsearchClient:
         self.index_name = settings.ELASTICSEARCH_INDEX
         self.chunk_index_name = f"{self.index_name}_chunks"
         self._initialized = False
+        # Bumped on every index change made through this process
+        self.generation = 0
+        # Generation at which chunks lacking the filter fields were last counted
+        self._unfilterable_checked_at: Optional[int] = None
 
     async def initialize(self):
         if self._initialized:
@@ -33,6 +61,13 @@ class ElasticsearchClient:
         self._initialized = True
         logger.info("Elasticsearch client initialized")
 
+    async def warmup(self, query_embedding: List[float]):
+        """Open the connection pool and load the kNN graph before the first query"""
+        await self.initialize()
+        if not await self.client.ping():
+            raise ConnectionError("Elasticsearch did not answer ping")
+        await self.vector_search(query_embedding, top_k=1)
+
     async def _create_indices(self):
         document_mapping = {
             "mappings": {
@@ -53,6 +88,7 @@ class ElasticsearchClient:
                     "file_size": {"type": "long"},
                     "upload_date": {"type": "date"},
                     "num_chunks": {"type": "integer"},
+                    **DOCUMENT_EMBEDDING_PROPERTIES,
                     "metadata": {"type": "object", "enabled": False},
                 }
             }
@@ -73,6 +109,9 @@ class ElasticsearchClient:
                     },
                     "page_number": {"type": "integer"},
                     "section_type": {"type": "keyword"},
+                    "token_count": {"type": "integer"},
+                    "content_hash": {"type": "keyword"},
+                    **CHUNK_FILTER_PROPERTIES,
                     "metadata": {"type": "object", "enabled": False},
                 }
             }
@@ -83,52 +122,262 @@ class ElasticsearchClient:
                 index=self.index_name, body=document_mapping
             )
             logger.info(f"Created index: {self.index_name}")
+        else:
+            await self.client.indices.put_mapping(
+                index=self.index_name, properties=DOCUMENT_EMBEDDING_PROPERTIES
+            )
 
         if not await self.client.indices.exists(index=self.chunk_index_name):
             await self.client.indices.create(
                 index=self.chunk_index_name, body=chunk_mapping
             )
             logger.info(f"Created index: {self.chunk_index_name}")
+        else:
+            # Map the filter fields before any chunk carrying them is indexed
+            await self.client.indices.put_mapping(
+                index=self.chunk_index_name, properties=CHUNK_FILTER_PROPERTIES
+            )
+
+    def _chunk_source(self, document: Document, chunk: DocumentChunk) -> Dict:
+        return {
+            "chunk_id": chunk.chunk_id,
+            "document_id": chunk.document_id,
+            "title": document.title,
+            "content": chunk.content,
+            "embedding": chunk.embedding,
+            "page_number": chunk.page_number,
+            "section_type": chunk.section_type,
+            "token_count": chunk.token_count,
+            "content_hash": chunk.content_hash or hash_chunk_content(chunk.content),
+            **self._filter_fields(document),
+            "metadata": chunk.metadata,
+        }
+
+    @staticmethod
+    def _filter_fields(document: Document) -> Dict[str, Any]:
+        return {
+            "authors": document.authors,
+            "source": document.source,
+            "publication_date": document.publication_date,
+        }
+
+    def _document_operations(
+        self, document: Document, chunks: List[DocumentChunk]
+    ) -> List[Dict[str, Any]]:
+        """Bulk actions writing the document record and the given chunks"""
+        operations = [
+            {"index": {"_index": self.index_name, "_id": document.document_id}},
+            {**document.to_dict(), "embedding": document.document_embedding()},
+        ]
+        for chunk in chunks:
+            operations.append(
+                {"index": {"_index": self.chunk_index_name, "_id": chunk.chunk_id}}
+            )
+            operations.append(self._chunk_source(document, chunk))
+        return operations
+
+    async def _bulk(self, operations: List[Dict[str, Any]]):
+        """One bulk request, refreshed so the changes are searchable on return"""
+        response = await self.client.bulk(operations=operations, refresh=True)
+        if response["errors"]:
+            errors = [
+                result["error"]
+                for item in response["items"]
+                for result in item.values()
+                if "error" in result
+            ]
+            raise RuntimeError(
+                f"Bulk request failed for {len(errors)} items: {errors[0]}"
+            )
 
     async def index_document(self, document: Document):
         if not self._initialized:
             await self.initialize()
 
-        doc_data = document.to_dict()
+        with tracer.span("es.index_document", chunks=len(document.chunks)):
+            await self._bulk(self._document_operations(document, document.chunks))
+        self.generation += 1
 
-        await self.client.index(
-            index=self.index_name, id=document.document_id, document=doc_data
+        logger.info(
+            f"Indexed document {document.document_id} with {len(document.chunks)} chunks"
         )
 
-        for chunk in document.chunks:
-            chunk_data = {
-                "chunk_id": chunk.chunk_id,
-                "document_id": chunk.document_id,
-                "title": document.title,
-                "content": chunk.content,
-                "embedding": chunk.embedding,
-                "page_number": chunk.page_number,
-                "section_type": chunk.section_type,
-                "metadata": chunk.metadata,
-            }
+    async def get_chunk_hashes(self, document_id: str) -> Dict[str, str]:
+        """chunk_id -> content hash of a document's indexed chunks"""
+        if not self._initialized:
+            await self.initialize()
 
-            await self.client.index(
-                index=self.chunk_index_name, id=chunk.chunk_id, document=chunk_data
+        hashes = {}
+        async for hit in async_scan(
+            self.client,
+            index=self.chunk_index_name,
+            query={
+                "query": {"term": {"document_id": document_id}},
+                "_source": ["chunk_id", "content", "content_hash"],
+            },
+        ):
+            source = hit["_source"]
+            # Chunks indexed before hashes were stored have none
+            content_hash = source.get("content_hash")
+            hashes[source["chunk_id"]] = content_hash or hash_chunk_content(
+                source["content"]
             )
 
-        await self.client.indices.refresh(index=self.index_name)
-        await self.client.indices.refresh(index=self.chunk_index_name)
+        return hashes
 
-        logger.info(
-            f"Indexed document {document.document_id} with {len(document.chunks)} chunks"
-        )
+    async def update_document(self, document: Document, diff: ChunkDiff):
+        """
+        Replace the document record, index the added chunks and delete the
+        removed ones in one bulk request. Kept chunks keep their content and
+        embedding; their title, position and filter fields are refreshed.
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        operations = self._document_operations(document, diff.added)
+        for chunk_id, chunk in diff.kept.items():
+            operations.append(
+                {"update": {"_index": self.chunk_index_name, "_id": chunk_id}}
+            )
+            operations.append(
+                {
+                    "doc": {
+                        "title": document.title,
+                        "page_number": chunk.page_number,
+                        "section_type": chunk.section_type,
+                        **self._filter_fields(document),
+                    }
+                }
+            )
+        for chunk_id in diff.removed:
+            operations.append(
+                {"delete": {"_index": self.chunk_index_name, "_id": chunk_id}}
+            )
 
-    async def bm25_search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        with tracer.span(
+            "es.update_document", added=len(diff.added), removed=len(diff.removed)
+        ):
+            await self._bulk(operations)
+        self.generation += 1
+
+    @staticmethod
+    def _filter_clauses(filters: Optional[SearchFilters]) -> List[Dict[str, Any]]:
+        """Non-scoring filter clauses on the fields copied onto chunks"""
+        if filters is None:
+            return []
+
+        clauses = []
+        if filters.document_ids:
+            clauses.append({"terms": {"document_id": filters.document_ids}})
+        if filters.authors:
+            clauses.append({"terms": {"authors": filters.authors}})
+        if filters.source:
+            clauses.append({"term": {"source": filters.source.value}})
+
+        published = {}
+        if filters.published_after:
+            published["gte"] = filters.published_after.isoformat()
+        if filters.published_before:
+            published["lte"] = filters.published_before.isoformat()
+        if published:
+            clauses.append({"range": {"publication_date": published}})
+
+        return clauses
+
+    async def set_document_embeddings(self, embeddings: Dict[str, List[float]]):
+        """Overwrite the stored document embeddings of existing papers"""
         if not self._initialized:
             await self.initialize()
 
-        search_query = {
-            "query": {"match": {"content": {"query": query, "operator": "or"}}},
+        operations = []
+        for document_id, embedding in embeddings.items():
+            operations.append(
+                {"update": {"_index": self.index_name, "_id": document_id}}
+            )
+            operations.append({"doc": {"embedding": embedding}})
+
+        if operations:
+            await self._bulk(operations)
+            self.generation += 1
+
+    async def copy_filter_fields_to_chunks(self) -> int:
+        """
+        Copy authors, source and publication_date from each document record
+        onto its chunks that lack them (indexed before the fields were
+        copied). Returns the number of chunks updated.
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        updated = 0
+        async for hit in async_scan(
+            self.client,
+            index=self.index_name,
+            query={
+                "query": {"match_all": {}},
+                "_source": ["document_id", "authors", "source", "publication_date"],
+            },
+        ):
+            document = hit["_source"]
+            response = await self.client.update_by_query(
+                index=self.chunk_index_name,
+                query={
+                    "bool": {
+                        "filter": {"term": {"document_id": document["document_id"]}},
+                        "must_not": {"exists": {"field": "source"}},
+                    }
+                },
+                script={
+                    "source": (
+                        "ctx._source.authors = params.authors; "
+                        "ctx._source.source = params.source; "
+                        "ctx._source.publication_date = params.publication_date"
+                    ),
+                    "params": {
+                        "authors": document.get("authors"),
+                        "source": document.get("source"),
+                        "publication_date": document.get("publication_date"),
+                    },
+                },
+                conflicts="proceed",
+            )
+            updated += response["updated"]
+
+        await self.client.indices.refresh(index=self.chunk_index_name)
+        self.generation += 1
+        return updated
+
+    async def _warn_if_unfilterable(self, filters: List[Optional[SearchFilters]]):
+        """Warn when filtering on copied fields that some chunks do not have"""
+        uses_copied_fields = any(
+            f is not None
+            and (f.authors or f.source or f.published_after or f.published_before)
+            for f in filters
+        )
+        if not uses_copied_fields or self._unfilterable_checked_at == self.generation:
+            return
+
+        self._unfilterable_checked_at = self.generation
+        response = await self.client.count(
+            index=self.chunk_index_name,
+            query={"bool": {"must_not": {"exists": {"field": "source"}}}},
+        )
+        if response["count"]:
+            logger.warning(
+                f"{response['count']} chunks predate the copied filter fields and "
+                "never match author, source or date filters; run "
+                "scripts/backfill_chunk_filter_fields.py"
+            )
+
+    def _bm25_query(
+        self, query: str, top_k: int, filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
+        match = {"match": {"content": {"query": query, "operator": "or"}}}
+        clauses = self._filter_clauses(filters)
+        return {
+            "query": (
+                {"bool": {"must": match, "filter": clauses}} if clauses else match
+            ),
             "size": top_k,
             "_source": [
                 "chunk_id",
@@ -137,13 +386,41 @@ class ElasticsearchClient:
                 "content",
                 "page_number",
                 "section_type",
+                "token_count",
             ],
         }
 
-        response = await self.client.search(
-            index=self.chunk_index_name, body=search_query
-        )
+    def _knn_query(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> Dict[str, Any]:
+        knn = {
+            "field": "embedding",
+            "query_vector": query_embedding,
+            "k": top_k,
+            "num_candidates": max(top_k, int(top_k * settings.KNN_CANDIDATES_FACTOR)),
+        }
+        clauses = self._filter_clauses(filters)
+        if clauses:
+            # Pre-filter: the graph search only visits matching chunks
+            knn["filter"] = clauses
 
+        return {
+            "knn": knn,
+            "_source": [
+                "chunk_id",
+                "document_id",
+                "title",
+                "content",
+                "page_number",
+                "section_type",
+                "token_count",
+            ],
+        }
+
+    def _hits(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
         results = []
         for hit in response["hits"]["hits"]:
             result = hit["_source"]
@@ -152,40 +429,209 @@ class ElasticsearchClient:
 
         return results
 
+    async def _msearch(
+        self, bodies: List[Dict[str, Any]], index: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run several searches in one round trip (on the chunk index by default)"""
+        if not bodies:
+            return []
+
+        searches = []
+        for body in bodies:
+            searches.append({"index": index or self.chunk_index_name})
+            searches.append(body)
+
+        with tracer.span("es.msearch", searches=len(bodies)) as span:
+            response = await self.client.msearch(searches=searches)
+            if span:
+                span.set_attribute("took_ms", response.get("took"))
+
+        results = []
+        for item in response["responses"]:
+            if "error" in item:
+                raise RuntimeError(f"Search failed in msearch: {item['error']}")
+            results.append(self._hits(item))
+
+        return results
+
+    async def bm25_search(
+        self, query: str, top_k: int = 5, filters: Optional[SearchFilters] = None
+    ) -> List[Dict[str, Any]]:
+        if not self._initialized:
+            await self.initialize()
+
+        await self._warn_if_unfilterable([filters])
+        with tracer.span("es.search", kind="bm25", top_k=top_k) as span:
+            response = await self.client.search(
+                index=self.chunk_index_name,
+                body=self._bm25_query(query, top_k, filters),
+            )
+            if span:
+                span.set_attribute("took_ms", response.get("took"))
+
+        return self._hits(response)
+
+    async def bm25_search_batch(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if not self._initialized:
+            await self.initialize()
+
+        filters = filters or [None] * len(queries)
+        await self._warn_if_unfilterable(filters)
+        return await self._msearch(
+            [self._bm25_query(q, k, f) for q, k, f in zip(queries, top_ks, filters)]
+        )
+
     async def vector_search(
-        self, query_embedding: List[float], top_k: int = 5
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
     ) -> List[Dict[str, Any]]:
         if not self._initialized:
             await self.initialize()
 
-        search_query = {
-            "knn": {
-                "field": "embedding",
-                "query_vector": query_embedding,
-                "k": top_k,
-                "num_candidates": top_k * 2,
-            },
-            "_source": [
-                "chunk_id",
-                "document_id",
-                "title",
-                "content",
-                "page_number",
-                "section_type",
-            ],
+        await self._warn_if_unfilterable([filters])
+        with tracer.span("es.search", kind="knn", top_k=top_k) as span:
+            response = await self.client.search(
+                index=self.chunk_index_name,
+                body=self._knn_query(query_embedding, top_k, filters),
+            )
+            if span:
+                span.set_attribute("took_ms", response.get("took"))
+
+        return self._hits(response)
+
+    async def vector_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if not self._initialized:
+            await self.initialize()
+
+        filters = filters or [None] * len(query_embeddings)
+        await self._warn_if_unfilterable(filters)
+        return await self._msearch(
+            [
+                self._knn_query(e, k, f)
+                for e, k, f in zip(query_embeddings, top_ks, filters)
+            ]
+        )
+
+    def _document_knn_query(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> Dict[str, Any]:
+        knn = {
+            "field": "embedding",
+            "query_vector": query_embedding,
+            "k": top_k,
+            "num_candidates": max(top_k, int(top_k * settings.KNN_CANDIDATES_FACTOR)),
         }
+        # The filter fields have the same names on documents as on chunks
+        clauses = self._filter_clauses(filters)
+        if clauses:
+            knn["filter"] = clauses
+
+        return {"knn": knn, "_source": ["document_id"]}
+
+    async def document_search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 20,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        """Papers nearest the query by document embedding: document_id, score"""
+        if not self._initialized:
+            await self.initialize()
+
+        with tracer.span("es.search", kind="documents", top_k=top_k) as span:
+            response = await self.client.search(
+                index=self.index_name,
+                body=self._document_knn_query(query_embedding, top_k, filters),
+            )
+            if span:
+                span.set_attribute("took_ms", response.get("took"))
+
+        return self._hits(response)
+
+    async def document_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if not self._initialized:
+            await self.initialize()
 
-        response = await self.client.search(
-            index=self.chunk_index_name, body=search_query
+        filters = filters or [None] * len(query_embeddings)
+        return await self._msearch(
+            [
+                self._document_knn_query(e, k, f)
+                for e, k, f in zip(query_embeddings, top_ks, filters)
+            ],
+            index=self.index_name,
         )
 
-        results = []
-        for hit in response["hits"]["hits"]:
-            result = hit["_source"]
-            result["score"] = hit["_score"]
-            results.append(result)
+    async def get_chunks(
+        self, chunk_ids: List[str], include_embedding: bool = False
+    ) -> List[Dict[str, Any]]:
+        if not self._initialized:
+            await self.initialize()
 
-        return results
+        if not chunk_ids:
+            return []
+
+        source_fields = [
+            "chunk_id",
+            "document_id",
+            "title",
+            "content",
+            "page_number",
+            "section_type",
+            "token_count",
+        ]
+        if include_embedding:
+            source_fields.append("embedding")
+
+        response = await self.client.mget(
+            index=self.chunk_index_name, ids=chunk_ids, source=source_fields
+        )
+
+        return [doc["_source"] for doc in response["docs"] if doc.get("found")]
+
+    async def count_chunk_embeddings(self) -> int:
+        if not self._initialized:
+            await self.initialize()
+
+        response = await self.client.count(
+            index=self.chunk_index_name, query={"exists": {"field": "embedding"}}
+        )
+        return response["count"]
+
+    async def iter_chunk_embeddings(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[str, List[float]]]:
+        if not self._initialized:
+            await self.initialize()
+
+        async for hit in async_scan(
+            self.client,
+            index=self.chunk_index_name,
+            query={"query": {"match_all": {}}, "_source": ["chunk_id", "embedding"]},
+            size=batch_size,
+        ):
+            source = hit["_source"]
+            if source.get("embedding") is not None:
+                yield source["chunk_id"], source["embedding"]
 
     async def list_documents(
         self, limit: int = 10, offset: int = 0
@@ -198,6 +644,7 @@ class ElasticsearchClient:
             "size": limit,
             "from": offset,
             "sort": [{"upload_date": {"order": "desc"}}],
+            "_source": {"excludes": ["embedding"]},
         }
 
         response = await self.client.search(index=self.index_name, body=search_query)
@@ -228,7 +675,9 @@ class ElasticsearchClient:
             await self.initialize()
 
         try:
-            response = await self.client.get(index=self.index_name, id=document_id)
+            response = await self.client.get(
+                index=self.index_name, id=document_id, source_excludes=["embedding"]
+            )
             source = response["_source"]
 
             content_preview = source.get("content", "")[:500]
@@ -276,6 +725,7 @@ class ElasticsearchClient:
             # Refresh indices
             await self.client.indices.refresh(index=self.index_name)
             await self.client.indices.refresh(index=self.chunk_index_name)
+            self.generation += 1
 
             return True
         except Exception as e:
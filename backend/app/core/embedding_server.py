@@ -0,0 +1,317 @@
+"""
+Embedding sidecar: one process owns the SentenceTransformer model and serves
+every API worker, batching their requests together.
+
+Wire format (both directions): 4-byte big-endian length followed by the
+payload. A request is one JSON frame {"texts": [...], "normalize": bool}.
+A reply is a JSON header frame {"shape": [n, dim]} followed by one frame of
+little-endian float32 values, or a single {"error": "..."} frame.
+
+Usage:
+    python -m app.core.embedding_server --url unix:///tmp/papyrus-embed.sock
+    python -m app.core.embedding_server --url tcp://127.0.0.1:8765
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def parse_url(url: str) -> Tuple[str, object]:
+    """'unix:///path' -> ("unix", path); 'tcp://host:port' -> ("tcp", (host, port))"""
+    if url.startswith("unix://"):
+        return "unix", url[len("unix://") :]
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://") :].rpartition(":")
+        return "tcp", (host or "127.0.0.1", int(port))
+    raise ValueError(f"Unsupported embedding server URL: {url}")
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def encode_reply(embeddings: np.ndarray) -> bytes:
+    embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+    header = json.dumps({"shape": list(embeddings.shape)}).encode()
+    return encode_frame(header) + encode_frame(embeddings.tobytes())
+
+
+def encode_error(message: str) -> bytes:
+    return encode_frame(json.dumps({"error": message}).encode())
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds limit")
+    return await reader.readexactly(length)
+
+
+@dataclass
+class _Pending:
+    texts: List[str]
+    normalize: bool
+    future: asyncio.Future = field(repr=False)
+
+
+class EmbeddingServer:
+    """
+    Micro-batches requests from all connections into single encode calls.
+
+    The first queued request opens a batch; it is closed when it holds
+    max_batch texts or max_wait seconds have passed. Encoding runs on one
+    worker thread, so the model's own thread pool is the only one in use.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        max_batch: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        self.model = model
+        self.max_batch = max_batch or settings.EMBEDDING_SERVER_MAX_BATCH
+        wait_ms = (
+            max_wait_ms
+            if max_wait_ms is not None
+            else settings.EMBEDDING_SERVER_MAX_WAIT_MS
+        )
+        self.max_wait = wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batches = 0
+
+    def _load_model(self):
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
+            self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
+
+    def _encode(self, texts: List[str], normalize: bool) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.max_batch,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=normalize,
+        )
+
+    async def _collect(self) -> List[_Pending]:
+        batch = [await self.queue.get()]
+        size = len(batch[0].texts)
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+
+        while size < self.max_batch:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item.texts)
+
+        return batch
+
+    async def _batch_loop(self):
+        while True:
+            batch = await self._collect()
+            self.batches += 1
+
+            for normalize in (False, True):
+                group = [item for item in batch if item.normalize == normalize]
+                if not group:
+                    continue
+
+                texts = [text for item in group for text in item.texts]
+                try:
+                    embeddings = await asyncio.to_thread(self._encode, texts, normalize)
+                except Exception as e:
+                    logger.error(f"Embedding batch failed: {str(e)}")
+                    for item in group:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+
+                offset = 0
+                for item in group:
+                    rows = embeddings[offset : offset + len(item.texts)]
+                    offset += len(item.texts)
+                    if not item.future.done():
+                        item.future.set_result(rows)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer):
+        try:
+            while True:
+                try:
+                    request = json.loads(await read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put(
+                    _Pending(
+                        texts=list(request["texts"]),
+                        normalize=bool(request.get("normalize", False)),
+                        future=future,
+                    )
+                )
+                try:
+                    writer.write(encode_reply(await future))
+                except Exception as e:
+                    writer.write(encode_error(str(e)))
+                await writer.drain()
+        except Exception as e:
+            logger.error(f"Embedding connection error: {str(e)}")
+        finally:
+            writer.close()
+
+    async def serve(self, url: str):
+        self._load_model()
+        kind, address = parse_url(url)
+
+        if kind == "unix":
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self._handle, path=address)
+        else:
+            host, port = address
+            server = await asyncio.start_server(self._handle, host, port)
+
+        batcher = asyncio.create_task(self._batch_loop())
+        logger.info(f"Embedding server listening on {url}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class EmbeddingClient:
+    """
+    Blocking client for EmbeddingServer over a small pool of persistent
+    connections. Each call checks one out, so concurrent calls from a
+    worker's threads reach the server together and share its batches.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0, max_idle: int = 8):
+        self.url = url
+        self.timeout = timeout
+        # Connections kept open between calls; extra ones are closed
+        self.max_idle = max_idle
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        kind, address = parse_url(self.url)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(self.timeout)
+        sock.connect(address)
+        return sock
+
+    def _checkout(self) -> Tuple[socket.socket, bool]:
+        """An idle connection (reused=True) or a new one"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _checkin(self, sock: socket.socket):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    @staticmethod
+    def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            part = sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError("Embedding server closed the connection")
+            data.extend(part)
+        return bytes(data)
+
+    def _recv_frame(self, sock: socket.socket) -> bytes:
+        (length,) = FRAME_HEADER.unpack(self._recv_exactly(sock, FRAME_HEADER.size))
+        return self._recv_exactly(sock, length)
+
+    def _request(
+        self, sock: socket.socket, texts: List[str], normalize: bool
+    ) -> np.ndarray:
+        payload = json.dumps({"texts": texts, "normalize": normalize}).encode()
+        sock.sendall(encode_frame(payload))
+
+        header = json.loads(self._recv_frame(sock))
+        if "error" in header:
+            raise RuntimeError(f"Embedding server error: {header['error']}")
+        data = self._recv_frame(sock)
+        return np.frombuffer(data, dtype="<f4").reshape(header["shape"])
+
+    def embed(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        if not texts:
+            return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+
+        sock, reused = self._checkout()
+        try:
+            try:
+                embeddings = self._request(sock, texts, normalize)
+            except OSError:
+                if not reused:
+                    raise
+                # Stale pooled connection (e.g. server restarted): reconnect once
+                sock.close()
+                sock = self._connect()
+                embeddings = self._request(sock, texts, normalize)
+        except BaseException:
+            sock.close()
+            raise
+
+        self._checkin(sock)
+        return embeddings
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding model server")
+    parser.add_argument("--url", default=settings.EMBEDDING_SERVER_URL)
+    parser.add_argument("--max-batch", type=int, default=None)
+    parser.add_argument("--max-wait-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("--url or EMBEDDING_SERVER_URL is required")
+
+    server = EmbeddingServer(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    asyncio.run(server.serve(args.url))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,103 @@
-from sentence_transformers import SentenceTransformer
-from typing import List
+import asyncio
+from contextlib import contextmanager, nullcontext
+from typing import List, Optional
 from app.config import settings
+from app.core.admission import AdmissionController
+from app.core.embedding_server import EmbeddingClient
+from app.core.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_SECONDS
+from app.core.tracing import tracer
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
 class EmbeddingService:
-    def __init__(self):
+    """
+    Encodes text with the configured SentenceTransformer.
+
+    With EMBEDDING_SERVER_URL set, encoding is delegated to the shared
+    embedding server (app/core/embedding_server.py) and this process never
+    loads the model.
+    """
+
+    def __init__(self, server_url: Optional[str] = None):
         self.model = None
         self.model_name = settings.EMBEDDING_MODEL
+        self.server_url = server_url or settings.EMBEDDING_SERVER_URL
+        self.client = None
         self._initialized = False
 
     def initialize(self):
         if self._initialized:
             return
 
-        logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        if self.server_url:
+            logger.info(f"Using embedding server at {self.server_url}")
+            self.client = EmbeddingClient(self.server_url)
+        else:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"Loading embedding model: {self.model_name}")
+            self.model = SentenceTransformer(self.model_name)
+            logger.info("Embedding model loaded successfully")
         self._initialized = True
-        logger.info("Embedding model loaded successfully")
+
+    def warmup(self) -> List[float]:
+        """Load the model and run one encode so the first query pays neither"""
+        self.initialize()
+        return self.embed_text("warmup")
+
+    @contextmanager
+    def _measure(self, kind: str, count: int):
+        """Metrics and a trace span around one encode call"""
+        EMBEDDING_BATCH_SIZE.observe(count, kind=kind)
+        with tracer.span("embedding.encode", kind=kind, texts=count):
+            with EMBEDDING_SECONDS.time(kind=kind):
+                yield
 
     def embed_text(self, text: str) -> List[float]:
         if not self._initialized:
             self.initialize()
 
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        with self._measure("text", 1):
+            if self.client:
+                return self.client.embed([text])[0].tolist()
+
+            embedding = self.model.encode(text, convert_to_numpy=True)
+            return embedding.tolist()
 
     def embed_batch(self, texts: List[str], batch_size: int = 64) -> List[List[float]]:
         if not self._initialized:
             self.initialize()
 
-        embeddings = self.model.encode(
-            texts,
-            batch_size=batch_size,
-            show_progress_bar=False,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        )
+        with self._measure("batch", len(texts)):
+            if self.client:
+                return self.client.embed(texts, normalize=True).tolist()
+
+            embeddings = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+
+            return embeddings.tolist()
+
+    def close(self):
+        if self.client:
+            self.client.close()
+
 
-        return embeddings.tolist()
+async def embed_with_admission(
+    embedding_service: EmbeddingService,
+    texts: List[str],
+    admission: Optional[AdmissionController] = None,
+) -> List[List[float]]:
+    """
+    Embed off the event loop, holding an embedding-stage slot so a burst of
+    uploads queues (or is rejected) instead of stalling queries.
+    """
+    slot = admission.stage("embedding").slot() if admission else nullcontext()
+    async with slot:
+        return await asyncio.to_thread(embedding_service.embed_batch, texts)
@@ -1,93 +1,178 @@
+import asyncio
 import os
 from groq import AsyncGroq
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
 from app.utils.logger import setup_logger
-from app.core.prompt_templates import get_prompt_template
+from app.core.context_compressor import ContextCompressor
+from app.core.prompt_budget import PromptBudgetManager
+from app.core.prompt_templates import get_prompt_template, get_system_prompt
+from app.core.metrics import GenerationTimer
+from app.utils.query_analysis import QueryAnalysis
 
 logger = setup_logger(__name__)
 
+# Upper bound on answer length; the budget manager may lower it
+MAX_ANSWER_TOKENS = 400
+
 
 class GroqService:
-    def __init__(self):
+    name = "groq"
+
+    def __init__(self, compressor: Optional[ContextCompressor] = None):
         self.api_key = settings.GROQ_API_KEY
         self.model = settings.GROQ_MODEL
         self.client = AsyncGroq(api_key=self.api_key)
+        self.compressor = compressor or ContextCompressor()
+        self.budget = PromptBudgetManager.for_model(self.model)
 
     async def generate_answer(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
     ) -> str:
-        context_text = self._format_context(context_chunks)
-        prompt = self._build_prompt(query, context_text, prompt_template)
+        # Compression may run the embedding model; keep it off the event loop
+        prompt, max_tokens = await asyncio.to_thread(
+            self._prepare_prompt, query, context_chunks, prompt_template, analysis
+        )
+        timer = GenerationTimer(self.name, prompt_template)
 
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a research assistant. ONLY answer using the exact information provided in the context. If information is not in the context, say so. NEVER use general knowledge or make assumptions. Cite sources for every claim.",
-                    },
+                    # Static prefix first so Groq can reuse its cached prefill
+                    {"role": "system", "content": get_system_prompt()},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.1,
-                max_tokens=400,  # Reduced from 500 for faster generation
+                max_tokens=max_tokens,
                 top_p=0.9,
             )
 
             answer = response.choices[0].message.content.strip()
+            timer.finish(response.usage.completion_tokens if response.usage else None)
             logger.info(f"Generated answer of length {len(answer)}")
 
             return answer
 
         except Exception as e:
+            timer.fail(e)
             logger.error(f"Error generating answer with Groq: {str(e)}")
+            if raise_errors:
+                raise
             return "I apologize, but I encountered an error generating the answer. Please try again."
 
+    async def generate_response(
+        self,
+        prompt: str,
+        temperature: float = 0.1,
+        max_tokens: int = 300,
+        json_mode: bool = False,
+        raise_errors: bool = False,
+    ) -> str:
+        """Single-turn completion for internal tasks (e.g. answer judging)"""
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **extra,
+            )
+            return response.choices[0].message.content.strip()
+
+        except Exception as e:
+            logger.error(f"Error generating response with Groq: {str(e)}")
+            if raise_errors:
+                raise
+            return ""
+
     async def generate_answer_stream(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
     ):
         """Stream answer generation chunk by chunk"""
-        context_text = self._format_context(context_chunks)
-        prompt = self._build_prompt(query, context_text, prompt_template)
+        # Compression may run the embedding model; keep it off the event loop
+        prompt, max_tokens = await asyncio.to_thread(
+            self._prepare_prompt, query, context_chunks, prompt_template, analysis
+        )
+        timer = GenerationTimer(self.name, prompt_template)
+        tokens = 0
 
         try:
             stream = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a research assistant. ONLY answer using the exact information provided in the context. If information is not in the context, say so. NEVER use general knowledge or make assumptions. Cite sources for every claim.",
-                    },
+                    # Static prefix first so Groq can reuse its cached prefill
+                    {"role": "system", "content": get_system_prompt()},
                     {"role": "user", "content": prompt},
                 ],
                 temperature=0.1,
-                max_tokens=400,  # Reduced from 500 for faster generation
+                max_tokens=max_tokens,
                 top_p=0.9,
                 stream=True,
             )
 
             async for chunk in stream:
                 if chunk.choices[0].delta.content:
+                    timer.first_token()
+                    tokens += 1  # Groq streams about one token per chunk
                     yield chunk.choices[0].delta.content
 
+            timer.finish(tokens)
+
         except Exception as e:
+            timer.fail(e)
             logger.error(f"Error streaming answer with Groq: {str(e)}")
+            if raise_errors:
+                raise
             yield "I apologize, but I encountered an error generating the answer. Please try again."
 
-    def _format_context(self, chunks: List[Dict[str, Any]]) -> str:
+    def _prepare_prompt(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        prompt_template: str,
+        analysis: Optional[QueryAnalysis] = None,
+    ) -> Tuple[str, int]:
+        """Build the prompt and the max_tokens that fit the model's window"""
+        plan = self.budget.plan(prompt_template, query, max_tokens=MAX_ANSWER_TOKENS)
+        context_text = self._format_context(
+            context_chunks,
+            query,
+            plan.context_budget,
+            analysis.embedding if analysis else None,
+        )
+        prompt = self._build_prompt(query, context_text, prompt_template)
+
+        prompt_tokens = self.budget.prompt_tokens(prompt_template, context_text, query)
+        return prompt, self.budget.fit_max_tokens(plan, prompt_tokens)
+
+    def _format_context(
+        self,
+        chunks: List[Dict[str, Any]],
+        query: str,
+        token_budget: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> str:
         context_parts = []
 
-        for i, chunk in enumerate(chunks, 1):
-            # Reduced from 800 to 600 chars for faster processing
-            content = chunk.get("content", "")[:600]
+        # Keep the query-relevant sentences of each chunk within the token budget
+        compressed = self.compressor.compress(
+            query, chunks, token_budget, query_embedding=query_embedding
+        )
 
+        for i, (chunk, content) in enumerate(zip(chunks, compressed), 1):
             # Include document metadata to prevent mixing papers
             title = chunk.get("title", "Unknown")
             page = chunk.get("page_number", "?")
@@ -103,6 +188,9 @@ class GroqService:
         prompt = template.format(context=context, query=query)
         return prompt
 
+    async def warmup(self):
+        """Open the HTTPS connection to Groq ahead of the first query"""
+        await self.client.models.list()
+
     async def close(self):
-        # Groq client doesn't need explicit closing
-        pass
+        await self.client.close()
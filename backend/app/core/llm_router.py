@@ -0,0 +1,429 @@
+import asyncio
+from collections import deque
+from time import monotonic
+from typing import List, Dict, Any, Optional
+from app.config import settings
+from app.utils.logger import setup_logger
+from app.utils.query_analysis import QueryAnalysis
+
+logger = setup_logger(__name__)
+
+FALLBACK_ANSWER = (
+    "I apologize, but I encountered an error generating the answer. "
+    "Please try again."
+)
+
+# Providers whose recent error rate exceeds this are tried last
+DEGRADED_ERROR_RATE = 0.5
+
+
+def _percentile(samples, percentile: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(percentile / 100 * len(ordered)))]
+
+
+class ProviderStats:
+    """Rolling latency, time to first token and error rate over recent calls"""
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record_success(self, latency: Optional[float] = None):
+        """Streams pass no latency: their time to first token is recorded"""
+        if latency is not None:
+            self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_first_token(self, latency: float):
+        self.first_token_latencies.append(latency)
+
+    def record_failure(self):
+        self.outcomes.append(False)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        return _percentile(self.latencies, percentile)
+
+    def first_token_percentile(self, percentile: float) -> Optional[float]:
+        return _percentile(self.first_token_latencies, percentile)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `cooldown` seconds, then lets a single trial call through (half-open).
+
+    available() only looks; a call claims its slot with acquire() right
+    before it is made, so ranking providers never moves a breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        # A half-open trial call is in flight
+        self.probing = False
+
+    def available(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return monotonic() - self.opened_at >= self.cooldown
+        return not self.probing
+
+    def acquire(self) -> bool:
+        """Claim a call; after the cooldown, only the first caller gets through"""
+        if not self.available():
+            return False
+        if self.state != self.CLOSED:
+            self.state = self.HALF_OPEN
+            self.probing = True
+        return True
+
+    def release(self):
+        """A claimed call ended without an outcome (e.g. cancelled by a hedge)"""
+        self.probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.probing = False
+        self.consecutive_failures += 1
+        if (
+            self.state == self.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = monotonic()
+
+
+class LLMRouter:
+    """
+    Routes generation across LLM providers behind the LLM service interface.
+
+    Providers with an open circuit breaker are skipped. The rest are tried
+    fastest first by recent p50 latency of non-streaming calls, with
+    providers that have a high recent error rate last; unmeasured providers
+    go first so they get measured, and ties keep preference order. With LLM_HEDGE_DELAY_MS > 0, a
+    request still unanswered after the primary's recent p95 (of time to first
+    token, when streaming; LLM_HEDGE_DELAY_MS until there are samples) is
+    also sent to the next provider and whichever answers first wins.
+    """
+
+    def __init__(self, providers: Dict[str, Any], preferred: Optional[str] = None):
+        self.providers = providers
+        self.order = list(providers)
+        if preferred in providers:
+            self.order.remove(preferred)
+            self.order.insert(0, preferred)
+
+        self.timeout = settings.LLM_REQUEST_TIMEOUT_S
+        self.hedge_delay = settings.LLM_HEDGE_DELAY_MS / 1000
+        self.stats = {
+            name: ProviderStats(settings.LLM_STATS_WINDOW) for name in providers
+        }
+        self.breakers = {
+            name: CircuitBreaker(
+                settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_COOLDOWN_S
+            )
+            for name in providers
+        }
+
+    def _candidates(self) -> List[str]:
+        available = [name for name in self.order if self.breakers[name].available()]
+
+        def rank(name: str):
+            stats = self.stats[name]
+            p50 = stats.latency_percentile(50)
+            return (stats.error_rate > DEGRADED_ERROR_RATE, p50 or 0.0)
+
+        # Stable sort: equal ranks keep preference order
+        return sorted(available, key=rank)
+
+    def _hedge_delay(self, primary: str, first_token: bool = False) -> float:
+        """Seconds to wait for the primary before hedging (0 = never)"""
+        if self.hedge_delay <= 0:
+            return 0.0
+        stats = self.stats[primary]
+        if first_token:
+            p95 = stats.first_token_percentile(95)
+        else:
+            p95 = stats.latency_percentile(95)
+        return p95 if p95 is not None else self.hedge_delay
+
+    def _next_candidate(self, candidates: List[str]) -> Optional[str]:
+        """Pop candidates until one's breaker admits the call"""
+        while candidates:
+            name = candidates.pop(0)
+            if self.breakers[name].acquire():
+                return name
+        return None
+
+    def _record_success(self, name: str, latency: Optional[float] = None):
+        self.stats[name].record_success(latency)
+        self.breakers[name].record_success()
+
+    def _record_failure(self, name: str, error: BaseException):
+        self.stats[name].record_failure()
+        self.breakers[name].record_failure()
+        logger.warning(
+            f"LLM provider {name} failed ({type(error).__name__}: {error}); "
+            f"breaker={self.breakers[name].state}"
+        )
+
+    # -----------------------------
+    # Non-streaming generation
+    # -----------------------------
+    async def _call(self, name: str, method: str, **kwargs) -> str:
+        start = monotonic()
+        try:
+            answer = await asyncio.wait_for(
+                getattr(self.providers[name], method)(raise_errors=True, **kwargs),
+                timeout=self.timeout,
+            )
+        except asyncio.CancelledError:
+            self.breakers[name].release()
+            raise
+        except Exception as e:
+            self._record_failure(name, e)
+            raise
+        self._record_success(name, monotonic() - start)
+        return answer
+
+    async def _route(self, method: str, **kwargs) -> Optional[str]:
+        """First successful result of `method` across providers, else None"""
+        candidates = self._candidates()
+        pending: set = set()
+        hedge_delay = 0.0
+
+        try:
+            while candidates or pending:
+                if candidates and not pending:
+                    name = self._next_candidate(candidates)
+                    if name is None:
+                        break
+                    hedge_delay = self._hedge_delay(name)
+                    pending.add(asyncio.create_task(self._call(name, method, **kwargs)))
+
+                # Hedge: wait only hedge_delay before also asking the next provider
+                hedge = hedge_delay > 0 and bool(candidates)
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+                if not done and candidates:
+                    name = self._next_candidate(candidates)
+                    if name is not None:
+                        logger.info(f"Hedging slow LLM request to {name}")
+                        pending.add(
+                            asyncio.create_task(self._call(name, method, **kwargs))
+                        )
+        finally:
+            for task in pending:
+                task.cancel()
+
+        logger.error("All LLM providers failed or are unavailable")
+        return None
+
+    async def generate_answer(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
+    ) -> str:
+        answer = await self._route(
+            "generate_answer",
+            query=query,
+            context_chunks=context_chunks,
+            prompt_template=prompt_template,
+            analysis=analysis,
+        )
+        if answer is None:
+            if raise_errors:
+                raise RuntimeError("All LLM providers failed or are unavailable")
+            return FALLBACK_ANSWER
+        return answer
+
+    async def generate_response(
+        self,
+        prompt: str,
+        temperature: float = 0.1,
+        max_tokens: int = 300,
+        json_mode: bool = False,
+        raise_errors: bool = False,
+    ) -> str:
+        response = await self._route(
+            "generate_response",
+            prompt=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            json_mode=json_mode,
+        )
+        if response is None:
+            if raise_errors:
+                raise RuntimeError("All LLM providers failed or are unavailable")
+            return ""
+        return response
+
+    # -----------------------------
+    # Streaming generation
+    # -----------------------------
+    async def generate_answer_stream(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
+    ):
+        """Stream from the first provider to produce a token"""
+        kwargs = {
+            "query": query,
+            "context_chunks": context_chunks,
+            "prompt_template": prompt_template,
+            "analysis": analysis,
+        }
+        candidates = self._candidates()
+        # Maps first-token task -> (provider name, generator, start time)
+        racing: Dict[asyncio.Task, tuple] = {}
+
+        def start(name: str):
+            stream = self.providers[name].generate_answer_stream(
+                raise_errors=True, **kwargs
+            )
+            task = asyncio.create_task(
+                asyncio.wait_for(stream.__anext__(), timeout=self.timeout)
+            )
+            racing[task] = (name, stream, monotonic())
+
+        winner = None
+        hedge_delay = 0.0
+        try:
+            while (candidates or racing) and winner is None:
+                if candidates and not racing:
+                    name = self._next_candidate(candidates)
+                    if name is None:
+                        break
+                    hedge_delay = self._hedge_delay(name, first_token=True)
+                    start(name)
+
+                hedge = hedge_delay > 0 and bool(candidates)
+                done, _ = await asyncio.wait(
+                    set(racing),
+                    timeout=hedge_delay if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                for task in done:
+                    name, stream, started = racing.pop(task)
+                    error = task.exception()
+                    if error is None and winner is None:
+                        self.stats[name].record_first_token(monotonic() - started)
+                        winner = (name, stream, task.result())
+                    elif error is None:
+                        self.breakers[name].release()
+                        await stream.aclose()
+                    else:
+                        # StopAsyncIteration: provider ended without any token
+                        self._record_failure(name, error)
+
+                if not done and candidates:
+                    name = self._next_candidate(candidates)
+                    if name is not None:
+                        logger.info(f"Hedging slow LLM stream to {name}")
+                        start(name)
+        finally:
+            for task, (name, stream, _) in racing.items():
+                self.breakers[name].release()
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                await stream.aclose()
+
+        if winner is None:
+            logger.error("All LLM providers failed or are unavailable")
+            if raise_errors:
+                raise RuntimeError("All LLM providers failed or are unavailable")
+            yield FALLBACK_ANSWER
+            return
+
+        name, stream, first_token = winner
+        recorded = False
+        try:
+            yield first_token
+            try:
+                async for token in stream:
+                    yield token
+            except Exception as e:
+                # Tokens were already sent, so we cannot fail over mid-answer
+                recorded = True
+                self._record_failure(name, e)
+                if raise_errors:
+                    raise
+                yield FALLBACK_ANSWER
+                return
+            recorded = True
+            # Full answer durations would inflate the p95 the hedge waits for
+            self._record_success(name)
+        finally:
+            # The reader left mid-answer: free a half-open probe slot
+            if not recorded:
+                self.breakers[name].release()
+            await stream.aclose()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider routing state, listed in current routing order"""
+        routing = self._candidates()
+        unavailable = [name for name in self.order if name not in routing]
+        return {
+            name: {
+                "breaker": self.breakers[name].state,
+                "error_rate": self.stats[name].error_rate,
+                "p50_latency": self.stats[name].latency_percentile(50),
+                "p95_latency": self.stats[name].latency_percentile(95),
+                "p95_first_token": self.stats[name].first_token_percentile(95),
+                "hedge_delay": self._hedge_delay(name),
+            }
+            for name in routing + unavailable
+        }
+
+    async def warmup(self):
+        results = await asyncio.gather(
+            *(provider.warmup() for provider in self.providers.values()),
+            return_exceptions=True,
+        )
+        for name, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up of LLM provider {name} failed: {result}")
+
+    async def close(self):
+        for provider in self.providers.values():
+            await provider.close()
@@ -1,72 +1,221 @@
+import asyncio
 import httpx
-from typing import List, Dict, Any
+import json
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
 from app.utils.logger import setup_logger
-from app.core.prompt_templates import get_prompt_template
-import re
+from app.core.context_compressor import ContextCompressor
+from app.core.prompt_budget import PromptBudgetManager
+from app.core.prompt_templates import get_prompt_template, get_system_prompt
+from app.core.metrics import GenerationTimer
+from app.utils.query_analysis import QueryAnalysis, analyze_query
 
 logger = setup_logger(__name__)
 
 
 class LLMService:
-    def __init__(self):
+    name = "ollama"
+
+    def __init__(self, compressor: Optional[ContextCompressor] = None):
         self.base_url = settings.OLLAMA_HOST
         self.model = settings.OLLAMA_MODEL
         self.client = httpx.AsyncClient(timeout=60.0)
+        self.compressor = compressor or ContextCompressor()
+        # Fixed per model: changing num_ctx between requests reloads the model
+        self.budget = PromptBudgetManager(settings.OLLAMA_NUM_CTX)
 
     async def generate_answer(
         self,
         query: str,
         context_chunks: List[Dict[str, Any]],
         prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
     ) -> str:
 
-        intent = self._classify_query(query)
-        context_text = self._format_context(context_chunks, query)
-
-        prompt = self._build_prompt(query, context_text, prompt_template)
+        analysis = analysis or analyze_query(query)
+        # Compression may run the embedding model; keep it off the event loop
+        prompt, max_tokens = await asyncio.to_thread(
+            self._prepare_prompt, query, context_chunks, prompt_template, analysis
+        )
+        intent = analysis.generation_intent
 
-        max_tokens = self._max_tokens_by_intent(intent)
+        timer = GenerationTimer(self.name, prompt_template)
 
         try:
             response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,
-                        "top_p": 0.9,
-                        "num_predict": max_tokens,
-                        "num_ctx": 3072,
-                        "num_thread": 8,
-                        "stop": [
-                            "\n\n\n",
-                            "Question:",
-                            "Context:",
-                            "[Source",
-                        ],
-                    },
-                },
+                f"{self.base_url}/api/chat",
+                json=self._chat_request(prompt, max_tokens, stream=False),
             )
 
             response.raise_for_status()
             result = response.json()
 
-            answer = result.get("response", "").strip()
+            answer = result.get("message", {}).get("content", "").strip()
 
             while answer.startswith("\n"):
                 answer = answer[1:]
 
+            timer.finish(result.get("eval_count"))
+
             logger.info(f"Generated answer | intent={intent} | length={len(answer)}")
 
             return answer
 
         except Exception as e:
+            timer.fail(e)
             logger.error(f"Error generating answer: {str(e)}")
+            if raise_errors:
+                raise
             return "I encountered an error generating the answer."
 
+    async def generate_response(
+        self,
+        prompt: str,
+        temperature: float = 0.1,
+        max_tokens: int = 300,
+        json_mode: bool = False,
+        raise_errors: bool = False,
+    ) -> str:
+        """Single-turn completion for internal tasks (e.g. answer judging)"""
+        body = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens,
+                "num_ctx": self.budget.context_window,
+            },
+        }
+        if json_mode:
+            body["format"] = "json"
+
+        try:
+            response = await self.client.post(f"{self.base_url}/api/chat", json=body)
+            response.raise_for_status()
+            return response.json().get("message", {}).get("content", "").strip()
+
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            if raise_errors:
+                raise
+            return ""
+
+    async def generate_answer_stream(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        prompt_template: str = "default",
+        raise_errors: bool = False,
+        analysis: Optional[QueryAnalysis] = None,
+    ):
+        """Stream answer tokens from Ollama's NDJSON chat responses"""
+        analysis = analysis or analyze_query(query)
+        # Compression may run the embedding model; keep it off the event loop
+        prompt, max_tokens = await asyncio.to_thread(
+            self._prepare_prompt, query, context_chunks, prompt_template, analysis
+        )
+        intent = analysis.generation_intent
+
+        timer = GenerationTimer(self.name, prompt_template)
+        tokens = 0
+
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/api/chat",
+                json=self._chat_request(prompt, max_tokens, stream=True),
+            ) as response:
+                response.raise_for_status()
+                started = False
+
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+
+                    token = data.get("message", {}).get("content", "")
+
+                    # Same leading-whitespace trim as the non-streaming path
+                    if not started:
+                        token = token.lstrip()
+                        started = bool(token)
+
+                    if token:
+                        timer.first_token()
+                        tokens += 1
+                        yield token
+
+                    if data.get("done"):
+                        tokens = data.get("eval_count", tokens)
+                        break
+
+            timer.finish(tokens)
+            logger.info(f"Streamed answer | intent={intent}")
+
+        except Exception as e:
+            timer.fail(e)
+            logger.error(f"Error streaming answer: {str(e)}")
+            if raise_errors:
+                raise
+            yield "I encountered an error generating the answer."
+
+    def _chat_request(
+        self, prompt: str, max_tokens: int, stream: bool
+    ) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            # Static system prompt first: with the model kept loaded, the runner
+            # reuses its KV cache for this prefix and only prefills the suffix
+            "messages": [
+                {"role": "system", "content": get_system_prompt()},
+                {"role": "user", "content": prompt},
+            ],
+            "stream": stream,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": 0.3,
+                "top_p": 0.9,
+                "num_predict": max_tokens,
+                "num_ctx": self.budget.context_window,
+                "num_thread": 8,
+                "stop": [
+                    "\n\n\n",
+                    "Question:",
+                    "Context:",
+                    "[Source",
+                ],
+            },
+        }
+
+    # -----------------------------
+    # Prompt budgeting
+    # -----------------------------
+    def _prepare_prompt(
+        self,
+        query: str,
+        context_chunks: List[Dict[str, Any]],
+        prompt_template: str,
+        analysis: QueryAnalysis,
+    ) -> Tuple[str, int]:
+        plan = self.budget.plan(
+            prompt_template,
+            query,
+            max_tokens=self._max_tokens_by_intent(analysis.generation_intent),
+        )
+        context_text = self._format_context(
+            context_chunks, query, plan.context_budget, analysis.embedding
+        )
+        prompt = self._build_prompt(query, context_text, prompt_template)
+
+        prompt_tokens = self.budget.prompt_tokens(prompt_template, context_text, query)
+        return prompt, self.budget.fit_max_tokens(plan, prompt_tokens)
+
     # -----------------------------
     # Context compression
     # -----------------------------
@@ -74,38 +223,19 @@ class LLMService:
         self,
         chunks: List[Dict[str, Any]],
         query: str,
+        token_budget: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None,
     ) -> str:
         context_parts = []
 
-        for i, chunk in enumerate(chunks, 1):
-            text = chunk.get("content", "")
-            compressed = self._compress_text(text, query)
-            context_parts.append(f"[Source {i}] {compressed}")
+        compressed = self.compressor.compress(
+            query, chunks, token_budget, query_embedding=query_embedding
+        )
 
-        return "\n\n".join(context_parts)
+        for i, text in enumerate(compressed, 1):
+            context_parts.append(f"[Source {i}] {text}")
 
-    def _compress_text(self, text: str, query: str, max_sentences: int = 4) -> str:
-        sentences = re.split(r"(?<=[.!?])\s+", text)
-        return " ".join(sentences[:max_sentences])
-
-    # -----------------------------
-    # Intent detection
-    # -----------------------------
-    def _classify_query(self, query: str) -> str:
-        q = query.lower()
-
-        if any(k in q for k in ["what is", "define"]):
-            return "definition"
-        if any(k in q for k in ["parameter", "parameters", "weights", "matrix"]):
-            return "parameters"
-        if any(k in q for k in ["true or false", "is it true", "verify"]):
-            return "verification"
-        if any(k in q for k in ["evidence", "signatures", "identify"]):
-            return "observation"
-        if any(k in q for k in ["why", "argue", "explain"]):
-            return "explanation"
-
-        return "general"
+        return "\n\n".join(context_parts)
 
     # -----------------------------
     # Output length control
@@ -126,5 +256,17 @@ class LLMService:
         template = get_prompt_template(prompt_template)
         return template.format(context=context, query=query)
 
+    async def warmup(self):
+        """Load the model into Ollama (a chat request without messages)"""
+        response = await self.client.post(
+            f"{self.base_url}/api/chat",
+            json={
+                "model": self.model,
+                "messages": [],
+                "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            },
+        )
+        response.raise_for_status()
+
     async def close(self):
         await self.client.aclose()
@@ -0,0 +1,709 @@
+import json
+import math
+import os
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator, Callable
+import numpy as np
+from app.config import settings
+from app.models.document import ChunkDiff, Document, DocumentChunk
+from app.models.schemas import DocumentMetadata, DocumentDetail, SearchFilters
+from app.utils.helpers import hash_chunk_content, tokenize_terms
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Elasticsearch BM25 defaults
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CHUNK_SOURCE_FIELDS = (
+    "chunk_id",
+    "document_id",
+    "title",
+    "content",
+    "page_number",
+    "section_type",
+    "token_count",
+)
+
+
+def _publication_day(value: Optional[str]) -> Optional[str]:
+    """yyyy-MM-dd for comparison; a bare year means its first day, as in ES"""
+    if not value:
+        return None
+    return f"{value}-01-01" if len(value) == 4 else value[:10]
+
+
+def _document_matches(document: Dict[str, Any], filters: SearchFilters) -> bool:
+    if filters.document_ids and document["document_id"] not in filters.document_ids:
+        return False
+    if filters.authors and set(filters.authors).isdisjoint(
+        document.get("authors") or ()
+    ):
+        return False
+    if filters.source and document["source"] != filters.source.value:
+        return False
+
+    after, before = filters.published_after, filters.published_before
+    if after or before:
+        published = _publication_day(document.get("publication_date"))
+        if published is None:
+            return False
+        if after and published < after.isoformat():
+            return False
+        if before and published > before.isoformat():
+            return False
+
+    return True
+
+
+class InMemorySearchClient:
+    """
+    In-process drop-in for ElasticsearchClient.
+
+    Chunk embeddings are kept as a memory-mapped float32 matrix (rows are
+    L2-normalized, so cosine is a single mat-vec product) and BM25 is served
+    from an inverted index of term -> (row, term frequency) arrays.
+    Everything is persisted under MEMORY_INDEX_DIR.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or settings.MEMORY_INDEX_DIR
+        self.index_name = settings.ELASTICSEARCH_INDEX
+        self.chunk_index_name = f"{self.index_name}_chunks"
+        self.dimension = settings.EMBEDDING_DIMENSION
+        self._initialized = False
+        # Bumped on every index change so cached/coalesced results can tell
+        self.generation = 0
+
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._chunks: List[Dict[str, Any]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._embeddings = np.empty((0, self.dimension), dtype=np.float32)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_lengths = array("i")
+        # document_id -> chunk rows, rebuilt lazily after rows change
+        self._rows_by_document: Optional[Dict[str, np.ndarray]] = None
+        # Document ids and embedding matrix, rebuilt lazily after writes
+        self._document_vectors: Optional[Tuple[List[str], np.ndarray]] = None
+
+    @property
+    def _documents_path(self) -> str:
+        return os.path.join(self.data_dir, "documents.jsonl")
+
+    @property
+    def _chunks_path(self) -> str:
+        return os.path.join(self.data_dir, "chunks.jsonl")
+
+    @property
+    def _embeddings_path(self) -> str:
+        return os.path.join(self.data_dir, "embeddings.f32")
+
+    async def initialize(self):
+        if self._initialized:
+            return
+
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._load()
+        self._initialized = True
+        logger.info(
+            f"In-memory search index loaded from {self.data_dir} "
+            f"({len(self._documents)} documents, {len(self._chunks)} chunks)"
+        )
+
+    async def warmup(self, query_embedding: List[float]):
+        """Load the index and page in the embedding matrix"""
+        await self.initialize()
+        await self.vector_search(query_embedding, top_k=1)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _load(self):
+        self._documents = {}
+        self._document_vectors = None
+        if os.path.exists(self._documents_path):
+            with open(self._documents_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        doc = json.loads(line)
+                        self._documents[doc["document_id"]] = doc
+
+        self._chunks = []
+        if os.path.exists(self._chunks_path):
+            with open(self._chunks_path, encoding="utf-8") as f:
+                self._chunks = [json.loads(line) for line in f if line.strip()]
+        self._row_by_id = {c["chunk_id"]: row for row, c in enumerate(self._chunks)}
+        self._rows_by_document = None
+
+        self._open_embeddings()
+
+        if self._embeddings.shape[0] != len(self._chunks):
+            raise RuntimeError(
+                f"Corrupt in-memory index at {self.data_dir}: "
+                f"{self._embeddings.shape[0]} embeddings for {len(self._chunks)} chunks"
+            )
+
+        self._postings = {}
+        self._doc_lengths = array("i")
+        for row, chunk in enumerate(self._chunks):
+            self._add_postings(row, chunk["content"])
+
+    def _open_embeddings(self):
+        rows = 0
+        if os.path.exists(self._embeddings_path):
+            rows = os.path.getsize(self._embeddings_path) // (4 * self.dimension)
+
+        if rows == 0:
+            self._embeddings = np.empty((0, self.dimension), dtype=np.float32)
+        else:
+            self._embeddings = np.memmap(
+                self._embeddings_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(rows, self.dimension),
+            )
+
+    def _write_documents(self):
+        self._document_vectors = None
+        tmp_path = f"{self._documents_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc in self._documents.values():
+                f.write(json.dumps(doc) + "\n")
+        os.replace(tmp_path, self._documents_path)
+
+    def _append_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray):
+        with open(self._chunks_path, "a", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk) + "\n")
+
+        with open(self._embeddings_path, "ab") as f:
+            f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+
+        self._open_embeddings()
+
+    def _write_chunk_rows(self):
+        tmp_path = f"{self._chunks_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for chunk in self._chunks:
+                f.write(json.dumps(chunk) + "\n")
+        os.replace(tmp_path, self._chunks_path)
+
+    def _rewrite_chunks(self, keep_rows: np.ndarray):
+        kept_embeddings = np.array(self._embeddings[keep_rows], dtype=np.float32)
+        self._chunks = [self._chunks[row] for row in keep_rows]
+        self._row_by_id = {c["chunk_id"]: row for row, c in enumerate(self._chunks)}
+        self._rows_by_document = None
+
+        # Drop the mapping before replacing the file underneath it
+        self._embeddings = kept_embeddings
+
+        self._write_chunk_rows()
+
+        tmp_path = f"{self._embeddings_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(kept_embeddings.tobytes())
+        os.replace(tmp_path, self._embeddings_path)
+
+        self._open_embeddings()
+
+    # -----------------------------
+    # Inverted index
+    # -----------------------------
+    def _add_postings(self, row: int, content: str):
+        terms = Counter(tokenize_terms(content))
+        self._doc_lengths.append(sum(terms.values()))
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = (array("i"), array("i"))
+                self._postings[term] = postings
+            postings[0].append(row)
+            postings[1].append(tf)
+
+    def _remap_postings(self, keep_rows: np.ndarray, num_rows: int):
+        new_row = np.full(num_rows, -1, dtype=np.int64)
+        new_row[keep_rows] = np.arange(len(keep_rows))
+
+        remapped: Dict[str, Tuple[array, array]] = {}
+        for term, (rows, tfs) in self._postings.items():
+            mapped = new_row[np.frombuffer(rows, dtype=np.int32)]
+            mask = mapped >= 0
+            if not mask.any():
+                continue
+            remapped[term] = (
+                array("i", mapped[mask].astype(np.int32).tobytes()),
+                array("i", np.frombuffer(tfs, dtype=np.int32)[mask].tobytes()),
+            )
+
+        lengths = np.frombuffer(self._doc_lengths, dtype=np.int32)[keep_rows]
+        self._postings = remapped
+        self._doc_lengths = array("i", lengths.astype(np.int32).tobytes())
+
+    # -----------------------------
+    # Indexing
+    # -----------------------------
+    def _add_chunks(self, document: Document, chunks: List[DocumentChunk]):
+        chunk_rows = []
+        embeddings = np.zeros((len(chunks), self.dimension), dtype=np.float32)
+        for i, chunk in enumerate(chunks):
+            chunk_rows.append(
+                {
+                    "chunk_id": chunk.chunk_id,
+                    "document_id": chunk.document_id,
+                    "title": document.title,
+                    "content": chunk.content,
+                    "page_number": chunk.page_number,
+                    "section_type": chunk.section_type,
+                    "token_count": chunk.token_count,
+                    "content_hash": (
+                        chunk.content_hash or hash_chunk_content(chunk.content)
+                    ),
+                    "metadata": chunk.metadata,
+                }
+            )
+            if chunk.embedding is not None:
+                vector = np.asarray(chunk.embedding, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                embeddings[i] = vector / norm if norm > 0 else vector
+
+        first_row = len(self._chunks)
+        self._chunks.extend(chunk_rows)
+        self._rows_by_document = None
+        self._append_chunks(chunk_rows, embeddings)
+
+        for offset, chunk in enumerate(chunk_rows):
+            self._row_by_id[chunk["chunk_id"]] = first_row + offset
+            self._add_postings(first_row + offset, chunk["content"])
+
+    @staticmethod
+    def _document_record(document: Document) -> Dict[str, Any]:
+        return {**document.to_dict(), "embedding": document.document_embedding()}
+
+    async def index_document(self, document: Document):
+        if not self._initialized:
+            await self.initialize()
+
+        # Re-indexing a document replaces its previous chunks
+        if document.document_id in self._documents:
+            self._delete_chunks(document.document_id)
+
+        self._documents[document.document_id] = self._document_record(document)
+        self._write_documents()
+
+        self.generation += 1
+        self._add_chunks(document, document.chunks)
+
+        logger.info(
+            f"Indexed document {document.document_id} with {len(document.chunks)} chunks"
+        )
+
+    async def get_chunk_hashes(self, document_id: str) -> Dict[str, str]:
+        """chunk_id -> content hash of a document's indexed chunks"""
+        if not self._initialized:
+            await self.initialize()
+
+        return {
+            chunk["chunk_id"]: chunk.get("content_hash")
+            or hash_chunk_content(chunk["content"])
+            for chunk in self._chunks
+            if chunk["document_id"] == document_id
+        }
+
+    async def update_document(self, document: Document, diff: ChunkDiff):
+        """
+        Replace the document record, add and delete chunks; kept rows stay
+        but take the title and position of their matching new chunk
+        """
+        if not self._initialized:
+            await self.initialize()
+
+        self._documents[document.document_id] = self._document_record(document)
+        self._write_documents()
+
+        self.generation += 1
+        refreshed = False
+        for chunk_id, chunk in diff.kept.items():
+            row = self._chunks[self._row_by_id[chunk_id]]
+            fields = {
+                "title": document.title,
+                "page_number": chunk.page_number,
+                "section_type": chunk.section_type,
+            }
+            if any(row.get(name) != value for name, value in fields.items()):
+                row.update(fields)
+                refreshed = True
+
+        removed = set(diff.removed)
+        if not self._delete_rows(lambda chunk: chunk["chunk_id"] in removed):
+            if refreshed:
+                self._write_chunk_rows()
+        self._add_chunks(document, diff.added)
+
+    async def copy_filter_fields_to_chunks(self) -> int:
+        """Nothing to copy: filters read the document records directly"""
+        return 0
+
+    async def set_document_embeddings(self, embeddings: Dict[str, List[float]]):
+        """Overwrite the stored document embeddings of existing papers"""
+        if not self._initialized:
+            await self.initialize()
+
+        for document_id, embedding in embeddings.items():
+            if document_id in self._documents:
+                self._documents[document_id]["embedding"] = embedding
+        self._write_documents()
+        self.generation += 1
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def _hit(self, row: int, score: float) -> Dict[str, Any]:
+        chunk = self._chunks[row]
+        result = {field: chunk.get(field) for field in CHUNK_SOURCE_FIELDS}
+        result["score"] = score
+        return result
+
+    def _filter_rows(self, filters: Optional[SearchFilters]) -> Optional[np.ndarray]:
+        """Sorted rows of the chunks of matching documents; None if unfiltered"""
+        if filters is None or filters.is_empty():
+            return None
+
+        if self._rows_by_document is None:
+            rows_by_document: Dict[str, List[int]] = {}
+            for row, chunk in enumerate(self._chunks):
+                rows_by_document.setdefault(chunk["document_id"], []).append(row)
+            self._rows_by_document = {
+                document_id: np.array(rows, dtype=np.int64)
+                for document_id, rows in rows_by_document.items()
+            }
+
+        candidates = filters.document_ids or self._documents.keys()
+        matching = [
+            self._rows_by_document[document_id]
+            for document_id in candidates
+            if document_id in self._rows_by_document
+            and _document_matches(self._documents[document_id], filters)
+        ]
+        if not matching:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(matching))
+
+    @staticmethod
+    def _top_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+        if top_k >= len(scores):
+            return np.argsort(-scores, kind="stable")
+        candidates = np.argpartition(-scores, top_k)[:top_k]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    async def bm25_search(
+        self, query: str, top_k: int = 5, filters: Optional[SearchFilters] = None
+    ) -> List[Dict[str, Any]]:
+        if not self._initialized:
+            await self.initialize()
+
+        num_rows = len(self._chunks)
+        if num_rows == 0:
+            return []
+
+        # Statistics stay corpus-wide, as Elasticsearch's do under a filter
+        allowed = self._filter_rows(filters)
+        if allowed is not None and len(allowed) == 0:
+            return []
+
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32)
+        length_norm = BM25_K1 * (
+            1 - BM25_B + BM25_B * doc_lengths / max(doc_lengths.mean(), 1.0)
+        )
+
+        scores = np.zeros(num_rows, dtype=np.float32)
+        for term in set(tokenize_terms(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows = np.frombuffer(postings[0], dtype=np.int32)
+            tfs = np.frombuffer(postings[1], dtype=np.int32).astype(np.float32)
+            df = len(rows)
+            idf = math.log(1 + (num_rows - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + length_norm[rows])
+
+        if allowed is None:
+            matched = np.flatnonzero(scores > 0)
+        else:
+            matched = allowed[scores[allowed] > 0]
+        if len(matched) == 0:
+            return []
+
+        top = matched[self._top_rows(scores[matched], top_k)]
+        return [self._hit(int(row), float(scores[row])) for row in top]
+
+    async def vector_search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        if not self._initialized:
+            await self.initialize()
+
+        if len(self._chunks) == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        # Pre-filter: only the matching rows are read and scored
+        rows = self._filter_rows(filters)
+        if rows is None:
+            cosine = self._embeddings @ query
+        else:
+            cosine = self._embeddings[rows] @ query
+
+        positions = self._top_rows(cosine, top_k)
+        top = positions if rows is None else rows[positions]
+
+        # Same scale as Elasticsearch cosine similarity: (1 + cos) / 2
+        return [
+            self._hit(int(row), float((1 + cosine[position]) / 2))
+            for position, row in zip(positions, top)
+        ]
+
+    async def bm25_search_batch(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        filters = filters or [None] * len(queries)
+        return [
+            await self.bm25_search(q, k, f) for q, k, f in zip(queries, top_ks, filters)
+        ]
+
+    async def vector_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        if not self._initialized:
+            await self.initialize()
+
+        if len(self._chunks) == 0:
+            return [[] for _ in query_embeddings]
+
+        filters = filters or [None] * len(query_embeddings)
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+
+        # Filtered queries score only their own rows
+        unfiltered = []
+        for i, query_filters in enumerate(filters):
+            if query_filters is None or query_filters.is_empty():
+                unfiltered.append(i)
+            else:
+                results[i] = await self.vector_search(
+                    query_embeddings[i], top_ks[i], query_filters
+                )
+        if not unfiltered:
+            return results
+
+        queries = np.asarray([query_embeddings[i] for i in unfiltered], np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1)
+
+        # One pass over the embedding matrix for the rest of the batch
+        cosine = queries @ self._embeddings.T
+        for i, scores in zip(unfiltered, cosine):
+            top = self._top_rows(scores, top_ks[i])
+            results[i] = [
+                self._hit(int(row), float((1 + scores[row]) / 2)) for row in top
+            ]
+
+        return results
+
+    async def document_search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 20,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        """Papers nearest the query by document embedding: document_id, score"""
+        if not self._initialized:
+            await self.initialize()
+
+        if self._document_vectors is None:
+            embedded = [
+                (document_id, doc["embedding"])
+                for document_id, doc in self._documents.items()
+                if doc.get("embedding") is not None
+            ]
+            self._document_vectors = (
+                [document_id for document_id, _ in embedded],
+                np.asarray(
+                    [embedding for _, embedding in embedded], dtype=np.float32
+                ).reshape(len(embedded), self.dimension),
+            )
+
+        document_ids, vectors = self._document_vectors
+        if filters is not None and not filters.is_empty():
+            keep = [
+                i
+                for i, document_id in enumerate(document_ids)
+                if _document_matches(self._documents[document_id], filters)
+            ]
+            document_ids = [document_ids[i] for i in keep]
+            vectors = vectors[keep]
+
+        if not document_ids:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        # Stored document embeddings are already unit length
+        cosine = vectors @ query
+        return [
+            {"document_id": document_ids[i], "score": float((1 + cosine[i]) / 2)}
+            for i in self._top_rows(cosine, top_k)
+        ]
+
+    async def document_search_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_ks: List[int],
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        filters = filters or [None] * len(query_embeddings)
+        return [
+            await self.document_search(e, k, f)
+            for e, k, f in zip(query_embeddings, top_ks, filters)
+        ]
+
+    async def get_chunks(
+        self, chunk_ids: List[str], include_embedding: bool = False
+    ) -> List[Dict[str, Any]]:
+        if not self._initialized:
+            await self.initialize()
+
+        results = []
+        for chunk_id in chunk_ids:
+            row = self._row_by_id.get(chunk_id)
+            if row is None:
+                continue
+            chunk = self._chunks[row]
+            result = {field: chunk.get(field) for field in CHUNK_SOURCE_FIELDS}
+            if include_embedding:
+                result["embedding"] = self._embeddings[row].tolist()
+            results.append(result)
+
+        return results
+
+    async def count_chunk_embeddings(self) -> int:
+        if not self._initialized:
+            await self.initialize()
+
+        return len(self._chunks)
+
+    async def iter_chunk_embeddings(
+        self, batch_size: int = 1000
+    ) -> AsyncIterator[Tuple[str, List[float]]]:
+        if not self._initialized:
+            await self.initialize()
+
+        for row, chunk in enumerate(self._chunks):
+            yield chunk["chunk_id"], self._embeddings[row].tolist()
+
+    # -----------------------------
+    # Documents
+    # -----------------------------
+    def _to_metadata_fields(self, source: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "document_id": source["document_id"],
+            "title": source["title"],
+            "authors": source.get("authors"),
+            "abstract": source.get("abstract"),
+            "publication_date": source.get("publication_date"),
+            "source": source["source"],
+            "filename": source["filename"],
+            "num_pages": source.get("num_pages"),
+            "num_chunks": source["num_chunks"],
+            "upload_date": source["upload_date"],
+            "file_size": source["file_size"],
+        }
+
+    async def list_documents(
+        self, limit: int = 10, offset: int = 0
+    ) -> List[DocumentMetadata]:
+        if not self._initialized:
+            await self.initialize()
+
+        ordered = sorted(
+            self._documents.values(),
+            key=lambda doc: doc["upload_date"],
+            reverse=True,
+        )
+
+        return [
+            DocumentMetadata(**self._to_metadata_fields(source))
+            for source in ordered[offset : offset + limit]
+        ]
+
+    async def get_document(self, document_id: str) -> Optional[DocumentDetail]:
+        if not self._initialized:
+            await self.initialize()
+
+        source = self._documents.get(document_id)
+        if source is None:
+            logger.error(f"Error getting document {document_id}: not found")
+            return None
+
+        return DocumentDetail(
+            **self._to_metadata_fields(source),
+            content_preview=source.get("content", "")[:500],
+            tags=None,
+        )
+
+    def _delete_chunks(self, document_id: str) -> int:
+        return self._delete_rows(lambda chunk: chunk["document_id"] == document_id)
+
+    def _delete_rows(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        num_rows = len(self._chunks)
+        keep_rows = np.array(
+            [row for row, chunk in enumerate(self._chunks) if not predicate(chunk)],
+            dtype=np.int64,
+        )
+
+        deleted = num_rows - len(keep_rows)
+        if deleted:
+            self._remap_postings(keep_rows, num_rows)
+            self._rewrite_chunks(keep_rows)
+
+        return deleted
+
+    async def delete_document(self, document_id: str) -> bool:
+        if not self._initialized:
+            await self.initialize()
+
+        if document_id not in self._documents:
+            logger.error(f"Error deleting document {document_id}: not found")
+            return False
+
+        del self._documents[document_id]
+        self._write_documents()
+        self.generation += 1
+
+        deleted = self._delete_chunks(document_id)
+        logger.info(f"Deleted {deleted} chunks for document {document_id}")
+
+        return True
+
+    async def close(self):
+        # Releasing the reference unmaps the embedding file
+        self._embeddings = np.empty((0, self.dimension), dtype=np.float32)
+        self._initialized = False
+        logger.info("In-memory search index closed")
@@ -0,0 +1,353 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small registry of labelled counters and histograms that the pipeline
+records into and /metrics renders. Gauges that already live elsewhere
+(admission, validation and judge queues) are read at scrape time through
+gauge callbacks instead of being copied on every change.
+"""
+
+import math
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.core.tracing import tracer
+
+# Seconds: from fast in-memory searches up to slow local LLM generations
+LATENCY_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# API endpoint serving the current request, set by the route handlers
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="none")
+
+GaugeSamples = Iterable[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], **extra: str) -> Dict[str, str]:
+        return {**dict(zip(self.labelnames, key)), **extra}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[slot] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the duration of the with-block, also when it raises"""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = [
+                (key, list(counts), self._sums[key])
+                for key, counts in sorted(self._counts.items())
+            ]
+
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = self._labels(key, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            labels = _format_labels(self._labels(key))
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], GaugeSamples]):
+        super().__init__(name, help)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+            for labels, value in self.callback()
+        ]
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter whose totals are kept elsewhere and read at scrape time"""
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def gauge_callback(
+        self, name: str, help: str, callback: Callable[[], GaugeSamples]
+    ) -> CallbackGauge:
+        return self._register(CallbackGauge(name, help, callback))
+
+    def counter_callback(
+        self, name: str, help: str, callback: Callable[[], GaugeSamples]
+    ) -> CallbackCounter:
+        """The callback must return totals that only grow"""
+        return self._register(CallbackCounter(name, help, callback))
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+EMBEDDING_SECONDS = REGISTRY.histogram(
+    "papyrus_embedding_seconds", "Time to encode texts", ["kind"]
+)
+EMBEDDING_BATCH_SIZE = REGISTRY.histogram(
+    "papyrus_embedding_batch_size", "Texts per encode call", ["kind"], SIZE_BUCKETS
+)
+SEARCH_SECONDS = REGISTRY.histogram(
+    "papyrus_search_seconds", "BM25, kNN and document search latency", ["kind", "mode"]
+)
+FUSION_SECONDS = REGISTRY.histogram(
+    "papyrus_fusion_seconds", "Rank fusion, boosting and reranking time"
+)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "papyrus_llm_time_to_first_token_seconds",
+    "Time until the first streamed token",
+    ["provider", "template", "endpoint"],
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "papyrus_llm_generation_seconds",
+    "Total answer generation time",
+    ["provider", "template", "endpoint"],
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "papyrus_llm_tokens_per_second",
+    "Answer tokens generated per second",
+    ["provider", "template", "endpoint"],
+    RATE_BUCKETS,
+)
+LLM_ERRORS = REGISTRY.counter(
+    "papyrus_llm_errors_total", "Failed answer generations", ["provider", "endpoint"]
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "papyrus_admission_wait_seconds",
+    "Time requests queued for a stage slot, admitted or timed out",
+    ["stage"],
+)
+VALIDATION_SECONDS = REGISTRY.histogram(
+    "papyrus_validation_seconds", "Structural and evidence validation time"
+)
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "papyrus_ingest_stage_seconds", "Ingestion time per stage", ["stage", "source"]
+)
+INGEST_CHUNKS_PER_SECOND = REGISTRY.histogram(
+    "papyrus_ingest_chunks_per_second",
+    "Chunks ingested per second of processing and indexing",
+    ["source"],
+    RATE_BUCKETS,
+)
+INGEST_CHUNKS = REGISTRY.counter(
+    "papyrus_ingest_chunks_total", "Chunks ingested", ["source"]
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "papyrus_cache_requests_total",
+    "Cache lookups by outcome (hit rate = hit / all)",
+    ["cache", "result"],
+)
+
+
+class GenerationTimer:
+    """
+    Records one answer generation: time to first token (streams only),
+    total time and tokens per second, labelled with the provider, the
+    prompt template and the endpoint serving the request. The generation
+    is also an "llm.generate" span in the current trace.
+    """
+
+    def __init__(self, provider: str, template: str):
+        self.labels = {
+            "provider": provider,
+            "template": template,
+            "endpoint": current_endpoint.get(),
+        }
+        # Not made current: streams keep it open across yields
+        self.span = tracer.start_span(
+            "llm.generate", provider=provider, template=template
+        )
+        self.start = perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = perf_counter()
+            ttft = self.first_token_at - self.start
+            LLM_TTFT_SECONDS.observe(ttft, **self.labels)
+            if self.span:
+                self.span.set_attribute("ttft_ms", round(1000 * ttft, 1))
+
+    def finish(self, tokens: Optional[int]):
+        end = perf_counter()
+        LLM_SECONDS.observe(end - self.start, **self.labels)
+
+        # Decode rate: streams exclude the wait for the first token
+        decode_time = end - (self.first_token_at or self.start)
+        if tokens and decode_time > 0:
+            LLM_TOKENS_PER_SECOND.observe(tokens / decode_time, **self.labels)
+
+        if self.span:
+            self.span.set_attribute("tokens", tokens)
+            self.span.finish()
+
+    def fail(self, error: Optional[BaseException] = None):
+        LLM_ERRORS.inc(
+            provider=self.labels["provider"], endpoint=self.labels["endpoint"]
+        )
+        if self.span:
+            self.span.finish(error=error)
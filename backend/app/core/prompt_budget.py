@@ -0,0 +1,170 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+from app.config import settings
+from app.core.prompt_templates import get_prompt_template, get_system_prompt
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Context windows of the hosted models we route to (tokens)
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Never squeeze generation or context below these
+MIN_GENERATION_TOKENS = 32
+MIN_CONTEXT_TOKENS = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+class TokenCounter:
+    """
+    Counts tokens with a Hugging Face `tokenizers` tokenizer.
+
+    PROMPT_TOKENIZER names a hub repo or local model directory; empty uses the
+    embedding model's tokenizer, which is already on disk and errs on the high
+    side for Llama-family BPE vocabularies. "chars" (or a tokenizer that fails
+    to load) falls back to a character estimate.
+    """
+
+    def __init__(self, tokenizer_name: Optional[str] = None):
+        self.tokenizer_name = (
+            tokenizer_name or settings.PROMPT_TOKENIZER or settings.EMBEDDING_MODEL
+        )
+        self.tokenizer = None
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if self.tokenizer_name == "chars":
+            return
+
+        try:
+            from tokenizers import Tokenizer
+
+            if os.path.isdir(self.tokenizer_name):
+                path = os.path.join(self.tokenizer_name, "tokenizer.json")
+                self.tokenizer = Tokenizer.from_file(path)
+            else:
+                self.tokenizer = Tokenizer.from_pretrained(self.tokenizer_name)
+            self.tokenizer.no_truncation()
+            logger.info(f"Prompt token counter using {self.tokenizer_name}")
+        except Exception as e:
+            logger.warning(
+                f"Could not load tokenizer {self.tokenizer_name} ({e}), "
+                "using character-based token estimates"
+            )
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self._load()
+        if self.tokenizer is None:
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        if not self._loaded:
+            self._load()
+        if self.tokenizer is None:
+            return [estimate_tokens(text) for text in texts]
+        encodings = self.tokenizer.encode_batch(texts, add_special_tokens=False)
+        return [len(encoding.ids) for encoding in encodings]
+
+
+@lru_cache()
+def get_token_counter() -> TokenCounter:
+    return TokenCounter()
+
+
+@dataclass
+class PromptPlan:
+    context_budget: int
+    max_tokens: int
+    context_window: int
+
+
+class PromptBudgetManager:
+    """
+    Fits context and generation length into a model's context window.
+
+    System prompt and template tokens are counted once per template; per
+    request only the query and the (already compressed) context are counted.
+    """
+
+    def __init__(self, context_window: int, counter: Optional[TokenCounter] = None):
+        self.context_window = context_window
+        self.counter = counter or get_token_counter()
+        self.margin = max(64, context_window // 50)
+        self._template_tokens: Dict[str, int] = {}
+
+    @classmethod
+    def for_model(
+        cls, model: str, counter: Optional[TokenCounter] = None
+    ) -> "PromptBudgetManager":
+        window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+        return cls(window, counter)
+
+    def template_tokens(self, template_name: str) -> int:
+        if template_name not in self._template_tokens:
+            template = get_prompt_template(template_name)
+            self._template_tokens[template_name] = self.counter.count(
+                get_system_prompt()
+            ) + self.counter.count(template.format(context="", query=""))
+        return self._template_tokens[template_name]
+
+    def plan(
+        self,
+        template_name: str,
+        query: str,
+        max_tokens: int,
+    ) -> PromptPlan:
+        """Split the window between context and generation for one request"""
+        reserved = (
+            self.template_tokens(template_name)
+            + self.counter.count(query)
+            + self.margin
+        )
+
+        available = self.context_window - reserved - max_tokens
+        if available < MIN_CONTEXT_TOKENS:
+            # Shorten the answer before starving the context
+            shortfall = MIN_CONTEXT_TOKENS - available
+            max_tokens = max(MIN_GENERATION_TOKENS, max_tokens - shortfall)
+            available = self.context_window - reserved - max_tokens
+
+        context_budget = max(0, min(settings.CONTEXT_TOKEN_BUDGET, available))
+
+        return PromptPlan(
+            context_budget=context_budget,
+            max_tokens=max_tokens,
+            context_window=self.context_window,
+        )
+
+    def prompt_tokens(self, template_name: str, context: str, query: str) -> int:
+        return (
+            self.template_tokens(template_name)
+            + self.counter.count(context)
+            + self.counter.count(query)
+        )
+
+    def fit_max_tokens(self, plan: PromptPlan, prompt_tokens: int) -> int:
+        """Final generation limit once the actual prompt size is known"""
+        room = self.context_window - prompt_tokens - self.margin
+        if room < plan.max_tokens:
+            logger.warning(
+                f"Prompt uses {prompt_tokens}/{self.context_window} tokens, "
+                f"limiting generation to {max(MIN_GENERATION_TOKENS, room)}"
+            )
+        return max(MIN_GENERATION_TOKENS, min(plan.max_tokens, room))
@@ -273,14 +273,17 @@ PARAMETER DEFINITION RULE
 
 """
 
-PROMPT_TEMPLATES = {
-    "default": f"""{BASE_INSTRUCTIONS}
+# Static instructions go in the system message, byte-identical for every
+# request and template, so provider-side prefix caching can reuse them.
+# Templates below hold only the per-request suffix (context + question).
+SYSTEM_PROMPT = BASE_INSTRUCTIONS.strip()
 
-Context from research papers:
-{{context}}
+PROMPT_TEMPLATES = {
+    "default": """Context from research papers:
+{context}
 
 Question:
-{{query}}
+{query}
 
 CRITICAL REMINDERS:
 1. Only use information from the context above. Each factual claim must cite [Source X].
@@ -290,66 +293,61 @@ CRITICAL REMINDERS:
 
 Answer the question based on the context provided. For overview questions, provide a comprehensive summary.
 """,
-    "academic": f"""{BASE_INSTRUCTIONS}
-
-Context from peer-reviewed research:
-{{context}}
+    "academic": """Context from peer-reviewed research:
+{context}
 
 Research Question:
-{{query}}
+{query}
 
 CRITICAL: Only use context above. Cite every claim. Answer ONLY the specific question - do NOT add unrequested information.
 
 Respond in formal academic tone.
 """,
-    "detailed": f"""{BASE_INSTRUCTIONS}
-
-Context from papers:
-{{context}}
+    "detailed": """Context from papers:
+{context}
 
 Question:
-{{query}}
+{query}
 
 CRITICAL: Only use context above. Do not mix papers without identifying them. Answer the specific question asked - stay focused on the topic.
 
 Provide a structured and detailed explanation.
 """,
-    "comparative": f"""{BASE_INSTRUCTIONS}
-
-Context:
-{{context}}
+    "comparative": """Context:
+{context}
 
 Question:
-{{query}}
+{query}
 
 Generate a comparison table strictly following the Differentiation Rule.
 """,
-    "authors": f"""{BASE_INSTRUCTIONS}
-
-Context:
-{{context}}
+    "authors": """Context:
+{context}
 
 Question:
-{{query}}
+{query}
 
 List the authors in table format following the Author Information Rule.
 """,
-    "summary": f"""{BASE_INSTRUCTIONS}
-
-Context:
-{{context}}
+    "summary": """Context:
+{context}
 
 Question:
-{{query}}
+{query}
 
 Provide a concise bullet-point summary.
 """,
 }
 
 
+def get_system_prompt() -> str:
+    """Return the shared, static system prompt."""
+    return SYSTEM_PROMPT
+
+
 def get_prompt_template(template_name: str = "default") -> str:
     """
-    Return the selected prompt template.
+    Return the selected per-request prompt template.
     Falls back to 'default' if template name is invalid.
     """
     return PROMPT_TEMPLATES.get(template_name, PROMPT_TEMPLATES["default"])
@@ -0,0 +1,86 @@
+"""
+Incremental re-ingestion of a new version of an indexed document.
+
+The new text is chunked as usual and each chunk's content hash is matched
+against the hashes already indexed for the document. Matching chunks stay
+in place with their stored embeddings, only new or changed chunks are
+embedded, and chunks whose text disappeared are deleted. The store applies
+the whole change in one bulk request.
+"""
+
+from typing import Dict, List, Optional
+from app.core.admission import AdmissionController
+from app.core.embedding_service import EmbeddingService, embed_with_admission
+from app.core.metrics import INGEST_STAGE_SECONDS
+from app.models.document import ChunkDiff, Document, DocumentChunk
+from app.utils.helpers import generate_chunk_id, hash_chunk_content, pool_embeddings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def diff_chunks(
+    document_id: str, chunks: List[DocumentChunk], indexed_hashes: Dict[str, str]
+) -> ChunkDiff:
+    """
+    Match new chunks to indexed ones (chunk_id -> content hash) by content.
+    Added chunks are renumbered so they never reuse an indexed chunk's id.
+    """
+    ids_by_hash: Dict[str, List[str]] = {}
+    for chunk_id, content_hash in sorted(indexed_hashes.items()):
+        ids_by_hash.setdefault(content_hash, []).append(chunk_id)
+
+    diff = ChunkDiff()
+    for chunk in chunks:
+        content_hash = chunk.content_hash or hash_chunk_content(chunk.content)
+        matches = ids_by_hash.get(content_hash)
+        if matches:
+            diff.kept[matches.pop(0)] = chunk
+        else:
+            diff.added.append(chunk)
+
+    diff.removed = [chunk_id for ids in ids_by_hash.values() for chunk_id in ids]
+
+    next_index = 0
+    for chunk in diff.added:
+        while generate_chunk_id(document_id, next_index) in indexed_hashes:
+            next_index += 1
+        chunk.chunk_id = generate_chunk_id(document_id, next_index)
+        next_index += 1
+
+    return diff
+
+
+async def reingest_document(
+    es_client,
+    embedding_service: EmbeddingService,
+    document: Document,
+    admission: Optional[AdmissionController] = None,
+) -> ChunkDiff:
+    """Bring the indexed copy of document up to date, embedding only changes"""
+    indexed_hashes = await es_client.get_chunk_hashes(document.document_id)
+    diff = diff_chunks(document.document_id, document.chunks, indexed_hashes)
+
+    if diff.added:
+        with INGEST_STAGE_SECONDS.time(stage="embed", source=document.source):
+            embeddings = await embed_with_admission(
+                embedding_service, [chunk.content for chunk in diff.added], admission
+            )
+        for chunk, embedding in zip(diff.added, embeddings):
+            chunk.embedding = embedding
+
+    # The document embedding pools every current chunk, kept ones included
+    kept = await es_client.get_chunks(list(diff.kept), include_embedding=True)
+    document.embedding = pool_embeddings(
+        [chunk["embedding"] for chunk in kept if chunk.get("embedding") is not None]
+        + [chunk.embedding for chunk in diff.added]
+    )
+
+    with INGEST_STAGE_SECONDS.time(stage="index", source=document.source):
+        await es_client.update_document(document, diff)
+
+    logger.info(
+        f"Re-ingested document {document.document_id}: {len(diff.added)} added, "
+        f"{len(diff.kept)} kept, {len(diff.removed)} removed"
+    )
+    return diff
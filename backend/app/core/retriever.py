@@ -1,7 +1,16 @@
-from typing import List, Dict, Any
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from typing import Awaitable, List, Dict, Any, Optional, Tuple
+from app.core.admission import AdmissionController
+from app.core.ann_index import AnnVectorSearcher
 from app.core.elasticsearch_client import ElasticsearchClient
 from app.core.embedding_service import EmbeddingService
+from app.core.metrics import FUSION_SECONDS, SEARCH_SECONDS
+from app.core.reranker import CrossEncoderReranker
+from app.core.tracing import tracer
+from app.models.schemas import SearchFilters
 from app.utils.helpers import reciprocal_rank_fusion
+from app.utils.query_analysis import QueryAnalysis, analyze_query
 from app.config import settings
 from app.utils.logger import setup_logger
 
@@ -13,35 +22,28 @@ class HybridRetriever:
         self,
         es_client: ElasticsearchClient,
         embedding_service: EmbeddingService,
+        ann_searcher: Optional[AnnVectorSearcher] = None,
+        reranker: Optional[CrossEncoderReranker] = None,
+        admission: Optional[AdmissionController] = None,
     ):
         self.es_client = es_client
         self.embedding_service = embedding_service
-
-    # -----------------------------
-    # Query intent classification
-    # -----------------------------
-    def _classify_query(self, query: str) -> str:
-        q = query.lower()
-
-        if any(k in q for k in ["what is", "define"]):
-            return "definition"
-
-        if any(k in q for k in ["parameter", "parameters", "weights", "matrix"]):
-            return "parameters"
-
-        if any(k in q for k in ["evidence", "signatures", "identify", "observational"]):
-            return "observation"
-
-        if any(k in q for k in ["compare", "differentiate", "contrast"]):
-            return "comparison"
-
-        if any(k in q for k in ["why", "argue", "explain"]):
-            return "explanation"
-
-        if any(k in q for k in ["conclude", "overall", "dynamical state"]):
-            return "conclusion"
-
-        return "general"
+        self.ann_searcher = ann_searcher
+        self.reranker = reranker
+        self.admission = admission
+
+    def _stage(self, name: str):
+        """Concurrency slot for a pipeline stage (no-op without admission)"""
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.stage(name).slot()
+
+    @asynccontextmanager
+    async def _step(self, stage: str, span_name: str, **attributes):
+        """Trace span over a stage slot, so queueing shows in the waterfall"""
+        with tracer.span(span_name, **attributes):
+            async with self._stage(stage):
+                yield
 
     # -----------------------------
     # Section-based score boosting
@@ -65,7 +67,25 @@ class HybridRetriever:
         self,
         query: str,
         top_k: int = 6,
+        analysis: Optional[QueryAnalysis] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fused BM25 and vector results; filters restrict both searches to
+        matching documents before ranking.
+        """
+        filtered = filters is not None and not filters.is_empty()
+        with tracer.span("hybrid_search", top_k=top_k, filtered=filtered):
+            return await self._hybrid_search(query, top_k, analysis, filters)
+
+    async def _hybrid_search(
+        self,
+        query: str,
+        top_k: int,
+        analysis: Optional[QueryAnalysis],
+        filters: Optional[SearchFilters],
     ) -> List[Dict[str, Any]]:
+        analysis = analysis or analyze_query(query)
 
         # Ensure services are initialized
         if not self.es_client._initialized:
@@ -74,32 +94,177 @@ class HybridRetriever:
         if not self.embedding_service._initialized:
             self.embedding_service.initialize()
 
-        intent = self._classify_query(query)
+        fuse_k, search_k = self._candidate_sizes(top_k)
+
+        # Query encoding runs off the event loop
+        async with self._step("embedding", "embed_query"):
+            query_embedding = await asyncio.to_thread(
+                self.embedding_service.embed_text, query
+            )
+        analysis.embedding = query_embedding
+
+        # Two-stage mode: pick the nearest papers, then search only their chunks
+        if settings.RETRIEVAL_MODE == "hierarchical":
+            top_documents = settings.HIERARCHICAL_TOP_DOCUMENTS
+            async with self._step("search", "document_search", top_k=top_documents):
+                with SEARCH_SECONDS.time(kind="documents", mode="single"):
+                    documents = await self.es_client.document_search(
+                        query_embedding, top_k=top_documents, filters=filters
+                    )
+            filters = self._within_documents(filters, documents)
+
+        # BM25 retrieval
+        async with self._step("search", "bm25_search", top_k=search_k):
+            with SEARCH_SECONDS.time(kind="bm25", mode="single"):
+                bm25_results = await self.es_client.bm25_search(
+                    query,
+                    top_k=search_k,
+                    filters=filters,
+                )
+
+        # Vector retrieval
+        vector_searcher = self.ann_searcher or self.es_client
+        async with self._step("search", "vector_search", top_k=search_k):
+            with SEARCH_SECONDS.time(kind="knn", mode="single"):
+                vector_results = await vector_searcher.vector_search(
+                    query_embedding,
+                    top_k=search_k,
+                    filters=filters,
+                )
+
+        with tracer.span("fuse"), FUSION_SECONDS.time():
+            return await self._fuse(
+                query, top_k, fuse_k, bm25_results, vector_results, analysis
+            )
+
+    async def hybrid_search_batch(
+        self,
+        queries: List[str],
+        top_ks: List[int],
+        analyses: Optional[List[QueryAnalysis]] = None,
+        filters: Optional[List[Optional[SearchFilters]]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Same results as hybrid_search per query, with one embedding pass and
+        one batched round trip each for BM25 and vector search.
+        """
+        if not queries:
+            return []
+
+        if not self.es_client._initialized:
+            await self.es_client.initialize()
+
+        if not self.embedding_service._initialized:
+            self.embedding_service.initialize()
+
+        analyses = analyses or [analyze_query(query) for query in queries]
+        sizes = [self._candidate_sizes(top_k) for top_k in top_ks]
+        search_ks = [search_k for _, search_k in sizes]
+
+        async with self._step("embedding", "embed_queries", queries=len(queries)):
+            query_embeddings = await asyncio.to_thread(
+                self.embedding_service.embed_batch, queries
+            )
+        for analysis, query_embedding in zip(analyses, query_embeddings):
+            analysis.embedding = query_embedding
+
+        filters = filters or [None] * len(queries)
+        if settings.RETRIEVAL_MODE == "hierarchical":
+            async with self._step("search", "document_search_batch"):
+                document_batches = await self._timed_search(
+                    "documents",
+                    self.es_client.document_search_batch(
+                        query_embeddings,
+                        [settings.HIERARCHICAL_TOP_DOCUMENTS] * len(queries),
+                        filters,
+                    ),
+                )
+            filters = [
+                self._within_documents(query_filters, documents)
+                for query_filters, documents in zip(filters, document_batches)
+            ]
+
+        vector_searcher = self.ann_searcher or self.es_client
+        async with self._step("search", "search_batch"):
+            bm25_batches, vector_batches = await asyncio.gather(
+                self._timed_search(
+                    "bm25",
+                    self.es_client.bm25_search_batch(queries, search_ks, filters),
+                ),
+                self._timed_search(
+                    "knn",
+                    vector_searcher.vector_search_batch(
+                        query_embeddings, search_ks, filters
+                    ),
+                ),
+            )
+
+        results = []
+        for i, query in enumerate(queries):
+            with tracer.span("fuse"), FUSION_SECONDS.time():
+                results.append(
+                    await self._fuse(
+                        query,
+                        top_ks[i],
+                        sizes[i][0],
+                        bm25_batches[i],
+                        vector_batches[i],
+                        analyses[i],
+                    )
+                )
+        return results
+
+    @staticmethod
+    async def _timed_search(kind: str, search: Awaitable[Any]) -> Any:
+        with tracer.span(f"{kind}_search"), SEARCH_SECONDS.time(
+            kind=kind, mode="batch"
+        ):
+            return await search
+
+    @staticmethod
+    def _within_documents(
+        filters: Optional[SearchFilters], documents: List[Dict[str, Any]]
+    ) -> Optional[SearchFilters]:
+        """
+        Narrow the filters to the papers picked by the document stage. With
+        no paper picked (no document embeddings yet) the search stays flat.
+        """
+        if not documents:
+            return filters
+
+        document_ids = [document["document_id"] for document in documents]
+        return (filters or SearchFilters()).model_copy(
+            update={"document_ids": document_ids}
+        )
+
+    def _candidate_sizes(self, top_k: int) -> Tuple[int, int]:
+        # Fuse a wider candidate pool when a reranker will pick the final few
+        fuse_k = max(top_k, settings.RERANK_CANDIDATES) if self.reranker else top_k
+
+        # Slight over-fetch for fusion
+        search_k = max(fuse_k, int(fuse_k * settings.SEARCH_OVERFETCH))
+
+        return fuse_k, search_k
+
+    async def _fuse(
+        self,
+        query: str,
+        top_k: int,
+        fuse_k: int,
+        bm25_results: List[Dict[str, Any]],
+        vector_results: List[Dict[str, Any]],
+        analysis: QueryAnalysis,
+    ) -> List[Dict[str, Any]]:
+        intent = analysis.retrieval_intent
 
         # Intent-aware weighting
         if intent in {"parameters", "observation", "comparison"}:
-            bm25_weight = 0.65
-            vector_weight = 0.35
+            bm25_weight = settings.INTENT_BM25_WEIGHT
+            vector_weight = settings.INTENT_VECTOR_WEIGHT
         else:
             bm25_weight = settings.BM25_WEIGHT
             vector_weight = settings.VECTOR_WEIGHT
 
-        # Slight over-fetch for fusion
-        search_k = int(top_k * 1.5)
-
-        # BM25 retrieval
-        bm25_results = await self.es_client.bm25_search(
-            query,
-            top_k=search_k,
-        )
-
-        # Vector retrieval
-        query_embedding = self.embedding_service.embed_text(query)
-        vector_results = await self.es_client.vector_search(
-            query_embedding,
-            top_k=search_k,
-        )
-
         # Prepare RRF inputs
         bm25_tuples = [(r["chunk_id"], r) for r in bm25_results]
         vector_tuples = [(r["chunk_id"], r) for r in vector_results]
@@ -107,7 +272,7 @@ class HybridRetriever:
         fused = reciprocal_rank_fusion(
             bm25_results=bm25_tuples,
             vector_results=vector_tuples,
-            k=60,
+            k=settings.RRF_K,
             bm25_weight=bm25_weight,
             vector_weight=vector_weight,
         )
@@ -127,7 +292,7 @@ class HybridRetriever:
             final_results.append(chunk_data)
             seen_ids.add(chunk_id)
 
-            if len(final_results) >= top_k:
+            if len(final_results) >= fuse_k:
                 break
 
         # -----------------------------
@@ -149,7 +314,12 @@ class HybridRetriever:
             final_results,
             key=lambda x: x["score"],
             reverse=True,
-        )[:top_k]
+        )[:fuse_k]
+
+        if self.reranker is not None:
+            final_results = await self.reranker.rerank(
+                query, final_results, top_n=min(top_k, settings.RERANK_TOP_N)
+            )
 
         logger.info(
             f"Hybrid search returned {len(final_results)} results "
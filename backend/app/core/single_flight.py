@@ -0,0 +1,119 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List
+from app.core.metrics import CACHE_REQUESTS
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the answer"""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+class StreamBroadcast:
+    """
+    Runs one async iterator and fans its items out to any number of readers.
+
+    Every item is kept, so a reader that joins late replays the stream from
+    the start before following it live.
+    """
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self._buffer: List[Any] = []
+        self._done = False
+        self._error = None
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                async with self._changed:
+                    self._buffer.append(item)
+                    self._changed.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            async with self._changed:
+                self._done = True
+                self._changed.notify_all()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def add_done_callback(self, callback: Callable[[], Any]):
+        """Call back once the source is exhausted, with or without readers"""
+        self._task.add_done_callback(lambda _: callback())
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(
+                    lambda: position < len(self._buffer) or self._done
+                )
+                items = self._buffer[position:]
+                finished = self._done
+
+            for item in items:
+                yield item
+            position += len(items)
+
+            if finished and position >= len(self._buffer):
+                if self._error is not None:
+                    raise self._error
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work.
+
+    While a call for a key is in flight, later calls with the same key wait
+    for (or, for streams, attach to) that call instead of starting another.
+    Results are not cached: once the leader finishes, the next call runs anew.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, StreamBroadcast] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            CACHE_REQUESTS.inc(cache="single_flight", result="miss")
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            CACHE_REQUESTS.inc(cache="single_flight", result="hit")
+            self.coalesced += 1
+            logger.info("Joined in-flight query")
+
+        # Shielded: one caller disconnecting must not cancel the shared run
+        return await asyncio.shield(task)
+
+    async def stream(
+        self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        broadcast = self._streams.get(key)
+        if broadcast is None or broadcast.done:
+            CACHE_REQUESTS.inc(cache="single_flight", result="miss")
+            broadcast = StreamBroadcast(factory())
+            self._streams[key] = broadcast
+            # Unregister from the pump: every reader may have left by then
+            broadcast.add_done_callback(lambda: self._forget_stream(key, broadcast))
+        else:
+            CACHE_REQUESTS.inc(cache="single_flight", result="hit")
+            self.coalesced += 1
+            logger.info("Joined in-flight query stream")
+
+        async for item in broadcast.subscribe():
+            yield item
+
+    def _forget_stream(self, key: Hashable, broadcast: StreamBroadcast):
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
@@ -0,0 +1,290 @@
+"""
+Lightweight in-process span tracing.
+
+Spans nest through a contextvar, so code that awaits, or that runs under
+asyncio.to_thread / create_task, attaches to the request's trace without
+passing anything around. Finished traces go to a local exporter (JSONL file
+or the log) and into a small buffer that /debug/traces renders as
+waterfalls. No external collector is involved.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter, time
+from typing import Any, Dict, Iterator, List, Optional
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+WATERFALL_WIDTH = 40
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(
+        self,
+        name: str,
+        trace: "Trace",
+        parent: Optional["Span"],
+        attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.attributes = dict(attributes)
+        self.error: Optional[str] = None
+        self.start = perf_counter()
+        self.end: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else perf_counter()
+        return 1000 * (end - self.start)
+
+    def finish(self, error: Optional[BaseException] = None):
+        if self.end is not None:
+            return
+        self.end = perf_counter()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.tracer._on_span_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "offset_ms": round(1000 * (self.start - self.trace.root.start), 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans under one root span"""
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time()
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            if self.root is None:
+                self.root = span
+            self.spans.append(span)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.root.error,
+            "spans": [span.to_dict() for span in spans],
+        }
+
+    def waterfall(self, width: int = WATERFALL_WIDTH) -> List[str]:
+        """One line per span: bar positioned on the root's timeline"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+
+        total = max(self.duration_ms, 1e-6)
+        name_width = max(2 * span.depth + len(span.name) for span in spans)
+        lines = [f"{self.root.name} {self.trace_id[:8]} {self.duration_ms:.1f}ms"]
+        for span in spans:
+            offset = 1000 * (span.start - self.root.start)
+            left = int(width * offset / total)
+            length = max(1, round(width * span.duration_ms / total))
+            bar = " " * left + "#" * min(length, width - left)
+            label = ("  " * span.depth + span.name).ljust(name_width)
+            status = " !" if span.error else ""
+            lines.append(
+                f"{label} |{bar.ljust(width)}| {offset:8.1f} +{span.duration_ms:.1f}ms{status}"
+            )
+        return lines
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished trace"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class ConsoleExporter:
+    """Logs the waterfall of each finished trace"""
+
+    def export(self, trace: Trace):
+        logger.info("Trace\n" + "\n".join(trace.waterfall()))
+
+
+class Tracer:
+    """
+    Starts spans and keeps the most recent finished traces.
+
+    Traces shorter than min_export_ms are still buffered for /debug/traces
+    but not exported, so the exporter only sees the slow ones.
+    """
+
+    def __init__(
+        self,
+        exporters: Optional[List[Any]] = None,
+        buffer_size: int = 200,
+        min_export_ms: float = 0.0,
+        enabled: bool = True,
+    ):
+        self.exporters = exporters or []
+        self.min_export_ms = min_export_ms
+        self.enabled = enabled
+        self.finished: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "Tracer":
+        exporters = []
+        if settings.TRACE_EXPORTER == "jsonl":
+            exporters.append(JsonlExporter(settings.TRACE_FILE))
+        elif settings.TRACE_EXPORTER == "console":
+            exporters.append(ConsoleExporter())
+
+        return cls(
+            exporters=exporters,
+            buffer_size=settings.TRACE_BUFFER_SIZE,
+            min_export_ms=settings.TRACE_EXPORT_MIN_MS,
+            enabled=settings.TRACING_ENABLED,
+        )
+
+    def start_span(
+        self, name: str, root: bool = False, **attributes: Any
+    ) -> Optional[Span]:
+        """
+        Start a span under the current one without making it current.
+
+        For spans that stay open across yields of a generator, where the
+        contextvar would leak into (or be reset from) the consumer's context.
+        root=True starts a new trace even inside another span's context.
+        """
+        if not self.enabled:
+            return None
+
+        parent = None if root else _current_span.get()
+        trace = parent.trace if parent else Trace(self)
+        span = Span(name, trace, parent, attributes)
+        trace.add(span)
+        return span
+
+    @contextmanager
+    def span(
+        self, name: str, root: bool = False, **attributes: Any
+    ) -> Iterator[Optional[Span]]:
+        """Time the with-block as a child of the current span (or a new trace)"""
+        span = self.start_span(name, root=root, **attributes)
+        if span is None:
+            yield None
+            return
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(error=e)
+            raise
+        finally:
+            span.finish()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Closed from another context (e.g. an abandoned generator)
+                pass
+
+    def _on_span_end(self, span: Span):
+        if span.parent is not None:
+            return
+
+        trace = span.trace
+        with self._lock:
+            self.finished.append(trace)
+
+        if trace.duration_ms < self.min_export_ms:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                logger.warning(f"Trace export failed: {str(e)}")
+
+    def recent(self, min_duration_ms: float = 0.0, limit: int = 20) -> List[Trace]:
+        """Finished traces at least min_duration_ms long, slowest first"""
+        with self._lock:
+            traces = [t for t in self.finished if t.duration_ms >= min_duration_ms]
+        traces.sort(key=lambda trace: trace.duration_ms, reverse=True)
+        return traces[:limit]
+
+
+tracer = Tracer.from_settings()
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware making each API request the root span of a trace.
+
+    Pure ASGI rather than an http middleware so the span stays open until a
+    streamed response body has been fully sent.
+    """
+
+    def __init__(self, app, path_prefix: str = ""):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.span(f"{scope['method']} {scope['path']}") as span:
+
+            async def send_with_status(message):
+                if span and message["type"] == "http.response.start":
+                    span.set_attribute("status", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
@@ -0,0 +1,212 @@
+import asyncio
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from app.config import settings
+from app.core.metrics import VALIDATION_SECONDS
+from app.core.tracing import tracer
+from app.utils.llm_judge import LLMJudge
+from app.utils.logger import setup_logger
+from app.utils.query_analysis import QueryAnalysis
+from app.utils.validators import AnswerValidator, ValidationResult
+
+logger = setup_logger(__name__)
+
+ValidationSink = Callable[[Dict[str, ValidationResult], str], None]
+
+
+class ValidationDispatcher:
+    """
+    Runs answer validation off the request path on a small thread pool.
+
+    Validation results are only logged and counted, so responses never wait
+    for them. VALIDATION_SAMPLE_RATE picks which answers get validated and at
+    most VALIDATION_MAX_PENDING jobs are queued; beyond that jobs are dropped
+    rather than letting a backlog grow under load.
+    """
+
+    def __init__(
+        self,
+        validator: Optional[AnswerValidator] = None,
+        workers: Optional[int] = None,
+        sample_rate: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        sink: Optional[ValidationSink] = None,
+    ):
+        self.validator = validator or AnswerValidator()
+        self.sample_rate = (
+            sample_rate if sample_rate is not None else settings.VALIDATION_SAMPLE_RATE
+        )
+        self.max_pending = max_pending or settings.VALIDATION_MAX_PENDING
+        self.sink = sink or self._log_results
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or settings.VALIDATION_WORKERS,
+            thread_name_prefix="validation",
+        )
+
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.counts = Counter()
+        self.failures = Counter()
+
+    def submit(
+        self,
+        answer: str,
+        question: str,
+        context_chunks: List[str],
+        analysis: Optional[QueryAnalysis] = None,
+    ) -> bool:
+        """Queue an answer for validation; False if sampled out or dropped"""
+        with self._lock:
+            if random.random() >= self.sample_rate:
+                self.counts["sampled_out"] += 1
+                return False
+            if self.pending >= self.max_pending:
+                self.counts["dropped"] += 1
+                return False
+            self.pending += 1
+            self.counts["submitted"] += 1
+
+        self.executor.submit(self._run, answer, question, context_chunks, analysis)
+        return True
+
+    def _run(
+        self,
+        answer: str,
+        question: str,
+        context_chunks: List[str],
+        analysis: Optional[QueryAnalysis],
+    ):
+        try:
+            # Its own trace: the request's trace has usually finished by now
+            span = tracer.span("validation", root=True, query=question[:80])
+            with span, VALIDATION_SECONDS.time():
+                results = self.validator.validate_all(
+                    answer=answer,
+                    question=question,
+                    context_chunks=context_chunks,
+                    analysis=analysis,
+                )
+            self.sink(results, question)
+
+            with self._lock:
+                self.counts["completed"] += 1
+                for name, result in self.validator.get_failures(results):
+                    self.failures[name] += 1
+        except Exception as e:
+            logger.error(f"Answer validation failed: {str(e)}")
+            with self._lock:
+                self.counts["errors"] += 1
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _log_results(self, results: Dict[str, ValidationResult], question: str):
+        self.validator.log_validation_results(results, question)
+
+        failures = self.validator.get_failures(results)
+        if failures:
+            logger.warning(f"Answer validation detected {len(failures)} issue(s)")
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "sample_rate": self.sample_rate,
+                **{
+                    key: self.counts[key]
+                    for key in (
+                        "submitted",
+                        "completed",
+                        "sampled_out",
+                        "dropped",
+                        "errors",
+                    )
+                },
+                "failures": dict(self.failures),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+class JudgeDispatcher:
+    """
+    Samples answers for the LLM judge and runs them on a few async workers.
+
+    LLM_JUDGE_SAMPLE_RATE keeps judge spend a fraction of answer spend and
+    LLM_JUDGE_CONCURRENCY caps how many judge calls are in flight; when
+    LLM_JUDGE_MAX_PENDING answers are already waiting, new ones are dropped.
+    """
+
+    def __init__(
+        self,
+        judge: LLMJudge,
+        sample_rate: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.judge = judge
+        self.sample_rate = (
+            sample_rate if sample_rate is not None else settings.LLM_JUDGE_SAMPLE_RATE
+        )
+        self.concurrency = concurrency or settings.LLM_JUDGE_CONCURRENCY
+        self.queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_pending or settings.LLM_JUDGE_MAX_PENDING
+        )
+        self._workers: List[asyncio.Task] = []
+        self.counts = Counter()
+
+    def submit(self, answer: str, question: str, context_chunks: List[str]) -> bool:
+        """Queue an answer for judging; False if sampled out or dropped"""
+        if random.random() >= self.sample_rate:
+            self.counts["sampled_out"] += 1
+            return False
+
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+            ]
+
+        try:
+            self.queue.put_nowait((answer, question, context_chunks))
+        except asyncio.QueueFull:
+            self.counts["dropped"] += 1
+            return False
+
+        self.counts["submitted"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            answer, question, context_chunks = await self.queue.get()
+            try:
+                result = await self.judge.validate_answer(
+                    question, answer, context_chunks
+                )
+                self.counts["passed" if result.passed else "failed"] += 1
+                if not result.passed:
+                    logger.warning(f"{result.reason} (query: {question[:50]})")
+            except Exception as e:
+                logger.error(f"LLM judge worker error: {str(e)}")
+                self.counts["errors"] += 1
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "pending": self.queue.qsize(),
+            "sample_rate": self.sample_rate,
+            **{
+                key: self.counts[key]
+                for key in ("submitted", "passed", "failed", "sampled_out", "dropped")
+            },
+        }
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
@@ -1,20 +1,52 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from app.config import settings
 from app.api.routes import upload, query, documents
 from app.utils.logger import setup_logger
-from app.core.embedding_service import EmbeddingService
+from app.api.dependencies import (
+    close_services,
+    get_admission_controller,
+    get_judge_dispatcher,
+    get_llm_service,
+    get_validation_dispatcher,
+    warmup_services,
+)
+from app.core.admission import OverloadedError
+from app.core.llm_router import LLMRouter
+from app.core.metrics import REGISTRY
+from app.core.tracing import TraceMiddleware, tracer
 import os
 
 logger = setup_logger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
+    if settings.SEARCH_BACKEND == "memory":
+        logger.info(f"In-memory search index: {settings.MEMORY_INDEX_DIR}")
+    else:
+        logger.info(
+            f"Elasticsearch: {settings.ELASTICSEARCH_HOST}:{settings.ELASTICSEARCH_PORT}"
+        )
+    logger.info(f"Ollama: {settings.OLLAMA_HOST}")
+
+    await warmup_services()
+    yield
+
+    logger.info("Shutting down application")
+    await close_services()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="RAG System for Research Papers with Hybrid Search",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -25,6 +57,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(TraceMiddleware, path_prefix=settings.API_V1_STR)
+
 app.include_router(
     upload.router, prefix=f"{settings.API_V1_STR}/upload", tags=["upload"]
 )
@@ -34,42 +68,142 @@ app.include_router(
 )
 
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info(f"Starting {settings.PROJECT_NAME} v{settings.VERSION}")
-    logger.info(
-        f"Elasticsearch: {settings.ELASTICSEARCH_HOST}:{settings.ELASTICSEARCH_PORT}"
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(exc.retry_after)},
     )
-    logger.info(f"Ollama: {settings.OLLAMA_HOST}")
-
-    # Preload embedding model to avoid first-query delay
-    logger.info("Preloading embedding model...")
-    embedding_service = EmbeddingService()
-    embedding_service.initialize()
-    logger.info("Embedding model preloaded successfully")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("Shutting down application")
 
 
 @app.get("/health")
 async def health_check():
+    judge = get_judge_dispatcher()
+    llm_service = get_llm_service()
     return {
         "status": "healthy",
         "service": settings.PROJECT_NAME,
         "version": settings.VERSION,
+        "admission": get_admission_controller().stats(),
+        "validation": get_validation_dispatcher().stats(),
+        "llm_judge": judge.stats() if judge else None,
+        "llm_routing": (
+            llm_service.snapshot() if isinstance(llm_service, LLMRouter) else None
+        ),
     }
 
 
+def _admission_samples(key: str):
+    return lambda: [
+        ({"stage": stage}, stats[key])
+        for stage, stats in get_admission_controller().stats().items()
+    ]
+
+
+def _dispatcher_samples(get_dispatcher, keys):
+    """Samples of the dispatcher's stats; unlabelled for a single key"""
+
+    def samples():
+        dispatcher = get_dispatcher()
+        if dispatcher is None:
+            return []
+        stats = dispatcher.stats()
+        if isinstance(keys, str):
+            return [({}, stats[keys])]
+        return [({"outcome": key}, stats[key]) for key in keys]
+
+    return samples
+
+
+REGISTRY.gauge_callback(
+    "papyrus_admission_in_flight",
+    "Requests running in each stage",
+    _admission_samples("in_flight"),
+)
+REGISTRY.gauge_callback(
+    "papyrus_admission_queue_depth",
+    "Requests waiting for each stage",
+    _admission_samples("queue_depth"),
+)
+REGISTRY.counter_callback(
+    "papyrus_admission_rejected_total",
+    "Requests rejected with 429 by each stage",
+    _admission_samples("rejected"),
+)
+REGISTRY.counter_callback(
+    "papyrus_admission_timed_out_total",
+    "Requests that timed out (503) waiting for each stage",
+    _admission_samples("timed_out"),
+)
+REGISTRY.gauge_callback(
+    "papyrus_validation_jobs_pending",
+    "Background validation jobs queued or running",
+    _dispatcher_samples(get_validation_dispatcher, "pending"),
+)
+REGISTRY.counter_callback(
+    "papyrus_validation_jobs_submitted_total",
+    "Background validation jobs submitted",
+    _dispatcher_samples(get_validation_dispatcher, "submitted"),
+)
+REGISTRY.counter_callback(
+    "papyrus_validation_jobs_total",
+    "Background validation jobs by outcome",
+    _dispatcher_samples(
+        get_validation_dispatcher,
+        ["completed", "sampled_out", "dropped", "errors"],
+    ),
+)
+REGISTRY.gauge_callback(
+    "papyrus_llm_judge_jobs_pending",
+    "LLM judge jobs queued or running",
+    _dispatcher_samples(get_judge_dispatcher, "pending"),
+)
+REGISTRY.counter_callback(
+    "papyrus_llm_judge_jobs_submitted_total",
+    "LLM judge jobs submitted",
+    _dispatcher_samples(get_judge_dispatcher, "submitted"),
+)
+REGISTRY.counter_callback(
+    "papyrus_llm_judge_jobs_total",
+    "LLM judge jobs by outcome",
+    _dispatcher_samples(
+        get_judge_dispatcher, ["passed", "failed", "sampled_out", "dropped"]
+    ),
+)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of pipeline latencies, counters and queues"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/debug/traces")
+async def debug_traces(
+    min_ms: float = settings.TRACE_SLOW_MS, limit: int = 20, format: str = "text"
+):
+    """Recent traces of at least min_ms, slowest first, as stage waterfalls"""
+    traces = tracer.recent(min_duration_ms=min_ms, limit=limit)
+    if format == "json":
+        return [trace.to_dict() for trace in traces]
+
+    if not traces:
+        return PlainTextResponse(f"No traces of {min_ms:g}ms or more\n")
+    return PlainTextResponse(
+        "\n\n".join("\n".join(trace.waterfall()) for trace in traces) + "\n"
+    )
+
+
 # Serve frontend
 frontend_path = os.path.join(os.path.dirname(__file__), "..", "frontend")
 if os.path.exists(frontend_path):
 
     @app.get("/{full_path:path}")
     async def serve_frontend(full_path: str):
-        if full_path.startswith("api") or full_path == "health":
+        if full_path.startswith(("api", "debug")) or full_path in ("health", "metrics"):
             return {"error": "Not found"}
 
         if full_path == "" or full_path == "/":
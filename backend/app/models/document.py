@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+from app.utils.helpers import pool_embeddings
 
 
 @dataclass
@@ -11,7 +12,22 @@ class DocumentChunk:
     embedding: Optional[List[float]] = None
     page_number: Optional[int] = None
     section_type: Optional[str] = None
+    token_count: Optional[int] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    content_hash: Optional[str] = None
+
+
+@dataclass
+class ChunkDiff:
+    """Changes between a document's indexed chunks and a new version's"""
+
+    # New or changed chunks, to embed and index
+    added: List[DocumentChunk] = field(default_factory=list)
+    # Indexed chunk id -> the new chunk with the same text, whose position
+    # (page, section) and document title may have changed
+    kept: Dict[str, DocumentChunk] = field(default_factory=dict)
+    # Indexed chunk ids whose text is gone
+    removed: List[str] = field(default_factory=list)
 
 
 @dataclass
@@ -29,6 +45,15 @@ class Document:
     upload_date: datetime = field(default_factory=datetime.utcnow)
     chunks: List[DocumentChunk] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # Paper-level vector for two-stage retrieval; pooled from the chunks if unset
+    embedding: Optional[List[float]] = None
+
+    def document_embedding(self) -> Optional[List[float]]:
+        if self.embedding is not None:
+            return self.embedding
+        return pool_embeddings(
+            [chunk.embedding for chunk in self.chunks if chunk.embedding is not None]
+        )
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -18,6 +18,31 @@ class UploadResponse(BaseModel):
     message: str
 
 
+class ReingestResponse(UploadResponse):
+    chunks_added: int
+    chunks_kept: int
+    chunks_removed: int
+
+
+class SearchFilters(BaseModel):
+    """Restricts retrieval to matching documents; unset fields match all"""
+
+    document_ids: Optional[List[str]] = Field(default=None, min_length=1)
+    authors: Optional[List[str]] = Field(
+        default=None, min_length=1, description="Any of these exact author names"
+    )
+    source: Optional[DocumentType] = None
+    published_after: Optional[date] = Field(
+        default=None, description="Publication date on or after (inclusive)"
+    )
+    published_before: Optional[date] = Field(
+        default=None, description="Publication date on or before (inclusive)"
+    )
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_none=True)
+
+
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=1000)
     top_k: Optional[int] = Field(default=5, ge=1, le=20)
@@ -26,6 +51,11 @@ class QueryRequest(BaseModel):
         default="default",
         description="Prompt template: default, academic, detailed, comparative, summary",
     )
+    filters: Optional[SearchFilters] = None
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest] = Field(..., min_length=1, max_length=500)
 
 
 class Source(BaseModel):
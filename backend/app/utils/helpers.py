@@ -1,7 +1,17 @@
 import hashlib
+import re
 import uuid
-from typing import List, Any
+from typing import List, Any, Optional
 from datetime import datetime
+import numpy as np
+
+# Stopword list of the Elasticsearch "english" analyzer
+ENGLISH_STOPWORDS = frozenset(
+    "a an and are as at be but by for if in into is it no not of on or such "
+    "that the their then there these they this to was will with".split()
+)
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
 
 
 def generate_document_id(filename: str) -> str:
@@ -14,12 +24,45 @@ def generate_chunk_id(document_id: str, chunk_index: int) -> str:
     return f"{document_id}_chunk_{chunk_index}"
 
 
+def hash_chunk_content(content: str) -> str:
+    """Whitespace-insensitive fingerprint of a chunk's text"""
+    return hashlib.sha256(" ".join(content.split()).encode()).hexdigest()
+
+
+def pool_embeddings(embeddings: List[List[float]]) -> Optional[List[float]]:
+    """L2-normalized mean of L2-normalized vectors, or None if there are none"""
+    if not embeddings:
+        return None
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    pooled = vectors.mean(axis=0)
+    return (pooled / max(float(np.linalg.norm(pooled)), 1e-12)).tolist()
+
+
 def truncate_text(text: str, max_length: int = 200) -> str:
     if len(text) <= max_length:
         return text
     return text[:max_length] + "..."
 
 
+def _light_stem(term: str) -> str:
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith(("ss", "us")):
+        return term[:-1]
+    return term
+
+
+def tokenize_terms(text: str) -> List[str]:
+    """Lowercase, stopword-filtered, lightly stemmed terms (approximates ES english)."""
+    return [
+        _light_stem(term)
+        for term in _TERM_PATTERN.findall(text.lower())
+        if term not in ENGLISH_STOPWORDS
+    ]
+
+
 def reciprocal_rank_fusion(
     bm25_results: List[tuple],
     vector_results: List[tuple],
@@ -3,8 +3,12 @@ Layer 3: LLM-as-a-Judge
 Uses another LLM call to validate answer quality
 """
 
-from typing import Dict, List
-from app.core.groq_service import GroqService
+import hashlib
+import json
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.core.metrics import CACHE_REQUESTS
 from app.utils.logger import setup_logger
 from app.utils.validators import ValidationResult
 
@@ -12,10 +16,20 @@ logger = setup_logger(__name__)
 
 
 class LLMJudge:
-    """LLM-based answer validation"""
-
-    def __init__(self):
-        self.llm = GroqService()
+    """
+    LLM-based answer validation.
+
+    Uses the shared LLM service (no client of its own), asks for a compact
+    JSON verdict and caches verdicts by (question, answer, context hash).
+    """
+
+    def __init__(self, llm, cache_size: Optional[int] = None):
+        self.llm = llm
+        self.max_tokens = settings.LLM_JUDGE_MAX_TOKENS
+        self.cache_size = cache_size or settings.LLM_JUDGE_CACHE_SIZE
+        self._cache: "OrderedDict[Tuple[str, str, str], ValidationResult]" = (
+            OrderedDict()
+        )
 
     def get_judge_prompt(self, question: str, answer: str, context: str) -> str:
         """Create prompt for LLM judge"""
@@ -30,58 +44,59 @@ GENERATED ANSWER:
 {answer}
 
 VALIDATION TASKS:
-1. List any claims in the answer NOT supported by the context
+1. Find claims in the answer NOT supported by the context
 2. Identify if the answer substitutes interpretation for direct observation
 3. Check if tables, equations, or figures mentioned in context were ignored
 4. Check if the answer answers the actual question asked
 
-Respond in this format:
-VERDICT: [PASS or FAIL]
-ISSUES:
-- [issue 1]
-- [issue 2]
-...
+Respond with JSON only, at most 2 short issues:
+{{"verdict": "PASS" or "FAIL", "issues": ["..."]}}
 
 Be harsh. If you find ANY unsupported claim or hallucination, mark as FAIL."""
 
+    @staticmethod
+    def cache_key(
+        question: str, answer: str, context_chunks: List[str]
+    ) -> Tuple[str, str, str]:
+        digest = hashlib.sha1("\x1e".join(context_chunks).encode()).hexdigest()
+        return question, answer, digest
+
+    @staticmethod
+    def parse_verdict(judgment: str) -> ValidationResult:
+        """Turn the judge's JSON reply into a ValidationResult"""
+        data = json.loads(judgment)
+        issues = [str(issue) for issue in data.get("issues") or []]
+
+        if str(data.get("verdict", "")).upper() == "PASS":
+            return ValidationResult(True, "LLM judge approved answer")
+
+        issue_summary = "; ".join(issues[:2]) if issues else "Multiple issues found"
+        return ValidationResult(False, f"LLM judge rejected: {issue_summary}")
+
     async def validate_answer(
         self, question: str, answer: str, context_chunks: List[str]
     ) -> ValidationResult:
         """Use LLM to validate answer quality"""
-        try:
-            # Combine context
-            context = "\n\n".join(context_chunks[:3])  # Use top 3 chunks
-
-            # Get judge prompt
-            prompt = self.get_judge_prompt(question, answer, context)
+        context_chunks = context_chunks[:3]  # Use top 3 chunks
+        key = self.cache_key(question, answer, context_chunks)
+        if key in self._cache:
+            CACHE_REQUESTS.inc(cache="llm_judge", result="hit")
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        CACHE_REQUESTS.inc(cache="llm_judge", result="miss")
 
-            # Call LLM (using Groq for fast inference)
+        try:
+            prompt = self.get_judge_prompt(
+                question, answer, "\n\n".join(context_chunks)
+            )
             judgment = await self.llm.generate_response(
                 prompt=prompt,
-                temperature=0.1,  # Low temp for consistent judging
-                max_tokens=300,
+                temperature=0.0,  # Deterministic judging
+                max_tokens=self.max_tokens,
+                json_mode=True,
+                raise_errors=True,
             )
-
-            # Parse judgment
-            is_pass = "VERDICT: PASS" in judgment.upper()
-
-            # Extract issues
-            issues = []
-            if "ISSUES:" in judgment:
-                issues_section = judgment.split("ISSUES:")[1].strip()
-                issues = [
-                    line.strip("- ").strip()
-                    for line in issues_section.split("\n")
-                    if line.strip().startswith("-")
-                ]
-
-            if is_pass:
-                return ValidationResult(True, "LLM judge approved answer")
-            else:
-                issue_summary = (
-                    "; ".join(issues[:2]) if issues else "Multiple issues found"
-                )
-                return ValidationResult(False, f"LLM judge rejected: {issue_summary}")
+            result = self.parse_verdict(judgment)
 
         except Exception as e:
             logger.error(f"LLM judge failed: {e}")
@@ -89,18 +104,8 @@ Be harsh. If you find ANY unsupported claim or hallucination, mark as FAIL."""
                 True, "LLM judge unavailable (skipped)", severity="warning"
             )
 
-    def validate_answer_sync(
-        self, question: str, answer: str, context_chunks: List[str]
-    ) -> ValidationResult:
-        """Synchronous version for non-async contexts"""
-        import asyncio
-
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
 
-        return loop.run_until_complete(
-            self.validate_answer(question, answer, context_chunks)
-        )
+        return result
@@ -0,0 +1,252 @@
+"""
+Query analysis shared by routing, retrieval, generation and validation.
+
+Each signal's keyword phrases are one precompiled word-boundary pattern,
+searched independently so signals never compete for the same text, and
+"vs" no longer matches inside words like "obvious". Each word of a phrase also matches its plural
+("difference between" matches "differences between").
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+import numpy as np
+from app.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Keyword phrases per signal; one phrase may feed several signals
+SIGNAL_PHRASES: Dict[str, List[str]] = {
+    "comparison": [
+        "differentiate",
+        "compare",
+        "compared",
+        "comparing",
+        "comparison",
+        "contrast",
+        "distinguish",
+        "difference between",
+        "vs",
+        "versus",
+    ],
+    "author": [
+        "author",
+        "written by",
+        "who wrote",
+        "name of the author",
+        "list the authors",
+        "mention the authors",
+    ],
+    "author_list": ["list authors", "name authors", "who wrote", "authors of"],
+    "authors_argue": ["authors argue", "author argues"],
+    "summary": [
+        "summarize",
+        "summary",
+        "overview",
+        "what is this about",
+        "what does this",
+        "main idea",
+        "key points",
+    ],
+    "definition": ["what is", "define", "defined"],
+    "parameters": ["parameter", "weights", "matrix"],
+    "verification": ["true or false", "is it true", "verify"],
+    "observation": ["evidence", "signature", "identify", "observational"],
+    "explanation": [
+        "why",
+        "argue",
+        "argued",
+        "explain",
+        "explained",
+        "explaining",
+        "explanation",
+    ],
+    "conclusion": ["conclude", "overall", "dynamical state"],
+}
+
+# Precedence of signals for each consumer (first match wins)
+TEMPLATE_ORDER = [
+    ("comparison", "comparative"),
+    ("author", "authors"),
+    ("summary", "summary"),
+]
+RETRIEVAL_ORDER = [
+    "definition",
+    "parameters",
+    "observation",
+    "comparison",
+    "explanation",
+    "conclusion",
+]
+GENERATION_ORDER = [
+    "definition",
+    "parameters",
+    "verification",
+    "observation",
+    "explanation",
+]
+
+VERIFICATION_STARTERS = {"is", "does", "do", "are", "was", "were", "can", "will"}
+
+
+def _phrase_pattern(phrase: str) -> str:
+    words = [re.escape(word) + "(?:e?s)?" for word in phrase.split()]
+    return r"\s+".join(words)
+
+
+def _signal_pattern(phrases: List[str]) -> "re.Pattern":
+    return re.compile(r"\b(?:" + "|".join(_phrase_pattern(p) for p in phrases) + r")\b")
+
+
+# One search per signal: a phrase matched for one signal ("list the authors")
+# must not hide an overlapping phrase of another ("authors of")
+SIGNAL_MATCHERS: Dict[str, "re.Pattern"] = {
+    signal: _signal_pattern(phrases) for signal, phrases in SIGNAL_PHRASES.items()
+}
+
+
+@dataclass
+class QueryAnalysis:
+    """Everything the pipeline derives from the query text, computed once"""
+
+    query: str
+    signals: FrozenSet[str]
+    first_word: str
+    # Filled in by the retriever once the query is embedded
+    embedding: Optional[List[float]] = field(default=None, repr=False)
+
+    def _first(self, order: List[str], default: str) -> str:
+        return next((s for s in order if s in self.signals), default)
+
+    @property
+    def template(self) -> str:
+        """Prompt template: comparative, authors, summary or default"""
+        return next(
+            (name for signal, name in TEMPLATE_ORDER if signal in self.signals),
+            "default",
+        )
+
+    @property
+    def retrieval_intent(self) -> str:
+        return self._first(RETRIEVAL_ORDER, "general")
+
+    @property
+    def generation_intent(self) -> str:
+        return self._first(GENERATION_ORDER, "general")
+
+    @property
+    def is_comparison(self) -> bool:
+        return "comparison" in self.signals
+
+    @property
+    def is_author_list(self) -> bool:
+        return "author_list" in self.signals
+
+    @property
+    def is_authors_argue(self) -> bool:
+        return "authors_argue" in self.signals
+
+    @property
+    def is_verification(self) -> bool:
+        return self.first_word in VERIFICATION_STARTERS
+
+
+def analyze_query(query: str) -> QueryAnalysis:
+    lowered = query.lower()
+    signals = {
+        signal for signal, pattern in SIGNAL_MATCHERS.items() if pattern.search(lowered)
+    }
+
+    words = lowered.split()
+    return QueryAnalysis(
+        query=query,
+        signals=frozenset(signals),
+        first_word=words[0] if words else "",
+    )
+
+
+# Seed questions for the embedding fallback when no keyword matches
+TEMPLATE_EXAMPLES: Dict[str, List[str]] = {
+    "comparative": [
+        "How does BERT differ from GPT?",
+        "Which model performs better, A or B?",
+        "What separates encoder-only from decoder-only models?",
+    ],
+    "authors": [
+        "Who are the people behind this paper?",
+        "Which researchers wrote this work?",
+        "Which institutions contributed to the paper?",
+    ],
+    "summary": [
+        "Give me the gist of this paper.",
+        "What are the main contributions?",
+        "Briefly describe what the paper does.",
+    ],
+    "default": [
+        "What learning rate was used for training?",
+        "How many layers does the encoder have?",
+        "What dataset was used in the experiments?",
+    ],
+}
+
+
+class IntentCentroids:
+    """
+    Nearest-centroid template classifier over query embeddings.
+
+    Used only when the keyword pass finds no template, reusing the embedding
+    the retriever already computed, so it adds one small matrix product.
+    """
+
+    def __init__(
+        self,
+        embedding_service,
+        examples: Optional[Dict[str, List[str]]] = None,
+        min_similarity: Optional[float] = None,
+    ):
+        examples = examples or TEMPLATE_EXAMPLES
+        self.min_similarity = (
+            min_similarity
+            if min_similarity is not None
+            else settings.INTENT_CENTROID_MIN_SIMILARITY
+        )
+        self.labels = list(examples)
+
+        centroids = []
+        for label in self.labels:
+            vectors = np.asarray(
+                embedding_service.embed_batch(examples[label]), dtype=np.float32
+            )
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        self.centroids = np.stack(centroids)
+
+    def classify(self, embedding: List[float]) -> Optional[str]:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+
+        similarities = self.centroids @ (query / norm)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.min_similarity:
+            return None
+        return self.labels[best]
+
+
+def resolve_template(
+    requested: str,
+    analysis: QueryAnalysis,
+    centroids: Optional[IntentCentroids] = None,
+) -> str:
+    """Template for a request: explicit choice, keyword match, then embedding"""
+    if requested != "default":
+        return requested
+
+    template = analysis.template
+    if template == "default" and centroids and analysis.embedding is not None:
+        template = centroids.classify(analysis.embedding) or "default"
+
+    logger.info(f"Auto-detected intent: {template}")
+    return template
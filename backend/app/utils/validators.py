@@ -6,11 +6,45 @@ These catch 80% of failures instantly without LLM calls.
 """
 
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 from app.utils.logger import setup_logger
+from app.utils.query_analysis import QueryAnalysis, analyze_query
 
 logger = setup_logger(__name__)
 
+SENTENCE_SPLIT = re.compile(r"[.!?]+")
+CONTENT_WORD = re.compile(r"\b\w{4,}\b")  # 4+ char words
+WORD = re.compile(r"\w+")
+CITATION = re.compile(
+    r"\[.*?\]"  # [1], [Author et al.]
+    r"|\(.*?\d{4}.*?\)"  # (Author, 2023)
+    r"|\bet al\."  # et al.
+)
+META_INDICATOR = re.compile("the context|the document|according to|based on")
+FACTUAL_INDICATOR = re.compile("shows|demonstrates|achieves|uses|proposes")
+
+OVERLAP_STOPWORDS = {
+    "the",
+    "a",
+    "an",
+    "and",
+    "or",
+    "but",
+    "in",
+    "on",
+    "at",
+    "to",
+    "for",
+    "of",
+    "with",
+}
+
+# Claim words shorter than this do not count as context support
+MIN_SUPPORT_WORD_LENGTH = 6
+# Longest context-token prefix indexed, so one huge token (a URL, base64,
+# an equation run from PDF extraction) costs linear rather than quadratic work
+MAX_SUPPORT_PREFIX_LENGTH = MIN_SUPPORT_WORD_LENGTH + 12
+
 
 class ValidationResult:
     """Result of validation check"""
@@ -32,28 +66,18 @@ class StructuralValidator:
     """Layer 1: Fast, deterministic structural checks"""
 
     @staticmethod
-    def validate_table_usage(answer: str, question: str) -> ValidationResult:
+    def validate_table_usage(
+        answer: str, question: str, analysis: Optional[QueryAnalysis] = None
+    ) -> ValidationResult:
         """Check if table is appropriately used"""
         has_table = "|" in answer and "---" in answer
 
-        # Check if question is comparison/differentiation
-        comparison_keywords = [
-            "differentiate",
-            "compare",
-            "contrast",
-            "distinguish",
-            "vs",
-            "versus",
-            "difference between",
-        ]
-        is_comparison = any(kw in question.lower() for kw in comparison_keywords)
-
-        # Check if question asks for author list
-        author_keywords = ["list authors", "name authors", "who wrote", "authors of"]
-        is_author_list = any(kw in question.lower() for kw in author_keywords)
+        # Comparison/differentiation and author-list questions expect a table
+        analysis = analysis or analyze_query(question)
+        expects_table = analysis.is_comparison or analysis.is_author_list
 
         # Table should exist for comparisons/author lists
-        if (is_comparison or is_author_list) and not has_table:
+        if expects_table and not has_table:
             return ValidationResult(
                 False,
                 "Expected table for comparison/author query but none found",
@@ -61,12 +85,9 @@ class StructuralValidator:
             )
 
         # Table should NOT exist for non-comparison questions
-        if has_table and not (is_comparison or is_author_list):
+        if has_table and not expects_table:
             # Exception: "authors argue" is not asking for table
-            if (
-                "authors argue" in question.lower()
-                or "author argues" in question.lower()
-            ):
+            if analysis.is_authors_argue:
                 return ValidationResult(
                     False, "Unexpected table for 'authors argue' question"
                 )
@@ -92,24 +113,14 @@ class StructuralValidator:
         return ValidationResult(True)
 
     @staticmethod
-    def validate_verification_format(answer: str, question: str) -> ValidationResult:
+    def validate_verification_format(
+        answer: str, question: str, analysis: Optional[QueryAnalysis] = None
+    ) -> ValidationResult:
         """Check Yes/No questions have proper prefix"""
-        verification_starters = [
-            "is",
-            "does",
-            "do",
-            "are",
-            "was",
-            "were",
-            "can",
-            "will",
-        ]
-
-        # Check if question is verification type
-        first_word = question.lower().split()[0] if question else ""
-        is_verification = first_word in verification_starters
+        # Verification questions start with is/does/are/...
+        analysis = analysis or analyze_query(question)
 
-        if is_verification:
+        if analysis.is_verification:
             if not answer.startswith(("Yes,", "No,", "Yes.", "No.", "Yes -", "No -")):
                 return ValidationResult(
                     False,
@@ -159,6 +170,49 @@ class StructuralValidator:
         return ValidationResult(True)
 
 
+class ContextIndex:
+    """
+    Word index over a request's retrieved context, built in one pass.
+
+    Holds the set of 4+ character words (for overlap) and each token's
+    prefixes of MIN_SUPPORT_WORD_LENGTH to MAX_SUPPORT_PREFIX_LENGTH
+    characters (for claim support), so most lookups are a set membership
+    instead of a scan of the context. Tokens longer than the cap are kept
+    under their capped prefix for the rare claim word that long.
+    """
+
+    def __init__(self, context_chunks: List[str]):
+        self.content_words: Set[str] = set()
+        self.support_terms: Set[str] = set()
+        self.long_tokens: Dict[str, Set[str]] = {}
+
+        # Words repeat across a paper's chunks; index each distinct one once
+        tokens = set()
+        for chunk in context_chunks:
+            tokens.update(WORD.findall(chunk.lower()))
+
+        for token in tokens:
+            length = len(token)
+            if length >= 4:
+                self.content_words.add(token)
+            if length < MIN_SUPPORT_WORD_LENGTH:
+                continue
+            if length > MAX_SUPPORT_PREFIX_LENGTH:
+                self.long_tokens.setdefault(
+                    token[:MAX_SUPPORT_PREFIX_LENGTH], set()
+                ).add(token)
+                length = MAX_SUPPORT_PREFIX_LENGTH
+            for end in range(MIN_SUPPORT_WORD_LENGTH, length + 1):
+                self.support_terms.add(token[:end])
+
+    def supports(self, word: str) -> bool:
+        """Word occurs in the context, alone or as the start of a longer word"""
+        if len(word) <= MAX_SUPPORT_PREFIX_LENGTH:
+            return word in self.support_terms
+        candidates = self.long_tokens.get(word[:MAX_SUPPORT_PREFIX_LENGTH], ())
+        return any(token.startswith(word) for token in candidates)
+
+
 class EvidenceValidator:
     """Layer 2: Evidence coverage checks"""
 
@@ -166,7 +220,7 @@ class EvidenceValidator:
     def split_sentences(text: str) -> List[str]:
         """Split text into sentences"""
         # Simple sentence splitter
-        sentences = re.split(r"[.!?]+", text)
+        sentences = SENTENCE_SPLIT.split(text)
         return [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
 
     @staticmethod
@@ -176,65 +230,50 @@ class EvidenceValidator:
         if len(sentence) < 15:
             return False
 
+        sentence = sentence.lower()
+
         # Skip meta-text
-        meta_indicators = ["the context", "the document", "according to", "based on"]
-        if any(ind in sentence.lower() for ind in meta_indicators):
+        if META_INDICATOR.search(sentence):
             return False
 
         # Likely factual if contains specific terms
-        factual_indicators = ["shows", "demonstrates", "achieves", "uses", "proposes"]
-        return any(ind in sentence.lower() for ind in factual_indicators)
+        return FACTUAL_INDICATOR.search(sentence) is not None
 
     @staticmethod
     def has_citation(sentence: str) -> bool:
         """Check if sentence has citation markers"""
         # Look for [citation], (citation), or academic patterns
-        citation_patterns = [
-            r"\[.*?\]",  # [1], [Author et al.]
-            r"\(.*?\d{4}.*?\)",  # (Author, 2023)
-            r"\bet al\.",  # et al.
-        ]
-        return any(re.search(pattern, sentence) for pattern in citation_patterns)
+        return CITATION.search(sentence) is not None
 
     @staticmethod
-    def calculate_context_overlap(answer: str, context_chunks: List[str]) -> float:
+    def calculate_context_overlap(
+        answer: str,
+        context_chunks: List[str],
+        index: Optional[ContextIndex] = None,
+    ) -> float:
         """Calculate what % of answer tokens appear in context"""
         if not context_chunks:
             return 0.0
 
         # Get unique important words from answer (exclude stopwords)
-        stopwords = {
-            "the",
-            "a",
-            "an",
-            "and",
-            "or",
-            "but",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "of",
-            "with",
-        }
-        answer_words = set(re.findall(r"\b\w{4,}\b", answer.lower()))  # 4+ char words
-        answer_words -= stopwords
+        answer_words = set(CONTENT_WORD.findall(answer.lower()))
+        answer_words -= OVERLAP_STOPWORDS
 
         if not answer_words:
             return 1.0  # No content words to check
 
-        # Get all words from context
-        context_text = " ".join(context_chunks).lower()
-        context_words = set(re.findall(r"\b\w{4,}\b", context_text))
+        index = index or ContextIndex(context_chunks)
 
         # Calculate overlap
-        overlap = len(answer_words & context_words)
+        overlap = len(answer_words & index.content_words)
         return overlap / len(answer_words)
 
     @staticmethod
     def validate_evidence_coverage(
-        answer: str, context_chunks: List[str], min_overlap: float = 0.5
+        answer: str,
+        context_chunks: List[str],
+        min_overlap: float = 0.5,
+        index: Optional[ContextIndex] = None,
     ) -> ValidationResult:
         """Check if answer is grounded in retrieved context"""
         if not context_chunks:
@@ -242,7 +281,9 @@ class EvidenceValidator:
                 False, "No context chunks provided for evidence check"
             )
 
-        overlap = EvidenceValidator.calculate_context_overlap(answer, context_chunks)
+        overlap = EvidenceValidator.calculate_context_overlap(
+            answer, context_chunks, index
+        )
 
         if overlap < min_overlap:
             return ValidationResult(
@@ -255,7 +296,9 @@ class EvidenceValidator:
 
     @staticmethod
     def validate_factual_claims_have_support(
-        answer: str, context_chunks: List[str]
+        answer: str,
+        context_chunks: List[str],
+        index: Optional[ContextIndex] = None,
     ) -> ValidationResult:
         """Check if factual claims have citations or context support"""
         sentences = EvidenceValidator.split_sentences(answer)
@@ -266,15 +309,17 @@ class EvidenceValidator:
         if not factual_sentences:
             return ValidationResult(True, "No factual claims to verify")
 
+        index = index or ContextIndex(context_chunks)
+
         unsupported = []
         for sentence in factual_sentences:
             has_cite = EvidenceValidator.has_citation(sentence)
 
             # Check if sentence words appear in context
-            sentence_words = set(re.findall(r"\b\w{4,}\b", sentence.lower()))
-            context_text = " ".join(context_chunks).lower()
             in_context = any(
-                word in context_text for word in sentence_words if len(word) > 5
+                index.supports(word)
+                for word in CONTENT_WORD.findall(sentence.lower())
+                if len(word) >= MIN_SUPPORT_WORD_LENGTH
             )
 
             if not has_cite and not in_context:
@@ -300,28 +345,36 @@ class AnswerValidator:
         self.evidence = EvidenceValidator()
 
     def validate_all(
-        self, answer: str, question: str, context_chunks: List[str] = None
+        self,
+        answer: str,
+        question: str,
+        context_chunks: List[str] = None,
+        analysis: Optional[QueryAnalysis] = None,
     ) -> Dict[str, ValidationResult]:
         """Run all validation checks"""
         results = {}
+        analysis = analysis or analyze_query(question)
 
         # Layer 1: Structural
-        results["table_usage"] = self.structural.validate_table_usage(answer, question)
+        results["table_usage"] = self.structural.validate_table_usage(
+            answer, question, analysis
+        )
         results["whitespace"] = self.structural.validate_whitespace(answer)
         results["verification_format"] = self.structural.validate_verification_format(
-            answer, question
+            answer, question, analysis
         )
         results["length"] = self.structural.validate_length(answer)
         results["no_meta_text"] = self.structural.validate_no_meta_text(answer)
 
-        # Layer 2: Evidence (if context provided)
+        # Layer 2: Evidence (if context provided), sharing one context index
         if context_chunks:
+            index = ContextIndex(context_chunks)
             results["evidence_coverage"] = self.evidence.validate_evidence_coverage(
-                answer, context_chunks
+                answer, context_chunks, index=index
             )
             results["factual_support"] = (
                 self.evidence.validate_factual_claims_have_support(
-                    answer, context_chunks
+                    answer, context_chunks, index=index
                 )
             )
 
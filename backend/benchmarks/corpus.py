@@ -0,0 +1,139 @@
+"""
+Synthetic research-paper corpus for benchmarks.
+
+Papers are generated deterministically from a seed: a title, sections of
+topic-flavoured filler and a few distinctive facts (model name, dataset,
+learning rate, score). Each fact yields a query whose answer and evidence
+sentence are known, so the same corpus drives both load tests and
+retrieval evaluation.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import List
+
+TOPICS = [
+    ("graph neural networks", ["message passing", "node embeddings", "oversmoothing"]),
+    ("protein folding", ["contact maps", "residue pairs", "structure prediction"]),
+    ("speech recognition", ["acoustic frames", "phoneme alignment", "beam search"]),
+    (
+        "reinforcement learning",
+        ["policy gradients", "reward shaping", "replay buffers"],
+    ),
+    ("machine translation", ["attention heads", "subword units", "back translation"]),
+    ("galaxy dynamics", ["rotation curves", "dark matter halos", "stellar streams"]),
+    ("climate modelling", ["ocean heat uptake", "aerosol forcing", "ensemble spread"]),
+    ("image segmentation", ["encoder decoder", "skip connections", "boundary loss"]),
+]
+DATASETS = ["ArcBench", "NovaSet", "QuillQA", "TerraScan", "HelixDB", "OrbitCorpus"]
+FILLER = (
+    "We study the behaviour of {term} under realistic conditions. "
+    "Prior work on {topic} has focused on {term2}, leaving open questions. "
+    "Our analysis shows that {term} interacts with {term2} in non-trivial ways. "
+    "Ablations confirm the contribution of each component of the {topic} pipeline. "
+    "These observations motivate a closer look at {term} in larger settings. "
+)
+SECTIONS = [
+    "Abstract",
+    "Introduction",
+    "Methods",
+    "Results",
+    "Discussion",
+    "Conclusion",
+]
+WORDS_PER_PAGE = 450
+
+
+@dataclass
+class Fact:
+    query: str
+    answer: str
+    # The sentence stating the answer; chunks containing it are relevant
+    evidence: str
+
+
+@dataclass
+class SyntheticPaper:
+    title: str
+    filename: str
+    text: str
+    facts: List[Fact] = field(default_factory=list)
+
+
+def make_paper(index: int, pages: int = 8, seed: int = 0) -> SyntheticPaper:
+    rng = random.Random(seed * 100_003 + index)
+    topic, terms = TOPICS[index % len(TOPICS)]
+    model = f"{topic.split()[0].capitalize()}Net-{index}"
+    dataset = rng.choice(DATASETS)
+    learning_rate = f"{rng.choice([1, 2, 3, 5])}e-{rng.choice([3, 4, 5])}"
+    score = f"{rng.uniform(60, 95):.1f}"
+    title = f"{model}: Scaling {topic} with {rng.choice(terms)}"
+
+    # Planted sentence per section, and the question each one answers
+    fact_sentences = {
+        "Methods": f"{model} is trained with a learning rate of {learning_rate}. ",
+        "Results": f"{model} achieves a score of {score} on the {dataset} benchmark. ",
+        "Introduction": f"We evaluate {model} on the {dataset} dataset. ",
+    }
+    facts = [
+        Fact(
+            f"What learning rate was used to train {model}?",
+            learning_rate,
+            fact_sentences["Methods"].strip(),
+        ),
+        Fact(
+            f"Which dataset was {model} evaluated on?",
+            dataset,
+            fact_sentences["Introduction"].strip(),
+        ),
+        Fact(
+            f"What score does {model} achieve on {dataset}?",
+            score,
+            fact_sentences["Results"].strip(),
+        ),
+    ]
+
+    words_per_section = pages * WORDS_PER_PAGE // len(SECTIONS)
+    parts = [title]
+    for section in SECTIONS:
+        body = [fact_sentences.get(section, "")]
+        length = len(body[0].split())
+        while length < words_per_section:
+            sentence = FILLER.format(
+                topic=topic, term=rng.choice(terms), term2=rng.choice(terms)
+            )
+            body.append(sentence)
+            length += len(sentence.split())
+        rng.shuffle(body)
+        parts.append(f"{section}\n" + "".join(body))
+
+    return SyntheticPaper(
+        title=title,
+        filename=f"synthetic_{seed}_{index}.pdf",
+        text="\n\n".join(parts),
+        facts=facts,
+    )
+
+
+def make_corpus(num_papers: int, pages: int = 8, seed: int = 0) -> List[SyntheticPaper]:
+    return [make_paper(i, pages, seed) for i in range(num_papers)]
+
+
+def render_pdf(paper: SyntheticPaper) -> bytes:
+    """Lay the paper out as a real PDF, so uploads exercise text extraction"""
+    import fitz
+
+    doc = fitz.open()
+    doc.set_metadata({"title": paper.title})
+    words = paper.text.split(" ")
+    for start in range(0, len(words), WORDS_PER_PAGE):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50),
+            " ".join(words[start : start + WORDS_PER_PAGE]),
+            fontsize=7,
+        )
+
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,411 @@
+"""
+Retrieval quality vs latency evaluation for fusion and retrieval-mode tuning
+
+This script:
+1. Loads labeled queries: the output of scripts/generate_training_data.py
+   (query -> positive passage, optionally chunk_ids), or the planted facts
+   of a synthetic corpus indexed into a temporary in-memory index
+2. Sweeps the fusion settings (BM25/vector weights, the keyword-intent
+   override, candidate over-fetch, RRF k and kNN num_candidates) and the
+   retrieval mode (flat, or hierarchical over the top-M documents)
+3. Runs every query through HybridRetriever under each configuration
+4. Reports recall@k, MRR and per-query latency side by side, and the change
+   of each hierarchical configuration against flat search with the same
+   fusion settings
+5. Picks the fastest configuration meeting --min-recall and saves the
+   results as JSON
+
+Usage:
+    python benchmarks/eval_retrieval.py --labels training_data.json
+    python benchmarks/eval_retrieval.py --synthetic 40 --fake-embeddings
+    python benchmarks/eval_retrieval.py --synthetic 40 --bm25-weights 0.2,0.4,0.6 \\
+        --overfetch 1,1.5,3 --min-recall 0.9 --recall-at 5
+    python benchmarks/eval_retrieval.py --synthetic 200 --fake-embeddings \
+        --modes flat,hierarchical --top-documents 5,10,20
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.document import Document
+from app.utils.helpers import generate_document_id
+from benchmarks.corpus import make_corpus
+from benchmarks.reporting import new_results, save_results
+
+# Leading characters of a positive passage that must appear in a chunk
+SNIPPET_CHARS = 150
+
+# Swept setting -> CLI option and type; the vector weights are 1 - BM25 weight
+AXES = {
+    "BM25_WEIGHT": ("bm25_weights", float),
+    "INTENT_BM25_WEIGHT": ("intent_bm25_weights", float),
+    "SEARCH_OVERFETCH": ("overfetch", float),
+    "RRF_K": ("rrf_k", int),
+    "KNN_CANDIDATES_FACTOR": ("num_candidates", float),
+    "RETRIEVAL_MODE": ("modes", str),
+    "HIERARCHICAL_TOP_DOCUMENTS": ("top_documents", int),
+}
+COMPLEMENTS = {
+    "BM25_WEIGHT": "VECTOR_WEIGHT",
+    "INTENT_BM25_WEIGHT": "INTENT_VECTOR_WEIGHT",
+}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+@dataclass
+class LabeledQuery:
+    query: str
+    # Normalized passages, each of which should be retrieved
+    snippets: List[str] = field(default_factory=list)
+    chunk_ids: Set[str] = field(default_factory=set)
+
+    @property
+    def num_targets(self) -> int:
+        return len(self.snippets) + len(self.chunk_ids)
+
+    def target_ranks(self, results: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """1-based rank at which each target is first retrieved, or None"""
+        contents = [_normalize(r.get("content", "")) for r in results]
+        ranks = [
+            next((i + 1 for i, c in enumerate(contents) if snippet in c), None)
+            for snippet in self.snippets
+        ]
+        ranks += [
+            next(
+                (i + 1 for i, r in enumerate(results) if r["chunk_id"] == chunk_id),
+                None,
+            )
+            for chunk_id in self.chunk_ids
+        ]
+        return ranks
+
+
+def load_labels(path: str) -> List[LabeledQuery]:
+    """
+    Read query/positive pairs; pairs sharing a query are merged. Sentence
+    pairs (sentence1/sentence2) in training data have no query and are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+
+    labels: Dict[str, LabeledQuery] = {}
+    for item in items:
+        if "query" not in item:
+            continue
+        label = labels.setdefault(item["query"], LabeledQuery(item["query"]))
+        if item.get("positive"):
+            snippet = _normalize(item["positive"])[:SNIPPET_CHARS]
+            if snippet not in label.snippets:
+                label.snippets.append(snippet)
+        label.chunk_ids.update(item.get("chunk_ids", []))
+
+    return [label for label in labels.values() if label.num_targets]
+
+
+def synthetic_labels(papers) -> List[LabeledQuery]:
+    return [
+        LabeledQuery(fact.query, snippets=[_normalize(fact.evidence)])
+        for paper in papers
+        for fact in paper.facts
+    ]
+
+
+async def index_synthetic(client, embedding_service, papers):
+    """Chunk and embed the corpus text directly, skipping PDF rendering"""
+    from app.core.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor(embedding_service)
+    for paper in papers:
+        document_id = generate_document_id(paper.filename)
+        chunks = processor._create_chunks(paper.text, document_id)
+        embeddings = embedding_service.embed_batch([c.content for c in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk.embedding = embedding
+
+        await client.index_document(
+            Document(
+                document_id=document_id,
+                title=paper.title,
+                content=paper.text,
+                filename=paper.filename,
+                source="pdf",
+                file_size=len(paper.text),
+                chunks=chunks,
+            )
+        )
+
+
+def parameter_grid(args) -> List[Dict[str, Any]]:
+    axes = {
+        name: [cast(v) for v in getattr(args, option).split(",")]
+        for name, (option, cast) in AXES.items()
+    }
+    grid = []
+    for values in itertools.product(*axes.values()):
+        params = dict(zip(axes, values))
+        # Flat search does not use the document count; sweep it once
+        if (
+            params["RETRIEVAL_MODE"] == "flat"
+            and params["HIERARCHICAL_TOP_DOCUMENTS"]
+            != axes["HIERARCHICAL_TOP_DOCUMENTS"][0]
+        ):
+            continue
+        grid.append(params)
+    return grid
+
+
+@contextmanager
+def override_settings(params: Dict[str, Any]):
+    values = dict(params)
+    for name, complement in COMPLEMENTS.items():
+        if name in values:
+            values[complement] = round(1.0 - values[name], 6)
+
+    saved = {name: getattr(settings, name) for name in values}
+    try:
+        for name, value in values.items():
+            setattr(settings, name, value)
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+async def evaluate(retriever, labels, ks: List[int], repeat: int) -> Dict[str, Any]:
+    top_k = max(ks)
+    latencies = []
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+
+    for label in labels:
+        for _ in range(repeat):
+            start = perf_counter()
+            results = await retriever.hybrid_search(label.query, top_k=top_k)
+            latencies.append(perf_counter() - start)
+
+        ranks = label.target_ranks(results)
+        for k in ks:
+            found = sum(1 for rank in ranks if rank and rank <= k)
+            recalls[k].append(found / len(ranks))
+        first = min((rank for rank in ranks if rank), default=None)
+        reciprocal_ranks.append(1.0 / first if first else 0.0)
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        **{f"recall@{k}": float(np.mean(recalls[k])) for k in ks},
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+    }
+
+
+def print_table(rows: List[Dict[str, Any]], ks: List[int]):
+    header = ["bm25", "intent", "fetch", "rrf_k", "cand", "mode", "docs"]
+    header += [f"R@{k}" for k in ks] + ["MRR", "p50ms", "p95ms"]
+    print("  ".join(f"{h:>6}" for h in header))
+    for row in rows:
+        params, metrics = row["params"], row["metrics"]
+        cells = [
+            f"{value[:6]:>6}" if isinstance(value, str) else f"{value:>6g}"
+            for value in params.values()
+        ]
+        if params["RETRIEVAL_MODE"] == "flat":
+            cells[-1] = f"{'-':>6}"
+        cells += [f"{metrics[f'recall@{k}']:>6.3f}" for k in ks]
+        cells += [f"{metrics['mrr']:>6.3f}"]
+        cells += [f"{metrics['p50_ms']:>6.1f}", f"{metrics['p95_ms']:>6.1f}"]
+        print("  ".join(cells))
+
+
+def compare_to_flat(rows, metric: str) -> List[Dict[str, Any]]:
+    """Each hierarchical row against flat search with the same fusion settings"""
+    mode_params = ("RETRIEVAL_MODE", "HIERARCHICAL_TOP_DOCUMENTS")
+
+    def fusion(row) -> tuple:
+        return tuple(v for k, v in row["params"].items() if k not in mode_params)
+
+    flat = {
+        fusion(row): row for row in rows if row["params"]["RETRIEVAL_MODE"] == "flat"
+    }
+
+    comparisons = []
+    for row in rows:
+        baseline = flat.get(fusion(row))
+        if row["params"]["RETRIEVAL_MODE"] != "hierarchical" or baseline is None:
+            continue
+        comparisons.append(
+            {
+                "params": row["params"],
+                f"{metric}_change": row["metrics"][metric]
+                - baseline["metrics"][metric],
+                "p50_ms_ratio": row["metrics"]["p50_ms"]
+                / max(baseline["metrics"]["p50_ms"], 1e-9),
+            }
+        )
+    return comparisons
+
+
+def cheapest(rows, metric: str, bar: float) -> Optional[Dict[str, Any]]:
+    """Fastest configuration whose metric meets the bar"""
+    passing = [row for row in rows if row["metrics"][metric] >= bar]
+    return min(passing, key=lambda row: row["metrics"]["p50_ms"], default=None)
+
+
+async def run(args) -> Dict[str, Any]:
+    from app.api import dependencies
+    from app.core.memory_store import InMemorySearchClient
+    from app.core.retriever import HybridRetriever
+
+    # One log line per search would drown the table
+    logging.getLogger("app.core.retriever").setLevel(logging.WARNING)
+
+    if args.fake_embeddings:
+        from benchmarks.fakes import HashingEmbeddingService
+
+        embedding_service = HashingEmbeddingService()
+    else:
+        embedding_service = dependencies.get_embedding_service()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        if args.synthetic:
+            papers = make_corpus(args.synthetic, pages=args.pages, seed=args.seed)
+            labels = synthetic_labels(papers)
+            client = InMemorySearchClient(data_dir=data_dir)
+            print(f"Indexing {len(papers)} synthetic papers in memory...")
+            await index_synthetic(client, embedding_service, papers)
+            ann_searcher = None
+        else:
+            labels = load_labels(args.labels)
+            client = dependencies.get_elasticsearch_client()
+            ann_searcher = dependencies.get_ann_searcher()
+
+        if args.limit:
+            labels = labels[: args.limit]
+        if not labels:
+            print("No labeled queries found!")
+            return {}
+
+        retriever = HybridRetriever(
+            client,
+            embedding_service,
+            ann_searcher=ann_searcher,
+            reranker=dependencies.get_reranker(),
+        )
+        ks = sorted(int(k) for k in args.ks.split(","))
+
+        # Load the model and open connections before anything is timed
+        await retriever.hybrid_search(labels[0].query, top_k=max(ks))
+
+        grid = parameter_grid(args)
+        print(f"Evaluating {len(labels)} queries x {len(grid)} configurations...\n")
+        rows = []
+        for params in grid:
+            with override_settings(params):
+                metrics = await evaluate(retriever, labels, ks, args.repeat)
+            rows.append({"params": params, "metrics": metrics})
+
+        await client.close()
+
+    print_table(rows, ks)
+
+    results = {
+        **new_results({k: v for k, v in vars(args).items() if k != "output"}),
+        "queries": len(labels),
+        "rows": rows,
+    }
+
+    metric = f"recall@{args.recall_at}"
+    comparisons = compare_to_flat(rows, metric)
+    if comparisons:
+        print(f"\nHierarchical vs flat search ({metric}, p50 latency):")
+        for comparison in comparisons:
+            print(
+                f"  top {comparison['params']['HIERARCHICAL_TOP_DOCUMENTS']:>4} "
+                f"documents: {metric} {comparison[f'{metric}_change']:+.3f}, "
+                f"p50 x{comparison['p50_ms_ratio']:.2f}"
+            )
+        results["vs_flat"] = comparisons
+
+    if args.min_recall:
+        best = cheapest(rows, metric, args.min_recall)
+        results["cheapest"] = best
+        if best:
+            print(f"\n✓ Fastest with {metric} >= {args.min_recall}: {best['params']}")
+        else:
+            print(f"\n✗ No configuration reaches {metric} >= {args.min_recall}")
+
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sweep fusion settings")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--labels", help="Labeled query JSON (training data format)")
+    source.add_argument(
+        "--synthetic", type=int, default=0, help="Evaluate on N synthetic papers"
+    )
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=0, help="Max queries")
+    parser.add_argument("--ks", default="1,3,5,10", help="Cutoffs for recall@k")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per query")
+    parser.add_argument("--fake-embeddings", action="store_true")
+
+    current = {name: getattr(settings, name) for name in AXES}
+    parser.add_argument("--bm25-weights", default=str(current["BM25_WEIGHT"]))
+    parser.add_argument(
+        "--intent-bm25-weights", default=str(current["INTENT_BM25_WEIGHT"])
+    )
+    parser.add_argument("--overfetch", default=str(current["SEARCH_OVERFETCH"]))
+    parser.add_argument("--rrf-k", default=str(current["RRF_K"]))
+    parser.add_argument(
+        "--num-candidates",
+        default=str(current["KNN_CANDIDATES_FACTOR"]),
+        help="kNN num_candidates as a multiple of k (Elasticsearch only)",
+    )
+    parser.add_argument(
+        "--modes",
+        default=current["RETRIEVAL_MODE"],
+        help="Retrieval modes: flat, hierarchical (Elasticsearch indices from "
+        "before document embeddings need scripts/backfill_document_embeddings.py)",
+    )
+    parser.add_argument(
+        "--top-documents",
+        default=str(current["HIERARCHICAL_TOP_DOCUMENTS"]),
+        help="Documents searched per query in hierarchical mode",
+    )
+
+    parser.add_argument("--min-recall", type=float, default=0.0)
+    parser.add_argument("--recall-at", type=int, default=5)
+    parser.add_argument("--output", default="", help="Results JSON path")
+
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if results:
+        output = save_results(results, "retrieval", args.output)
+        print(f"\n✓ Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
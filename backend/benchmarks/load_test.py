@@ -0,0 +1,334 @@
+"""
+End-to-end load and latency benchmark
+
+This script:
+1. Generates a synthetic paper corpus and renders it to PDFs
+2. Starts Papyrus in-process with a fake LLM (configurable token rate) on
+   the in-memory search backend or the configured Elasticsearch, or targets
+   an already running server with --url
+3. Uploads the corpus through /upload/pdf, then drives /query/ and
+   /query/stream with concurrent clients
+4. Reports ingestion docs/s, p50/p95/p99 query latency and streaming
+   time-to-first-token, and saves everything as JSON for comparing commits
+
+Usage:
+    python benchmarks/load_test.py --papers 20 --queries 200 --concurrency 16
+    python benchmarks/load_test.py --compare benchmarks/results/load-abc123.json
+    python benchmarks/load_test.py --url http://localhost:8000
+"""
+
+import asyncio
+import json
+import socket
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from benchmarks.corpus import make_corpus, render_pdf
+from benchmarks.reporting import new_results, save_results
+
+API = "/api/v1"
+
+# Headline numbers shown by --compare (section, key, higher is better)
+HEADLINES = [
+    ("ingestion", "docs_per_s", True),
+    ("ingestion", "chunks_per_s", True),
+    ("query", "p50_ms", False),
+    ("query", "p95_ms", False),
+    ("query", "p99_ms", False),
+    ("query", "throughput_qps", True),
+    ("stream", "ttft_p50_ms", False),
+    ("stream", "ttft_p95_ms", False),
+    ("stream", "p95_ms", False),
+]
+
+
+def summarize(latencies: List[float], errors: int, wall: float) -> Dict[str, Any]:
+    ms = np.asarray(latencies) * 1000
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_qps": len(latencies) / wall if wall else 0.0,
+    }
+    if len(ms):
+        summary.update(
+            mean_ms=float(ms.mean()),
+            p50_ms=float(np.percentile(ms, 50)),
+            p95_ms=float(np.percentile(ms, 95)),
+            p99_ms=float(np.percentile(ms, 99)),
+            max_ms=float(ms.max()),
+        )
+    return summary
+
+
+async def run_concurrently(count: int, concurrency: int, job) -> float:
+    """Run job(i) for i in range(count), concurrency at a time; wall seconds"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(i: int):
+        async with limit:
+            await job(i)
+
+    start = perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(count)))
+    return perf_counter() - start
+
+
+async def bench_ingestion(client, papers, concurrency: int) -> Dict[str, Any]:
+    pdfs = [render_pdf(paper) for paper in papers]
+    chunks = 0
+    errors = 0
+
+    async def upload(i: int):
+        nonlocal chunks, errors
+        files = {"file": (papers[i].filename, pdfs[i], "application/pdf")}
+        response = await client.post(f"{API}/upload/pdf", files=files)
+        if response.status_code == 200:
+            chunks += response.json()["chunks_created"]
+        else:
+            errors += 1
+
+    wall = await run_concurrently(len(papers), concurrency, upload)
+    documents = len(papers) - errors
+    return {
+        "documents": documents,
+        "chunks": chunks,
+        "errors": errors,
+        "seconds": wall,
+        "docs_per_s": documents / wall,
+        "chunks_per_s": chunks / wall,
+    }
+
+
+async def bench_query(client, queries, concurrency: int, top_k: int):
+    latencies = []
+    errors = 0
+
+    async def query(i: int):
+        nonlocal errors
+        start = perf_counter()
+        response = await client.post(
+            f"{API}/query/", json={"query": queries[i], "top_k": top_k}
+        )
+        if response.status_code == 200:
+            latencies.append(perf_counter() - start)
+        else:
+            errors += 1
+
+    wall = await run_concurrently(len(queries), concurrency, query)
+    return summarize(latencies, errors, wall)
+
+
+async def bench_stream(client, queries, concurrency: int, top_k: int):
+    latencies = []
+    ttfts = []
+    errors = 0
+
+    async def stream(i: int):
+        nonlocal errors
+        start = perf_counter()
+        first_token = None
+        failed = False
+        async with client.stream(
+            "POST",
+            f"{API}/query/stream",
+            json={"query": queries[i], "top_k": top_k, "include_sources": False},
+        ) as response:
+            if response.status_code != 200:
+                errors += 1
+                return
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: ") :])
+                if event["type"] == "answer" and first_token is None:
+                    first_token = perf_counter() - start
+                elif event["type"] == "error":
+                    failed = True
+
+        if failed or first_token is None:
+            errors += 1
+            return
+        ttfts.append(first_token)
+        latencies.append(perf_counter() - start)
+
+    wall = await run_concurrently(len(queries), concurrency, stream)
+    summary = summarize(latencies, errors, wall)
+    if ttfts:
+        ttft_ms = np.asarray(ttfts) * 1000
+        summary.update(
+            ttft_p50_ms=float(np.percentile(ttft_ms, 50)),
+            ttft_p95_ms=float(np.percentile(ttft_ms, 95)),
+            ttft_p99_ms=float(np.percentile(ttft_ms, 99)),
+        )
+    return summary
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(args, data_dir: str) -> str:
+    """Run the API in a background thread with the fake services wired in"""
+    import uvicorn
+
+    settings.SEARCH_BACKEND = args.search
+    settings.MEMORY_INDEX_DIR = str(Path(data_dir) / "index")
+    settings.UPLOAD_DIR = str(Path(data_dir) / "raw")
+    settings.COALESCE_QUERIES = args.coalesce
+
+    from app.main import app
+    from app.api import dependencies
+    from app.core.retriever import HybridRetriever
+    from benchmarks.fakes import FakeLLMService, HashingEmbeddingService
+
+    llm = FakeLLMService(args.tokens_per_second, args.ttft_ms, args.answer_tokens)
+    app.dependency_overrides[dependencies.get_llm_service] = lambda: llm
+
+    if args.fake_embeddings:
+        embeddings = HashingEmbeddingService()
+        retriever = HybridRetriever(
+            dependencies.get_elasticsearch_client(),
+            embeddings,
+            admission=dependencies.get_admission_controller(),
+        )
+        app.dependency_overrides[dependencies.get_embedding_service] = (
+            lambda: embeddings
+        )
+        app.dependency_overrides[dependencies.get_hybrid_retriever] = lambda: retriever
+
+    port = free_port()
+    # The lifespan would load the real embedding model and LLM clients
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        sleep(0.05)
+
+    return f"http://127.0.0.1:{port}"
+
+
+def print_comparison(current: Dict[str, Any], baseline_path: str):
+    baseline = json.loads(Path(baseline_path).read_text())
+    print(f"\nvs {baseline_path} ({baseline.get('commit')}):")
+    for section, key, higher_is_better in HEADLINES:
+        old = baseline.get(section, {}).get(key)
+        new = current.get(section, {}).get(key)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change > 0) == higher_is_better
+        mark = "✓" if better or change == 0 else "✗"
+        print(f"  {mark} {section}.{key}: {old:.1f} → {new:.1f} ({change:+.1f}%)")
+
+
+async def run(args) -> Dict[str, Any]:
+    papers = make_corpus(args.papers, pages=args.pages, seed=args.seed)
+    facts = [fact for paper in papers for fact in paper.facts]
+    queries = [facts[i % len(facts)].query for i in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        url = args.url or start_local_server(args, data_dir)
+
+        limits = httpx.Limits(max_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(
+            base_url=url, timeout=args.timeout, limits=limits
+        ) as client:
+            print(f"Uploading {len(papers)} synthetic papers to {url}...")
+            ingestion = await bench_ingestion(client, papers, args.upload_concurrency)
+            print(
+                f"✓ Ingestion: {ingestion['docs_per_s']:.2f} docs/s, "
+                f"{ingestion['chunks_per_s']:.1f} chunks/s"
+            )
+
+            print(
+                f"Running {len(queries)} queries at concurrency {args.concurrency}..."
+            )
+            query = await bench_query(client, queries, args.concurrency, args.top_k)
+            print(
+                f"✓ /query/: p50 {query.get('p50_ms', 0):.0f}ms, "
+                f"p95 {query.get('p95_ms', 0):.0f}ms, "
+                f"p99 {query.get('p99_ms', 0):.0f}ms, "
+                f"{query['throughput_qps']:.1f} q/s, {query['errors']} errors"
+            )
+
+            stream = await bench_stream(client, queries, args.concurrency, args.top_k)
+            print(
+                f"✓ /query/stream: TTFT p50 {stream.get('ttft_p50_ms', 0):.0f}ms, "
+                f"p95 {stream.get('ttft_p95_ms', 0):.0f}ms; "
+                f"total p95 {stream.get('p95_ms', 0):.0f}ms, {stream['errors']} errors"
+            )
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    return {
+        **new_results(config),
+        "ingestion": ingestion,
+        "query": query,
+        "stream": stream,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Papyrus load benchmark")
+    parser.add_argument("--papers", type=int, default=20, help="Synthetic papers")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per paper")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per phase")
+    parser.add_argument("--concurrency", type=int, default=16, help="Query clients")
+    parser.add_argument(
+        "--upload-concurrency", type=int, default=4, help="Concurrent uploads"
+    )
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--url", default="", help="Benchmark a running server instead (real LLM)"
+    )
+    parser.add_argument(
+        "--search",
+        choices=["memory", "elasticsearch"],
+        default="memory",
+        help="Search backend for the in-process server",
+    )
+    parser.add_argument(
+        "--fake-embeddings",
+        action="store_true",
+        help="Hashed bag-of-words embeddings instead of the real model",
+    )
+    parser.add_argument(
+        "--coalesce", action="store_true", help="Keep COALESCE_QUERIES on"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="", help="Results JSON path")
+    parser.add_argument("--compare", default="", help="Earlier results JSON")
+
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    output = save_results(results, "load", args.output)
+    print(f"\n✓ Results saved to: {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import pytest
+from benchmarks.micro.inputs import long_paper_text
+
+# document_processor imports PyMuPDF at module level
+pytest.importorskip("fitz")
+
+from app.core.document_processor import DocumentProcessor
+
+TEXT = long_paper_text()
+
+
+def test_create_chunks_50_page_paper(benchmark):
+    processor = DocumentProcessor(embedding_service=None)
+
+    chunks = benchmark(processor._create_chunks, TEXT, "doc0")
+
+    assert len(chunks) > 40
@@ -0,0 +1,26 @@
+from app.core.context_compressor import ContextCompressor
+from app.core.groq_service import GroqService
+from app.core.llm_service import LLMService
+from app.core.prompt_budget import TokenCounter
+from benchmarks.micro.inputs import context_chunks
+
+# Character estimate: times our compression, not the tokenizer library
+COMPRESSOR = ContextCompressor(counter=TokenCounter("chars"))
+CHUNKS = context_chunks()
+QUERY = "What score does the model achieve and how was it trained?"
+
+
+def test_format_context_ollama(benchmark):
+    service = LLMService(compressor=COMPRESSOR)
+
+    context = benchmark(service._format_context, CHUNKS, QUERY, 1000)
+
+    assert context.startswith("[Source 1]")
+
+
+def test_format_context_groq(benchmark):
+    service = GroqService(compressor=COMPRESSOR)
+
+    context = benchmark(service._format_context, CHUNKS, QUERY, 1000)
+
+    assert context.startswith("[Source 1]")
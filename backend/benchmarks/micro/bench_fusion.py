@@ -0,0 +1,17 @@
+from app.utils.helpers import reciprocal_rank_fusion
+from benchmarks.micro.inputs import FUSION_CANDIDATES, fusion_candidates
+
+BM25, VECTOR = fusion_candidates()
+
+
+def test_reciprocal_rank_fusion_1000_candidates(benchmark):
+    fused = benchmark(
+        reciprocal_rank_fusion,
+        bm25_results=BM25,
+        vector_results=VECTOR,
+        k=60,
+        bm25_weight=0.4,
+        vector_weight=0.6,
+    )
+
+    assert len(fused) == FUSION_CANDIDATES * 3 // 2
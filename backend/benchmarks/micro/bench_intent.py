@@ -0,0 +1,8 @@
+from app.utils.intent_detector import detect_intent
+from benchmarks.micro.inputs import QUERIES
+
+
+def test_detect_intent(benchmark):
+    intents = benchmark(lambda: [detect_intent(query) for query in QUERIES])
+
+    assert len(set(intents)) > 3
@@ -0,0 +1,65 @@
+from app.utils.query_analysis import analyze_query
+from app.utils.validators import AnswerValidator, ContextIndex
+from benchmarks.micro.inputs import QUERIES, context_chunks, long_answer
+
+VALIDATOR = AnswerValidator()
+CHUNKS = context_chunks()
+CONTEXT = [chunk["content"] for chunk in CHUNKS]
+ANSWER = long_answer(CHUNKS)
+QUESTION = "What do the authors conclude about the benchmark results?"
+ANALYSIS = analyze_query(QUESTION)
+# Short and long answers, as prose and behind a comparison table, checked
+# against every query so one call takes milliseconds rather than noisy µs
+TABLE = "| Model | Score |\n|-------|-------|\n" + "| A | 90 |\n" * 20
+STRUCTURAL_ANSWERS = [
+    prefix + answer
+    for answer in (ANSWER, long_answer(CHUNKS, sentences=160))
+    for prefix in ("", TABLE)
+]
+QUESTIONS = [(query, analyze_query(query)) for query in QUERIES]
+
+
+def test_validate_all_long_answer(benchmark):
+    results = benchmark(VALIDATOR.validate_all, ANSWER, QUESTION, CONTEXT, ANALYSIS)
+
+    assert "factual_support" in results
+
+
+def test_structural_layer(benchmark):
+    structural = VALIDATOR.structural
+
+    def validate():
+        return [
+            [
+                structural.validate_table_usage(answer, question, analysis),
+                structural.validate_whitespace(answer),
+                structural.validate_verification_format(answer, question, analysis),
+                structural.validate_length(answer),
+                structural.validate_no_meta_text(answer),
+            ]
+            for answer in STRUCTURAL_ANSWERS
+            for question, analysis in QUESTIONS
+        ]
+
+    assert len(benchmark(validate)) == len(STRUCTURAL_ANSWERS) * len(QUERIES)
+
+
+def test_context_index(benchmark):
+    index = benchmark(ContextIndex, CONTEXT)
+
+    assert index.content_words
+
+
+def test_evidence_layer(benchmark):
+    evidence = VALIDATOR.evidence
+
+    def validate():
+        index = ContextIndex(CONTEXT)
+        return [
+            evidence.validate_evidence_coverage(ANSWER, CONTEXT, index=index),
+            evidence.validate_factual_claims_have_support(ANSWER, CONTEXT, index=index),
+        ]
+
+    coverage, _ = benchmark(validate)
+
+    assert coverage.passed
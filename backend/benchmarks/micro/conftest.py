@@ -0,0 +1,210 @@
+"""
+Microbenchmark runner with baseline regression gates.
+
+Benchmarks are pytest tests (bench_*.py) that call the `benchmark` fixture
+with the function under test. Each call is calibrated into rounds of at
+least MIN_ROUND_S, and ROUNDS rounds are timed, interleaved with rounds of a
+fixed pure-Python reference workload. The fastest time per call (the least
+noisy estimate) divided by the fastest reference time is compared with
+baselines.json, so gates hold across machines and through CPU frequency
+drift. A benchmark that looks slower than its baseline by more than
+--bench-tolerance is measured once more, and fails if the regression holds.
+A baseline entry may carry its own wider "tolerance" for a benchmark whose
+timings stay noisy; --bench-save keeps it.
+
+Refresh the baselines with --bench-save after an intended change.
+
+Usage:
+    python -m pytest benchmarks/micro
+    python -m pytest benchmarks/micro --bench-tolerance 0.1
+    python -m pytest benchmarks/micro --bench-save
+"""
+
+import gc
+import json
+import platform
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+BASELINES = Path(__file__).parent / "baselines.json"
+ROUNDS = 11
+MIN_ROUND_S = 0.05
+
+REFERENCE_CALLS = 20
+
+RESULTS = pytest.StashKey[Dict[str, Dict[str, Any]]]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption(
+        "--bench-tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline, as a fraction (0.25 = 25%%)",
+    )
+    group.addoption(
+        "--bench-save",
+        action="store_true",
+        help="Store this run's times as the new baselines",
+    )
+
+
+def _load_baselines() -> Dict[str, Dict[str, Any]]:
+    if not BASELINES.exists():
+        return {}
+    return json.loads(BASELINES.read_text())["benchmarks"]
+
+
+def _reference_workload():
+    """Interpreter-bound mix of the operations the benchmarked code uses"""
+    words = [f"token{i % 97}" for i in range(2000)]
+    counts: Dict[str, int] = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+class Benchmark:
+    def __init__(self, baseline: Optional[Dict[str, Any]], tolerance: float):
+        self.baseline = baseline
+        self.tolerance = tolerance
+        self.stats: Optional[Dict[str, Any]] = None
+
+    def __call__(self, fn, *args, **kwargs):
+        """Time fn(*args, **kwargs); returns its result for assertions"""
+        result = fn(*args, **kwargs)
+
+        calls = 1
+        while self._round(fn, args, kwargs, calls) * calls < MIN_ROUND_S:
+            calls *= 2
+
+        times, reference = self._measure(fn, args, kwargs, calls)
+        if self._regressed(times[0] / reference):
+            # Confirm before failing: one slow run is usually a noisy neighbour
+            more_times, more_reference = self._measure(fn, args, kwargs, calls)
+            times = sorted(times + more_times)
+            reference = min(reference, more_reference)
+
+        relative = times[0] / reference
+        self.stats = {
+            "min_s": times[0],
+            "median_s": times[len(times) // 2],
+            "relative": relative,
+            "calls": calls,
+        }
+
+        if self._regressed(relative):
+            change = relative / self.baseline["relative"] - 1
+            pytest.fail(
+                f"Regressed {change:+.0%} against the baseline, relative to the "
+                f"reference workload ({_format_time(times[0])} per call, "
+                f"tolerance {self.tolerance:.0%})"
+            )
+        return result
+
+    def _regressed(self, relative: float) -> bool:
+        if self.baseline is None:
+            return False
+        return relative > self.baseline["relative"] * (1 + self.tolerance)
+
+    def _measure(self, fn, args, kwargs, calls: int) -> Tuple[List[float], float]:
+        """Sorted per-call times, and the fastest reference time per call"""
+        times = []
+        reference = []
+        for _ in range(ROUNDS):
+            reference.append(self._round(_reference_workload, (), {}, REFERENCE_CALLS))
+            times.append(self._round(fn, args, kwargs, calls))
+        return sorted(times), min(reference)
+
+    @staticmethod
+    def _round(fn, args, kwargs, calls: int) -> float:
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = perf_counter()
+            for _ in range(calls):
+                fn(*args, **kwargs)
+            return (perf_counter() - start) / calls
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+@pytest.fixture
+def benchmark(request):
+    config = request.config
+    name = request.node.nodeid
+    saving = config.getoption("--bench-save")
+    baseline = None if saving else _load_baselines().get(name)
+
+    tolerance = config.getoption("--bench-tolerance")
+    if baseline is not None:
+        tolerance = max(tolerance, baseline.get("tolerance", tolerance))
+
+    bench = Benchmark(baseline, tolerance)
+    yield bench
+
+    if bench.stats is not None:
+        results = config.stash.setdefault(RESULTS, {})
+        results[name] = {**bench.stats, "baseline": baseline}
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(RESULTS, {})
+    if not results:
+        return
+
+    terminalreporter.section("benchmarks (fastest time per call, x reference)")
+    for name, stats in sorted(results.items()):
+        line = (
+            f"{name:<60} {_format_time(stats['min_s']):>10} "
+            f"{stats['relative']:>8.3f}x"
+        )
+        if stats["baseline"]:
+            baseline = stats["baseline"]["relative"]
+            change = stats["relative"] / baseline - 1
+            line += f"  baseline {baseline:>8.3f}x {change:+.0%}"
+        terminalreporter.write_line(line)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    results = config.stash.get(RESULTS, {})
+    if not results or not config.getoption("--bench-save", default=False):
+        return
+
+    baselines = _load_baselines()
+    for name, stats in results.items():
+        entry = {
+            "relative": stats["relative"],
+            "min_s": stats["min_s"],
+            "calls": stats["calls"],
+        }
+        if "tolerance" in baselines.get(name, {}):
+            entry["tolerance"] = baselines[name]["tolerance"]
+        baselines[name] = entry
+
+    BASELINES.write_text(
+        json.dumps(
+            {
+                "machine": platform.machine(),
+                "processor": platform.processor(),
+                "python": platform.python_version(),
+                "benchmarks": dict(sorted(baselines.items())),
+            },
+            indent=2,
+        )
+        + "\n"
+    )
@@ -0,0 +1,105 @@
+"""Realistic, deterministic inputs shared by the microbenchmarks"""
+
+import random
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.corpus import make_paper
+
+LONG_PAPER_PAGES = 50
+FUSION_CANDIDATES = 1000
+CONTEXT_CHUNKS = 8
+CHUNK_WORDS = 512
+ANSWER_SENTENCES = 40
+
+# Mix of intents as users phrase them, including verification and lists
+QUERIES = [
+    "What learning rate was used to train GraphNet-3?",
+    "Compare the results of ProteinNet and SpeechNet on ArcBench",
+    "What are the differences between message passing and node embeddings?",
+    "Who are the authors of this paper?",
+    "List the authors and their affiliations",
+    "What do the authors argue about oversmoothing?",
+    "Summarize the main contributions",
+    "Give me an overview of the methods section",
+    "What is reward shaping?",
+    "Define beam search in the context of speech recognition",
+    "What hyperparameters were used for fine-tuning?",
+    "Which batch size and optimizer did they use?",
+    "Is it true that GraphNet-3 outperforms the baseline?",
+    "Does the model use skip connections?",
+    "Did the authors evaluate on NovaSet?",
+    "What did they observe when scaling the number of layers?",
+    "What trends appear in the ablation results?",
+    "Why does back translation help low-resource languages?",
+    "Explain how dark matter halos affect rotation curves",
+    "How does the encoder decoder handle boundary loss?",
+    "What do the authors conclude about aerosol forcing?",
+    "What are the limitations and future work?",
+    "ocean heat uptake ensemble spread",
+    "Tell me about attention heads",
+]
+
+
+def long_paper_text(pages: int = LONG_PAPER_PAGES) -> str:
+    return make_paper(0, pages=pages).text
+
+
+def fusion_candidates(
+    count: int = FUSION_CANDIDATES,
+) -> Tuple[List[Tuple[str, Dict]], List[Tuple[str, Dict]]]:
+    """BM25 and vector result lists that share half of their chunks"""
+    rng = random.Random(0)
+
+    def result(i: int) -> Tuple[str, Dict[str, Any]]:
+        chunk_id = f"doc{i % 50}_chunk_{i}"
+        return chunk_id, {"chunk_id": chunk_id, "content": f"chunk {i}"}
+
+    bm25 = [result(i) for i in range(count)]
+    vector = [result(i) for i in range(count // 2, count + count // 2)]
+    rng.shuffle(vector)
+    return bm25, vector
+
+
+def context_chunks(count: int = CONTEXT_CHUNKS) -> List[Dict[str, Any]]:
+    """Retrieved chunks of CHUNK_WORDS words from the long paper"""
+    paper = make_paper(1, pages=LONG_PAPER_PAGES)
+    words = paper.text.split()
+    step = len(words) // count
+    return [
+        {
+            "chunk_id": f"doc1_chunk_{i}",
+            "title": paper.title,
+            "page_number": i * LONG_PAPER_PAGES // count + 1,
+            "section": "RESULTS",
+            "content": " ".join(words[i * step : i * step + CHUNK_WORDS]),
+        }
+        for i in range(count)
+    ]
+
+
+def long_answer(chunks: List[Dict[str, Any]], sentences: int = ANSWER_SENTENCES):
+    """
+    Answer restating context sentences, some cited, some paraphrased with
+    claims the context does not contain
+    """
+    rng = random.Random(0)
+    context_sentences = [
+        sentence.strip()
+        for chunk in chunks
+        for sentence in chunk["content"].split(". ")
+        if len(sentence.split()) > 6
+    ]
+
+    parts = []
+    for i in range(sentences):
+        sentence = rng.choice(context_sentences)
+        if i % 3 == 0:
+            parts.append(f"{sentence} [Source {i % len(chunks) + 1}].")
+        elif i % 3 == 1:
+            parts.append(f"{sentence}.")
+        else:
+            parts.append(
+                "The proposed approach achieves consistent improvements "
+                f"over {rng.randint(2, 9)} strong baselines in every setting."
+            )
+    return " ".join(parts)
@@ -0,0 +1,44 @@
+"""Saving benchmark results as JSON tagged with the commit they measured"""
+
+import json
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+def new_results(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": config,
+    }
+
+
+def save_results(results: Dict[str, Any], prefix: str, output: str = "") -> Path:
+    """Write to output, or to results/<prefix>-<commit>-<time>.json"""
+    path = (
+        Path(output)
+        if output
+        else RESULTS_DIR
+        / (
+            f"{prefix}-{results['commit'] or 'nocommit'}-"
+            f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+        )
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+    return path
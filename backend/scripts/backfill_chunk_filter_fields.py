@@ -0,0 +1,44 @@
+"""
+Make papers indexed before filtered retrieval filterable by author, source
+and publication date
+
+This script:
+1. Walks every document record in the document index
+2. Copies its authors, source and publication_date onto those of its chunks
+   that do not have them yet, with one update_by_query per document
+3. Refreshes the chunk index so filtered searches see the fields
+
+Chunks indexed since filtered retrieval was added already carry the fields
+and are skipped, so it is safe to re-run. The in-memory backend reads the
+document records when filtering and needs no backfill.
+
+Usage:
+    python scripts/backfill_chunk_filter_fields.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.api.dependencies import get_elasticsearch_client
+
+
+async def backfill():
+    store = get_elasticsearch_client()
+    await store.initialize()
+
+    print("Copying document filter fields onto chunks...")
+    updated = await store.copy_filter_fields_to_chunks()
+    print(f"✓ Updated {updated} chunks")
+
+    await store.close()
+
+
+def main():
+    asyncio.run(backfill())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Store document embeddings for papers indexed before two-stage retrieval
+
+This script:
+1. Streams every chunk embedding out of the configured search backend
+2. Pools them per paper (mean of unit vectors, re-normalized), exactly as
+   indexing does for new papers
+3. Writes the pooled vectors to the document index in bulk batches
+
+RETRIEVAL_MODE=hierarchical only considers papers that have a document
+embedding, so run this once after upgrading an existing index. It is safe
+to re-run; every paper's embedding is recomputed.
+
+Usage:
+    python scripts/backfill_document_embeddings.py
+    python scripts/backfill_document_embeddings.py --batch-size 200
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.api.dependencies import get_elasticsearch_client
+
+
+def document_id_of(chunk_id: str) -> str:
+    return chunk_id.rsplit("_chunk_", 1)[0]
+
+
+async def backfill(batch_size: int):
+    store = get_elasticsearch_client()
+    await store.initialize()
+
+    print("Pooling chunk embeddings per document...")
+    # document_id -> (sum of unit chunk vectors, chunk count)
+    sums: Dict[str, Tuple[np.ndarray, int]] = {}
+    async for chunk_id, embedding in store.iter_chunk_embeddings():
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= max(float(np.linalg.norm(vector)), 1e-12)
+
+        document_id = document_id_of(chunk_id)
+        total, count = sums.get(document_id, (0.0, 0))
+        sums[document_id] = (total + vector, count + 1)
+
+    if not sums:
+        print("No chunk embeddings found! Upload some PDFs first.")
+        await store.close()
+        return
+
+    embeddings = {
+        document_id: (total / max(float(np.linalg.norm(total)), 1e-12)).tolist()
+        for document_id, (total, _) in sums.items()
+    }
+
+    document_ids = list(embeddings)
+    for start in range(0, len(document_ids), batch_size):
+        batch = document_ids[start : start + batch_size]
+        await store.set_document_embeddings({d: embeddings[d] for d in batch})
+        print(f"  {min(start + batch_size, len(document_ids))}/{len(document_ids)}")
+
+    chunks = sum(count for _, count in sums.values())
+    print(f"✓ Stored embeddings for {len(embeddings)} documents ({chunks} chunks)")
+
+    await store.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill document embeddings")
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Documents per bulk request"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(backfill(args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from app.core.admission import OverloadedError, StageLimiter
+from app.core.metrics import ADMISSION_WAIT_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_full():
+    limiter = StageLimiter("llm", max_concurrency=1, max_queue=1, queue_timeout=5)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    running = asyncio.create_task(hold())
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(OverloadedError) as exc:
+        async with limiter.slot():
+            pass
+    assert exc.value.status_code == 429
+    assert exc.value.retry_after >= 1
+
+    stats = limiter.stats()
+    assert stats["in_flight"] == 1 and stats["queue_depth"] == 1
+    assert stats["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(running, queued)
+    assert limiter.stats()["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_times_out():
+    limiter = StageLimiter("search", max_concurrency=1, max_queue=4, queue_timeout=0.02)
+    observed = ADMISSION_WAIT_SECONDS.count(stage="search")
+
+    async with limiter.slot():
+        with pytest.raises(OverloadedError) as exc:
+            async with limiter.slot():
+                pass
+
+    assert exc.value.status_code == 503
+    assert limiter.stats()["timed_out"] == 1
+    assert limiter.stats()["queue_depth"] == 0
+    # Both waits, admitted and timed out, feed the exported histogram
+    assert ADMISSION_WAIT_SECONDS.count(stage="search") == observed + 2
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from app.core.ann_index import IVFPQIndex, AnnVectorSearcher
+from app.core.memory_store import InMemorySearchClient
+from app.models.document import Document, DocumentChunk
+
+
+def clustered_vectors(n=2000, dims=64, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dims))
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(n, dims))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_ivfpq_recall_and_compression():
+    vectors = clustered_vectors()
+    ids = [f"chunk_{i}" for i in range(len(vectors))]
+
+    index = IVFPQIndex(dimension=64, nlist=32, m=16)
+    index.train(vectors, iterations=10)
+    index.add(ids, vectors)
+
+    assert index.ntotal == len(vectors)
+    assert index.codes.nbytes * 16 == vectors.nbytes
+
+    hits = 0
+    for q in range(0, len(vectors), 50):
+        exact = np.argsort(-(vectors @ vectors[q]))[:10]
+        shortlist = {cid for cid, _ in index.search(vectors[q], 50, nprobe=8)}
+        hits += sum(1 for row in exact if ids[row] in shortlist)
+
+    assert hits / (40 * 10) > 0.9
+
+
+def test_ivfpq_save_load(tmp_path):
+    vectors = clustered_vectors(n=500)
+    ids = [f"chunk_{i}" for i in range(len(vectors))]
+    index = IVFPQIndex(dimension=64, nlist=8, m=8)
+    index.train(vectors, iterations=5)
+    index.add(ids, vectors)
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = IVFPQIndex.load(path)
+
+    assert loaded.search(vectors[3], 5) == index.search(vectors[3], 5)
+
+
+@pytest.mark.asyncio
+async def test_ann_searcher_rescores_exactly(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.memory_store.settings.EMBEDDING_DIMENSION", 64)
+    vectors = clustered_vectors(n=300)
+    store = InMemorySearchClient(data_dir=str(tmp_path))
+    await store.index_document(
+        Document(
+            document_id="doc",
+            title="Paper",
+            content="",
+            filename="doc.pdf",
+            source="pdf",
+            chunks=[
+                DocumentChunk(
+                    chunk_id=f"doc_chunk_{i}",
+                    document_id="doc",
+                    content=f"chunk {i}",
+                    embedding=vector.tolist(),
+                )
+                for i, vector in enumerate(vectors)
+            ],
+        )
+    )
+
+    index = IVFPQIndex(dimension=64, nlist=8, m=8)
+    index.train(vectors, iterations=5)
+    index.add([f"doc_chunk_{i}" for i in range(len(vectors))], vectors)
+
+    searcher = AnnVectorSearcher(index, store, nprobe=8, shortlist_size=30)
+    results = await searcher.vector_search(vectors[7].tolist(), top_k=3)
+
+    assert results[0]["chunk_id"] == "doc_chunk_7"
+    assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert "embedding" not in results[0]
@@ -0,0 +1,44 @@
+from app.core.context_compressor import ContextCompressor
+from app.core.prompt_budget import TokenCounter, estimate_tokens
+
+COUNTER = TokenCounter("chars")
+
+FILLER = "The weather section discusses unrelated observations in detail. " * 6
+
+
+def test_short_context_is_untouched():
+    compressor = ContextCompressor(token_budget=1000, mode="overlap", counter=COUNTER)
+    chunks = [{"content": "Self-attention relates positions."}]
+    assert compressor.compress("What is self-attention?", chunks) == [
+        "Self-attention relates positions."
+    ]
+
+
+def test_keeps_query_relevant_sentences_within_budget():
+    compressor = ContextCompressor(token_budget=60, mode="overlap", counter=COUNTER)
+    chunks = [
+        {"content": FILLER + "Self-attention relates different positions. " + FILLER},
+        {"content": FILLER + "Dropout rate is 0.1 for the base model."},
+    ]
+
+    compressed = compressor.compress(
+        "How does self-attention relate positions?", chunks
+    )
+
+    assert len(compressed) == 2
+    assert "Self-attention relates different positions." in compressed[0]
+    assert compressed[1]  # every source keeps at least one sentence
+    assert sum(estimate_tokens(text) for text in compressed) <= 60 + 2
+
+
+def test_gap_marker_between_non_adjacent_sentences():
+    compressor = ContextCompressor(token_budget=25, mode="overlap", counter=COUNTER)
+    text = (
+        "Attention weights are normalized. "
+        + "Padding is applied to every batch of sequences here. " * 4
+        + "Attention heads run in parallel."
+    )
+    compressed = compressor.compress("attention heads weights", [{"content": text}])
+
+    assert compressed[0].startswith("Attention weights are normalized. ...")
+    assert compressed[0].endswith("Attention heads run in parallel.")
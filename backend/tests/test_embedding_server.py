@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.core.embedding_server import EmbeddingClient, EmbeddingServer, parse_url
+from app.core.embedding_service import EmbeddingService
+
+
+class FakeModel:
+    def encode(self, texts, normalize_embeddings=False, **kwargs):
+        vectors = np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    path = tmp_path / "embed.sock"
+    url = f"unix://{path}"
+    server = EmbeddingServer(model=FakeModel(), max_batch=16, max_wait_ms=20)
+    loop = asyncio.new_event_loop()
+    serving = loop.create_task(server.serve(url))
+
+    def run():
+        try:
+            loop.run_until_complete(serving)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield url, server
+    loop.call_soon_threadsafe(serving.cancel)
+    thread.join(5)
+    loop.close()
+
+
+def test_parse_url():
+    assert parse_url("unix:///tmp/e.sock") == ("unix", "/tmp/e.sock")
+    assert parse_url("tcp://127.0.0.1:8765") == ("tcp", ("127.0.0.1", 8765))
+    with pytest.raises(ValueError):
+        parse_url("http://localhost")
+
+
+def test_client_mode_matches_model_output(server_url):
+    url, _ = server_url
+    service = EmbeddingService(server_url=url)
+
+    assert service.embed_text("abc") == [3.0, 1.0]
+    batch = service.embed_batch(["abcd", "ab"])
+    np.testing.assert_allclose(np.linalg.norm(batch, axis=1), 1.0, rtol=1e-6)
+    assert service.embed_batch([]) == []
+    service.close()
+
+
+def test_concurrent_requests_share_batches(server_url):
+    url, server = server_url
+    services = [EmbeddingService(server_url=url) for _ in range(8)]
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda s: s.embed_text("x" * 5), services))
+
+    assert all(result == [5.0, 1.0] for result in results)
+    assert server.batches < len(services)
+
+
+def test_concurrent_calls_on_one_client_land_in_one_batch(server_url):
+    url, server = server_url
+    client = EmbeddingClient(url)
+    start = threading.Barrier(2)
+
+    def embed(text):
+        start.wait()
+        return client.embed([text]).tolist()
+
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(embed, ["abc", "abcde"]))
+
+    assert results == [[[3.0, 1.0]], [[5.0, 1.0]]]
+    assert server.batches == 1
+    # Both connections are kept for the next calls
+    assert len(client._idle) == 2
+    client.close()
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import pytest
+from app.core.validation_dispatcher import JudgeDispatcher
+from app.utils.llm_judge import LLMJudge
+
+
+class FakeLLM:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    async def generate_response(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return self.reply
+
+
+@pytest.mark.asyncio
+async def test_structured_verdict_is_parsed_and_cached():
+    llm = FakeLLM(json.dumps({"verdict": "FAIL", "issues": ["Unsupported BLEU"]}))
+    judge = LLMJudge(llm)
+
+    first = await judge.validate_answer("q", "answer", ["context"])
+    second = await judge.validate_answer("q", "answer", ["context"])
+
+    assert not first.passed
+    assert "Unsupported BLEU" in first.reason
+    assert second is first
+    assert len(llm.calls) == 1
+    assert llm.calls[0]["json_mode"] is True
+    assert llm.calls[0]["max_tokens"] <= 200
+
+
+@pytest.mark.asyncio
+async def test_malformed_verdict_is_skipped():
+    judge = LLMJudge(FakeLLM("VERDICT: PASS"))
+    result = await judge.validate_answer("q", "answer", ["context"])
+
+    assert result.passed
+    assert result.severity == "warning"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_samples_and_judges_in_background():
+    llm = FakeLLM(json.dumps({"verdict": "PASS", "issues": []}))
+    dispatcher = JudgeDispatcher(LLMJudge(llm), sample_rate=1.0, concurrency=2)
+
+    assert dispatcher.submit("answer", "q", ["context"])
+    await asyncio.wait_for(dispatcher.queue.join(), 1)
+    await dispatcher.stop()
+    assert dispatcher.stats()["passed"] == 1
+
+    skipped = JudgeDispatcher(LLMJudge(llm), sample_rate=0.0)
+    assert not skipped.submit("answer", "q", ["context"])
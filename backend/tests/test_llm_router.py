@@ -0,0 +1,177 @@
+import asyncio
+import pytest
+from app.core.llm_router import FALLBACK_ANSWER, CircuitBreaker, LLMRouter
+
+
+class FakeProvider:
+    def __init__(self, answer: str, delay: float = 0.0, fail: bool = False):
+        self.answer = answer
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def generate_answer(
+        self,
+        query,
+        context_chunks,
+        prompt_template="default",
+        raise_errors=False,
+        analysis=None,
+    ):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return self.answer
+
+    async def generate_answer_stream(
+        self,
+        query,
+        context_chunks,
+        prompt_template="default",
+        raise_errors=False,
+        analysis=None,
+    ):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        for token in self.answer.split(" "):
+            yield token
+
+    async def close(self):
+        pass
+
+
+def make_router(providers, hedge_delay_ms=0):
+    router = LLMRouter(providers, preferred="groq")
+    router.hedge_delay = hedge_delay_ms / 1000
+    return router
+
+
+@pytest.mark.asyncio
+async def test_fails_over_to_next_provider():
+    groq = FakeProvider("groq", fail=True)
+    ollama = FakeProvider("ollama")
+    router = make_router({"ollama": ollama, "groq": groq})
+
+    assert await router.generate_answer("q", []) == "ollama"
+    assert groq.calls == 1
+    assert router.snapshot()["groq"]["error_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_provider():
+    groq = FakeProvider("groq", fail=True)
+    router = make_router({"groq": groq})
+    threshold = router.breakers["groq"].failure_threshold
+
+    for _ in range(threshold + 2):
+        assert await router.generate_answer("q", []) == FALLBACK_ANSWER
+
+    assert router.breakers["groq"].state == CircuitBreaker.OPEN
+    assert groq.calls == threshold
+
+
+@pytest.mark.asyncio
+async def test_hedges_slow_request():
+    groq = FakeProvider("groq", delay=1.0)
+    ollama = FakeProvider("ollama")
+    router = make_router({"groq": groq, "ollama": ollama}, hedge_delay_ms=20)
+
+    assert await router.generate_answer("q", []) == "ollama"
+    assert groq.calls == 1 and ollama.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_hedges_on_first_token():
+    groq = FakeProvider("slow groq", delay=1.0)
+    ollama = FakeProvider("fast ollama")
+    router = make_router({"groq": groq, "ollama": ollama}, hedge_delay_ms=20)
+
+    tokens = [token async for token in router.generate_answer_stream("q", [])]
+    assert tokens == ["fast", "ollama"]
+
+
+@pytest.mark.asyncio
+async def test_all_providers_failing_returns_fallback():
+    router = make_router(
+        {"groq": FakeProvider("", fail=True), "ollama": FakeProvider("", fail=True)}
+    )
+
+    assert await router.generate_answer("q", []) == FALLBACK_ANSWER
+    tokens = [token async for token in router.generate_answer_stream("q", [])]
+    assert tokens == [FALLBACK_ANSWER]
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Looking does not move the breaker
+    assert breaker.available()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.acquire()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available() and not breaker.acquire()
+
+    # A cancelled probe frees the slot; a successful one closes the breaker
+    breaker.release()
+    assert breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.acquire() and breaker.acquire()
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_frees_half_open_probe():
+    groq = FakeProvider("groq answer streams slowly")
+    router = make_router({"groq": groq})
+    router.breakers["groq"] = CircuitBreaker(failure_threshold=1, cooldown=0.0)
+    router.breakers["groq"].record_failure()
+
+    stream = router.generate_answer_stream("q", [])
+    assert await stream.__anext__() == "groq"
+    assert router.breakers["groq"].probing
+
+    # The client disconnects after the first token
+    await stream.aclose()
+    assert not router.breakers["groq"].probing
+    assert router._candidates() == ["groq"]
+
+
+@pytest.mark.asyncio
+async def test_stream_durations_stay_out_of_the_latency_window():
+    groq = FakeProvider("a long streamed answer")
+    router = make_router({"groq": groq})
+
+    tokens = [token async for token in router.generate_answer_stream("q", [])]
+
+    assert tokens == ["a", "long", "streamed", "answer"]
+    stats = router.stats["groq"]
+    assert list(stats.outcomes) == [True]
+    assert len(stats.first_token_latencies) == 1
+    assert not stats.latencies
+
+
+@pytest.mark.asyncio
+async def test_routes_to_faster_provider_and_hedges_at_its_p95():
+    groq = FakeProvider("groq", delay=0.05)
+    ollama = FakeProvider("ollama", delay=0.01)
+    router = make_router({"groq": groq, "ollama": ollama}, hedge_delay_ms=500)
+
+    # Unmeasured providers keep preference order
+    assert router._candidates() == ["groq", "ollama"]
+    assert router._hedge_delay("groq") == 0.5
+
+    router.stats["groq"].record_success(0.05)
+    router.stats["ollama"].record_success(0.03)
+    assert router._candidates() == ["ollama", "groq"]
+    assert await router.generate_answer("q", []) == "ollama"
+    assert groq.calls == 0
+
+    # Once measured, the hedge fires at the primary's own p95
+    assert router._hedge_delay("groq") == pytest.approx(0.05)
+    assert list(router.snapshot()) == ["ollama", "groq"]
@@ -0,0 +1,112 @@
+import json
+import httpx
+import pytest
+from app.core.context_compressor import ContextCompressor
+from app.core.llm_service import LLMService
+from app.core.prompt_budget import PromptBudgetManager, TokenCounter
+
+COUNTER = TokenCounter("chars")
+
+
+def make_service(handler) -> LLMService:
+    service = LLMService(compressor=ContextCompressor(counter=COUNTER))
+    service.budget = PromptBudgetManager(4096, counter=COUNTER)
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_stream_yields_ndjson_tokens():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        lines = [
+            {"message": {"content": "\n"}, "done": False},
+            {"message": {"content": "Self-attention"}, "done": False},
+            {"message": {"content": " relates positions."}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ]
+        body = "\n".join(json.dumps(line) for line in lines)
+        return httpx.Response(200, text=body)
+
+    service = make_service(handler)
+    tokens = [
+        token
+        async for token in service.generate_answer_stream(
+            query="What is self-attention?",
+            context_chunks=[{"content": "Self-attention relates positions."}],
+        )
+    ]
+
+    assert tokens == ["Self-attention", " relates positions."]
+    body = requests[0]
+    assert body["stream"] is True
+    assert body["messages"][0]["role"] == "system"
+    assert body["options"]["num_predict"] == 80  # definition intent limit
+    assert "[Source" in body["options"]["stop"]
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_stream_reports_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(500, text="boom")
+
+    service = make_service(handler)
+    tokens = [
+        token
+        async for token in service.generate_answer_stream(
+            query="Explain attention", context_chunks=[{"content": "Attention."}]
+        )
+    ]
+
+    assert tokens == ["I encountered an error generating the answer."]
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_compresses_with_the_analysis_embedding():
+    from app.utils.query_analysis import analyze_query
+
+    class RecordingCompressor(ContextCompressor):
+        def compress(self, query, chunks, token_budget=None, query_embedding=None):
+            self.query_embedding = query_embedding
+            return super().compress(query, chunks, token_budget, query_embedding)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"message": {"content": "Answer."}})
+
+    service = make_service(handler)
+    service.compressor = RecordingCompressor(counter=COUNTER)
+    analysis = analyze_query("What is self-attention?")
+    analysis.embedding = [0.1, 0.2]
+
+    await service.generate_answer(
+        query=analysis.query,
+        context_chunks=[{"content": "Self-attention relates positions."}],
+        analysis=analysis,
+    )
+
+    assert service.compressor.query_embedding == [0.1, 0.2]
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_compresses_off_the_event_loop():
+    import threading
+
+    class ThreadRecordingCompressor(ContextCompressor):
+        def compress(self, *args, **kwargs):
+            self.thread = threading.get_ident()
+            return super().compress(*args, **kwargs)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"message": {"content": "Answer."}})
+
+    service = make_service(handler)
+    service.compressor = ThreadRecordingCompressor(counter=COUNTER)
+
+    await service.generate_answer(
+        query="What is self-attention?",
+        context_chunks=[{"content": "Self-attention relates positions."}],
+    )
+
+    assert service.compressor.thread != threading.get_ident()
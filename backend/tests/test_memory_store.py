@@ -0,0 +1,256 @@
+import pytest
+from app.core.memory_store import InMemorySearchClient
+from app.models.document import Document, DocumentChunk
+from app.utils.helpers import tokenize_terms
+
+
+def make_document(document_id: str, texts, title: str = "Test Paper") -> Document:
+    chunks = []
+    for i, (text, embedding) in enumerate(texts):
+        chunks.append(
+            DocumentChunk(
+                chunk_id=f"{document_id}_chunk_{i}",
+                document_id=document_id,
+                content=text,
+                embedding=embedding,
+            )
+        )
+    return Document(
+        document_id=document_id,
+        title=title,
+        content=" ".join(text for text, _ in texts),
+        filename=f"{document_id}.pdf",
+        source="pdf",
+        file_size=100,
+        chunks=chunks,
+    )
+
+
+def unit(index: int, dims: int = 384):
+    vector = [0.0] * dims
+    vector[index] = 1.0
+    return vector
+
+
+def test_tokenize_terms():
+    assert tokenize_terms("The Transformers use attention!") == [
+        "transformer",
+        "use",
+        "attention",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bm25_and_vector_search(tmp_path):
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    await client.index_document(
+        make_document(
+            "doc1",
+            [
+                ("Self-attention relates positions of a sequence.", unit(0)),
+                ("Convolutional layers use local receptive fields.", unit(1)),
+            ],
+        )
+    )
+
+    bm25 = await client.bm25_search("attention sequence", top_k=5)
+    assert [r["chunk_id"] for r in bm25] == ["doc1_chunk_0"]
+    assert bm25[0]["score"] > 0
+
+    vector = await client.vector_search(unit(1), top_k=2)
+    assert vector[0]["chunk_id"] == "doc1_chunk_1"
+    assert vector[0]["score"] == pytest.approx(1.0)
+    assert vector[1]["score"] == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_persistence_and_delete(tmp_path):
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    await client.index_document(
+        make_document("doc1", [("attention heads", unit(0))], title="First")
+    )
+    await client.index_document(
+        make_document("doc2", [("pooling layers", unit(1))], title="Second")
+    )
+    await client.close()
+
+    reloaded = InMemorySearchClient(data_dir=str(tmp_path))
+    documents = await reloaded.list_documents(limit=10)
+    assert {d.document_id for d in documents} == {"doc1", "doc2"}
+
+    assert await reloaded.delete_document("doc1")
+    assert not await reloaded.delete_document("doc1")
+    assert await reloaded.get_document("doc1") is None
+
+    assert await reloaded.bm25_search("attention") == []
+    results = await reloaded.vector_search(unit(1), top_k=5)
+    assert [r["chunk_id"] for r in results] == ["doc2_chunk_0"]
+
+    bm25 = await reloaded.bm25_search("pooling")
+    assert [r["chunk_id"] for r in bm25] == ["doc2_chunk_0"]
+
+
+@pytest.mark.asyncio
+async def test_batch_search_matches_single_queries(tmp_path):
+    from app.core.retriever import HybridRetriever
+
+    class FakeEmbeddings:
+        _initialized = True
+
+        def embed_text(self, text):
+            return unit(0) if "attention" in text else unit(1)
+
+        def embed_batch(self, texts):
+            return [self.embed_text(text) for text in texts]
+
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    await client.index_document(
+        make_document(
+            "doc1",
+            [
+                ("Self-attention relates positions of a sequence.", unit(0)),
+                ("Convolutional layers use local receptive fields.", unit(1)),
+            ],
+        )
+    )
+    retriever = HybridRetriever(es_client=client, embedding_service=FakeEmbeddings())
+    queries = ["How does attention work?", "What are convolutional layers?"]
+
+    batch = await retriever.hybrid_search_batch(queries, [2, 1])
+    single = [
+        await retriever.hybrid_search(queries[0], top_k=2),
+        await retriever.hybrid_search(queries[1], top_k=1),
+    ]
+
+    assert [[r["chunk_id"] for r in results] for results in batch] == [
+        [r["chunk_id"] for r in results] for results in single
+    ]
+    assert batch[1][0]["chunk_id"] == "doc1_chunk_1"
+
+
+@pytest.mark.asyncio
+async def test_fusion_parameters_come_from_settings(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.core.retriever import HybridRetriever
+
+    class FakeEmbeddings:
+        _initialized = True
+
+        def embed_text(self, text):
+            return unit(1)
+
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    await client.index_document(
+        make_document(
+            "doc1",
+            [
+                ("Self-attention relates positions of a sequence.", unit(0)),
+                ("Convolutional layers use local receptive fields.", unit(1)),
+            ],
+        )
+    )
+    retriever = HybridRetriever(es_client=client, embedding_service=FakeEmbeddings())
+
+    monkeypatch.setattr(settings, "SEARCH_OVERFETCH", 3.0)
+    assert retriever._candidate_sizes(2) == (2, 6)
+
+    monkeypatch.setattr(settings, "BM25_WEIGHT", 1.0)
+    monkeypatch.setattr(settings, "VECTOR_WEIGHT", 0.0)
+    keyword = await retriever.hybrid_search("attention", top_k=1)
+    assert keyword[0]["chunk_id"] == "doc1_chunk_0"
+
+    monkeypatch.setattr(settings, "BM25_WEIGHT", 0.0)
+    monkeypatch.setattr(settings, "VECTOR_WEIGHT", 1.0)
+    semantic = await retriever.hybrid_search("attention", top_k=1)
+    assert semantic[0]["chunk_id"] == "doc1_chunk_1"
+
+
+@pytest.mark.asyncio
+async def test_filters_restrict_search_to_matching_documents(tmp_path):
+    from datetime import date
+    from app.models.schemas import SearchFilters
+
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    for document_id, authors, published, embedding in [
+        ("doc1", ["Ashish Vaswani"], "2017-06-12", unit(0)),
+        ("doc2", ["Jacob Devlin"], "2018", unit(1)),
+    ]:
+        document = make_document(
+            document_id, [(f"Attention is used in {document_id}.", embedding)]
+        )
+        document.authors = authors
+        document.publication_date = published
+        await client.index_document(document)
+
+    by_author = SearchFilters(authors=["Jacob Devlin"])
+    bm25 = await client.bm25_search("attention", top_k=5, filters=by_author)
+    assert [r["chunk_id"] for r in bm25] == ["doc2_chunk_0"]
+
+    # The unfiltered nearest chunk (doc1) is excluded before ranking
+    by_id = SearchFilters(document_ids=["doc2"])
+    vector = await client.vector_search(unit(0), top_k=5, filters=by_id)
+    assert [r["chunk_id"] for r in vector] == ["doc2_chunk_0"]
+
+    # A bare year is its first day, as in Elasticsearch
+    before_2018 = SearchFilters(published_before=date(2017, 12, 31))
+    batch = await client.vector_search_batch(
+        [unit(1), unit(1)], [5, 5], [before_2018, None]
+    )
+    assert [[r["chunk_id"] for r in results] for results in batch] == [
+        ["doc1_chunk_0"],
+        ["doc2_chunk_0", "doc1_chunk_0"],
+    ]
+
+    nothing = SearchFilters(document_ids=["doc1"], source="arxiv")
+    assert await client.bm25_search("attention", filters=nothing) == []
+    assert await client.vector_search(unit(0), filters=nothing) == []
+
+    # Row lookups follow deletes
+    await client.delete_document("doc1")
+    everything = SearchFilters(source="pdf")
+    assert [
+        r["chunk_id"] for r in await client.vector_search(unit(0), filters=everything)
+    ] == ["doc2_chunk_0"]
+
+
+@pytest.mark.asyncio
+async def test_hierarchical_search_scopes_chunks_to_nearest_documents(
+    tmp_path, monkeypatch
+):
+    from app.config import settings
+    from app.core.retriever import HybridRetriever
+
+    class FakeEmbeddings:
+        _initialized = True
+
+        def embed_text(self, text):
+            return unit(1)
+
+        def embed_batch(self, texts):
+            return [self.embed_text(text) for text in texts]
+
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    for document_id, texts in [
+        ("doc1", [("Attention in transformers.", unit(0)), ("Heads.", unit(0))]),
+        ("doc2", [("Attention in recurrent networks.", unit(1))]),
+        ("doc3", [("Convolution kernels.", unit(2))]),
+    ]:
+        await client.index_document(make_document(document_id, texts))
+
+    # Document embeddings are pooled from the chunks and persisted
+    reloaded = InMemorySearchClient(data_dir=str(tmp_path))
+    nearest = await reloaded.document_search(unit(1), top_k=2)
+    assert [d["document_id"] for d in nearest][0] == "doc2"
+    assert nearest[0]["score"] == pytest.approx(1.0)
+
+    retriever = HybridRetriever(es_client=client, embedding_service=FakeEmbeddings())
+    flat = await retriever.hybrid_search("attention", top_k=3)
+    assert "doc1_chunk_0" in [r["chunk_id"] for r in flat]
+
+    monkeypatch.setattr(settings, "RETRIEVAL_MODE", "hierarchical")
+    monkeypatch.setattr(settings, "HIERARCHICAL_TOP_DOCUMENTS", 1)
+    scoped = await retriever.hybrid_search("attention", top_k=3)
+    assert [r["chunk_id"] for r in scoped] == ["doc2_chunk_0"]
+
+    (batch,) = await retriever.hybrid_search_batch(["attention"], [3])
+    assert [r["chunk_id"] for r in batch] == ["doc2_chunk_0"]
@@ -0,0 +1,83 @@
+import pytest
+from app.core.metrics import (
+    LLM_SECONDS,
+    LLM_TTFT_SECONDS,
+    GenerationTimer,
+    MetricsRegistry,
+    current_endpoint,
+)
+
+
+def test_counter_and_histogram_render_in_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests", ["route"])
+    latency = registry.histogram("test_seconds", "Latency", buckets=(0.1, 1.0))
+
+    requests.inc(route="query")
+    requests.inc(2, route="query")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{route="query"} 3' in text
+    # Buckets are cumulative and end with +Inf
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_seconds_count 3" in text
+    assert "test_seconds_sum 5.55" in text
+
+
+def test_labels_must_match_declared_names():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test", ["cache", "result"])
+
+    with pytest.raises(ValueError):
+        counter.inc(cache="judge")
+    with pytest.raises(ValueError):
+        registry.counter("test_total", "Registered twice")
+
+
+def test_gauge_callback_is_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = {"llm": 0}
+    registry.gauge_callback(
+        "test_queue_depth",
+        "Queue depth",
+        lambda: [({"stage": stage}, value) for stage, value in depth.items()],
+    )
+
+    depth["llm"] = 4
+    assert 'test_queue_depth{stage="llm"} 4' in registry.render()
+
+
+def test_counter_callback_renders_as_counter():
+    registry = MetricsRegistry()
+    rejected = {"llm": 0}
+    registry.counter_callback(
+        "test_rejected_total",
+        "Rejected requests",
+        lambda: [({"stage": stage}, value) for stage, value in rejected.items()],
+    )
+
+    rejected["llm"] = 3
+    rendered = registry.render()
+    assert "# TYPE test_rejected_total counter" in rendered
+    assert 'test_rejected_total{stage="llm"} 3' in rendered
+
+
+def test_generation_timer_labels_endpoint_from_context():
+    labels = {"provider": "fake", "template": "summary", "endpoint": "test_stream"}
+    token = current_endpoint.set("test_stream")
+    try:
+        timer = GenerationTimer("fake", "summary")
+        timer.first_token()
+        timer.first_token()  # Only the first token counts
+        timer.finish(tokens=10)
+    finally:
+        current_endpoint.reset(token)
+
+    assert LLM_TTFT_SECONDS.count(**labels) == 1
+    assert LLM_SECONDS.count(**labels) == 1
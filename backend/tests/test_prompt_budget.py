@@ -0,0 +1,49 @@
+from app.core.prompt_budget import (
+    MIN_GENERATION_TOKENS,
+    PromptBudgetManager,
+    TokenCounter,
+)
+
+COUNTER = TokenCounter("chars")
+
+
+def test_context_budget_fits_window():
+    budget = PromptBudgetManager(4096, counter=COUNTER)
+    plan = budget.plan("default", "What is self-attention?", max_tokens=150)
+
+    reserved = budget.template_tokens("default") + budget.margin + 150
+    assert plan.max_tokens == 150
+    assert 0 < plan.context_budget <= 4096 - reserved
+
+
+def test_small_window_shortens_generation_first():
+    budget = PromptBudgetManager(3072, counter=COUNTER)
+    plan = budget.plan("default", "What is self-attention?", max_tokens=400)
+
+    assert plan.max_tokens < 400
+    assert plan.max_tokens >= MIN_GENERATION_TOKENS
+
+
+def test_fit_max_tokens_respects_prompt_size():
+    budget = PromptBudgetManager(4096, counter=COUNTER)
+    plan = budget.plan("default", "query", max_tokens=300)
+
+    assert budget.fit_max_tokens(plan, prompt_tokens=1000) == 300
+    assert budget.fit_max_tokens(plan, prompt_tokens=4050) == MIN_GENERATION_TOKENS
+
+
+def test_unknown_model_uses_default_window():
+    assert (
+        PromptBudgetManager.for_model("llama-3.1-8b-instant").context_window == 131072
+    )
+    assert PromptBudgetManager.for_model("unknown-model").context_window == 8192
+
+
+def test_templates_keep_static_instructions_in_system_prompt():
+    from app.core.prompt_templates import PROMPT_TEMPLATES, get_system_prompt
+
+    system_prompt = get_system_prompt()
+    assert "ANTI-HALLUCINATION RULES" in system_prompt
+    for template in PROMPT_TEMPLATES.values():
+        assert "ANTI-HALLUCINATION RULES" not in template
+        assert template.format(context="C", query="Q").startswith("Context")
@@ -0,0 +1,94 @@
+import numpy as np
+from app.utils.intent_detector import detect_intent
+from app.utils.query_analysis import IntentCentroids, analyze_query, resolve_template
+from app.utils.validators import AnswerValidator
+
+
+def test_keywords_match_whole_words_only():
+    # "vs" inside "obvious" must not route to the comparison template
+    assert detect_intent("Is the obvious answer correct?") == "default"
+    assert detect_intent("BERT vs GPT") == "comparative"
+
+
+def test_phrases_match_plurals():
+    analysis = analyze_query("What are the differences between BERT and GPT?")
+    assert analysis.template == "comparative"
+    assert analysis.is_comparison
+
+
+def test_overlapping_phrases_of_different_signals_all_match():
+    # "list the authors" (author) overlaps "authors of" (author_list)
+    for query in [
+        "List the authors of this paper",
+        "Mention the authors of BERT",
+        "name of the authors of this paper",
+    ]:
+        analysis = analyze_query(query)
+        assert analysis.template == "authors", query
+        assert analysis.is_author_list, query
+
+    # The authors template asks for a table, so validation must accept it
+    table = "| Author | Affiliation |\n|--------|-------------|\n| A. Smith | MIT |"
+    result = AnswerValidator().structural.validate_table_usage(
+        table, "List the authors of this paper"
+    )
+    assert result.passed
+
+
+def test_one_analysis_serves_every_consumer():
+    analysis = analyze_query("Why do the authors argue for a bar?")
+    assert analysis.template == "authors"
+    assert analysis.retrieval_intent == "explanation"
+    assert analysis.generation_intent == "explanation"
+    assert analysis.is_authors_argue
+    assert not analysis.is_author_list
+
+    analysis = analyze_query("Does the model use dropout?")
+    assert analysis.is_verification
+    assert analysis.retrieval_intent == "general"
+
+
+class FakeEmbeddings:
+    """Maps each word to a fixed axis so related examples share a direction"""
+
+    AXES = {"differ": 0, "wrote": 1, "gist": 2, "rate": 3}
+
+    def embed_text(self, text):
+        vector = np.zeros(4, dtype=np.float32)
+        for word, axis in self.AXES.items():
+            if word in text.lower():
+                vector[axis] = 1.0
+        return vector
+
+    def embed_batch(self, texts):
+        return np.stack([self.embed_text(text) for text in texts])
+
+
+def test_centroids_fill_in_when_no_keyword_matches():
+    embeddings = FakeEmbeddings()
+    centroids = IntentCentroids(
+        embeddings,
+        examples={
+            "comparative": ["How do they differ?"],
+            "authors": ["Who wrote it?"],
+            "default": ["What rate was used?"],
+        },
+        min_similarity=0.5,
+    )
+
+    analysis = analyze_query("How does A differ from B?")
+    assert analysis.template == "default"
+
+    analysis.embedding = embeddings.embed_text(analysis.query)
+    assert resolve_template("default", analysis, centroids) == "comparative"
+
+    # Explicit templates and keyword matches are never overridden
+    assert resolve_template("summary", analysis, centroids) == "summary"
+    analysis = analyze_query("Who are the authors?")
+    analysis.embedding = embeddings.embed_text("What rate was used?")
+    assert resolve_template("default", analysis, centroids) == "authors"
+
+    # Nothing close enough: stay on the default template
+    analysis = analyze_query("Tell me something")
+    analysis.embedding = embeddings.embed_text("gist")
+    assert resolve_template("default", analysis, centroids) == "default"
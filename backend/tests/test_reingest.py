@@ -0,0 +1,173 @@
+import pytest
+from app.core.admission import AdmissionController
+from app.core.elasticsearch_client import ElasticsearchClient
+from app.core.memory_store import InMemorySearchClient
+from app.core.reingest import diff_chunks, reingest_document
+from app.models.document import ChunkDiff, Document, DocumentChunk
+from app.utils.helpers import generate_chunk_id, hash_chunk_content
+
+
+def make_document(texts, document_id: str = "doc1", embed: bool = True) -> Document:
+    chunks = [
+        DocumentChunk(
+            chunk_id=generate_chunk_id(document_id, i),
+            document_id=document_id,
+            content=text,
+            embedding=[1.0] + [0.0] * 383 if embed else None,
+            content_hash=hash_chunk_content(text),
+        )
+        for i, text in enumerate(texts)
+    ]
+    return Document(
+        document_id=document_id,
+        title="Test Paper",
+        content=" ".join(texts),
+        filename=f"{document_id}.pdf",
+        source="pdf",
+        chunks=chunks,
+    )
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_batch(self, texts):
+        self.embedded.extend(texts)
+        return [[0.0, 1.0] + [0.0] * 382 for _ in texts]
+
+
+def test_diff_keeps_unchanged_chunks_and_renumbers_new_ones():
+    indexed = {
+        "doc1_chunk_0": hash_chunk_content("Intro text."),
+        "doc1_chunk_1": hash_chunk_content("Old results."),
+        "doc1_chunk_2": hash_chunk_content("Conclusion."),
+    }
+    new = make_document(["Intro  text.", "New results.", "Conclusion."], embed=False)
+
+    diff = diff_chunks("doc1", new.chunks, indexed)
+
+    assert diff.kept == {"doc1_chunk_0": new.chunks[0], "doc1_chunk_2": new.chunks[2]}
+    assert diff.removed == ["doc1_chunk_1"]
+    # Position 1 is taken by the removed chunk, so the new one gets a fresh id
+    assert [chunk.chunk_id for chunk in diff.added] == ["doc1_chunk_3"]
+
+
+@pytest.mark.asyncio
+async def test_reingest_embeds_only_changed_chunks(tmp_path):
+    client = InMemorySearchClient(data_dir=str(tmp_path))
+    await client.index_document(
+        make_document(["Self-attention relates positions.", "Results on WMT."])
+    )
+    embeddings = CountingEmbeddings()
+
+    version_2 = make_document(
+        ["Self-attention relates positions.", "Results on WMT and IWSLT."],
+        embed=False,
+    )
+    # The kept chunk moved to a later page of a retitled paper
+    version_2.title = "Test Paper v2"
+    version_2.chunks[0].page_number = 3
+    admission = AdmissionController({"embedding": 1})
+    diff = await reingest_document(client, embeddings, version_2, admission)
+
+    assert embeddings.embedded == ["Results on WMT and IWSLT."]
+    assert admission.stage("embedding").admitted == 1
+    assert list(diff.kept) == ["doc1_chunk_0"]
+    assert diff.removed == ["doc1_chunk_1"]
+
+    hashes = await client.get_chunk_hashes("doc1")
+    assert sorted(hashes) == ["doc1_chunk_0", "doc1_chunk_2"]
+    assert (await client.get_document("doc1")).num_chunks == 2
+
+    # The document embedding pools the kept and the new chunk
+    (document,) = await client.document_search([1.0, 1.0] + [0.0] * 382, top_k=1)
+    assert document["score"] == pytest.approx(1.0)
+
+    # The kept chunk still has its original embedding
+    (kept,) = await client.get_chunks(["doc1_chunk_0"], include_embedding=True)
+    assert kept["embedding"][0] == pytest.approx(1.0)
+    assert (kept["title"], kept["page_number"]) == ("Test Paper v2", 3)
+
+    hits = await client.bm25_search("IWSLT", top_k=5)
+    assert [hit["chunk_id"] for hit in hits] == ["doc1_chunk_2"]
+
+    # Survives a reload from disk
+    reloaded = InMemorySearchClient(data_dir=str(tmp_path))
+    assert await reloaded.get_chunk_hashes("doc1") == hashes
+    (kept,) = await reloaded.get_chunks(["doc1_chunk_0"])
+    assert kept["page_number"] == 3
+
+
+@pytest.mark.asyncio
+async def test_elasticsearch_update_is_one_bulk_request():
+    class FakeElasticsearch:
+        def __init__(self):
+            self.calls = []
+
+        async def bulk(self, operations, refresh):
+            self.calls.append(operations)
+            return {"errors": False, "items": []}
+
+    client = ElasticsearchClient()
+    client.client = FakeElasticsearch()
+    client._initialized = True
+
+    document = make_document(["Kept.", "Added."])
+    document.chunks[0].page_number = 2
+    diff = ChunkDiff(
+        added=document.chunks[1:],
+        kept={"doc1_chunk_0": document.chunks[0]},
+        removed=["doc1_chunk_7"],
+    )
+    await client.update_document(document, diff)
+
+    (operations,) = client.client.calls
+    assert operations[0] == {"index": {"_index": client.index_name, "_id": "doc1"}}
+    assert operations[2] == {
+        "index": {"_index": client.chunk_index_name, "_id": "doc1_chunk_1"}
+    }
+    assert operations[3]["content_hash"] == hash_chunk_content("Added.")
+    # Kept chunks get the title, their new position and the filter fields
+    assert operations[4:] == [
+        {"update": {"_index": client.chunk_index_name, "_id": "doc1_chunk_0"}},
+        {
+            "doc": {
+                "title": "Test Paper",
+                "page_number": 2,
+                "section_type": None,
+                "authors": None,
+                "source": "pdf",
+                "publication_date": None,
+            }
+        },
+        {"delete": {"_index": client.chunk_index_name, "_id": "doc1_chunk_7"}},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_filtered_search_warns_once_about_unbackfilled_chunks(caplog):
+    from app.models.schemas import SearchFilters
+
+    class FakeElasticsearch:
+        def __init__(self):
+            self.counts = 0
+
+        async def count(self, index, query):
+            self.counts += 1
+            return {"count": 3}
+
+    client = ElasticsearchClient()
+    client.client = FakeElasticsearch()
+
+    await client._warn_if_unfilterable([SearchFilters(document_ids=["doc1"])])
+    assert client.client.counts == 0
+
+    await client._warn_if_unfilterable([SearchFilters(source="arxiv")])
+    await client._warn_if_unfilterable([SearchFilters(source="arxiv")])
+    assert client.client.counts == 1
+    assert "3 chunks predate the copied filter fields" in caplog.text
+
+    client.generation += 1
+    await client._warn_if_unfilterable([None, SearchFilters(authors=["Vaswani"])])
+    assert client.client.counts == 2
@@ -1,4 +1,7 @@
 import pytest
+from datetime import date
+from app.core.elasticsearch_client import ElasticsearchClient
+from app.models.schemas import SearchFilters
 from app.utils.helpers import (
     reciprocal_rank_fusion,
     generate_document_id,
@@ -39,3 +42,48 @@ def test_reciprocal_rank_fusion_empty():
     )
 
     assert len(fused) == 0
+
+
+def test_elasticsearch_filters_are_pushed_into_both_searches():
+    client = ElasticsearchClient()
+    filters = SearchFilters(
+        document_ids=["doc1"], source="arxiv", published_after=date(2017, 1, 1)
+    )
+    clauses = [
+        {"terms": {"document_id": ["doc1"]}},
+        {"term": {"source": "arxiv"}},
+        {"range": {"publication_date": {"gte": "2017-01-01"}}},
+    ]
+
+    bm25 = client._bm25_query("attention", 10, filters)
+    assert bm25["query"]["bool"]["filter"] == clauses
+    assert client._bm25_query("attention", 10)["query"] == {
+        "match": {"content": {"query": "attention", "operator": "or"}}
+    }
+
+    knn = client._knn_query([0.0] * 384, 10, filters)["knn"]
+    assert knn["filter"] == clauses
+    assert "filter" not in client._knn_query([0.0] * 384, 10, SearchFilters())["knn"]
+
+
+@pytest.mark.asyncio
+async def test_reranker_timeout_shrinks_next_batch():
+    import time
+    import numpy as np
+    from app.core.reranker import CrossEncoderReranker
+
+    class SlowModel:
+        def predict(self, pairs, **kwargs):
+            time.sleep(0.1)
+            return np.zeros(len(pairs))
+
+    reranker = CrossEncoderReranker()
+    reranker.model = SlowModel()
+    reranker._initialized = True
+    reranker.budget = 0.02
+
+    chunks = [{"chunk_id": str(i), "content": "text"} for i in range(16)]
+    kept = await reranker.rerank("query", chunks, top_n=3)
+
+    assert [c["chunk_id"] for c in kept] == ["0", "1", "2"]
+    assert reranker._affordable_candidates(16) == 8
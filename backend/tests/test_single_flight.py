@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from app.core.single_flight import SingleFlight, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What is  Attention? ") == "what is attention"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    runs = 0
+
+    async def pipeline():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    results = await asyncio.gather(*(flight.run("key", pipeline) for _ in range(5)))
+
+    assert results == ["answer"] * 5
+    assert runs == 1
+    assert flight.coalesced == 4
+
+    # Finished runs are not cached
+    await flight.run("key", pipeline)
+    assert runs == 2
+
+
+@pytest.mark.asyncio
+async def test_late_stream_subscriber_replays_tokens():
+    flight = SingleFlight()
+    runs = 0
+    second_token = asyncio.Event()
+
+    async def tokens():
+        nonlocal runs
+        runs += 1
+        yield "a"
+        yield "b"
+        second_token.set()
+        await asyncio.sleep(0.02)
+        yield "c"
+
+    async def collect():
+        return [token async for token in flight.stream("key", tokens)]
+
+    leader = asyncio.create_task(collect())
+    await second_token.wait()
+    follower = asyncio.create_task(collect())
+
+    assert await leader == ["a", "b", "c"]
+    assert await follower == ["a", "b", "c"]
+    assert runs == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_is_forgotten_after_every_reader_left():
+    flight = SingleFlight()
+    finished = asyncio.Event()
+
+    async def tokens():
+        yield "a"
+        await asyncio.sleep(0.02)
+        yield "b"
+        finished.set()
+
+    stream = flight.stream("key", tokens)
+    assert await stream.__anext__() == "a"
+    await stream.aclose()
+    assert "key" in flight._streams
+
+    await finished.wait()
+    await asyncio.sleep(0)
+    assert flight._streams == {}
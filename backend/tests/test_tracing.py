@@ -0,0 +1,93 @@
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.tracing import JsonlExporter, TraceMiddleware, Tracer, tracer
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_awaits_and_threads():
+    local = Tracer()
+
+    def encode():
+        with local.span("encode"):
+            pass
+
+    with local.span("request"):
+        with local.span("search", kind="bm25"):
+            await asyncio.sleep(0)
+        await asyncio.to_thread(encode)
+        stream_span = local.start_span("stream")
+        stream_span.finish()
+
+    (trace,) = local.recent()
+    spans = {span["name"]: span for span in trace.to_dict()["spans"]}
+    root_id = spans["request"]["span_id"]
+
+    assert spans["request"]["parent_id"] is None
+    assert spans["search"]["parent_id"] == root_id
+    assert spans["search"]["attributes"] == {"kind": "bm25"}
+    assert spans["encode"]["parent_id"] == root_id
+    assert spans["stream"]["parent_id"] == root_id
+
+
+def test_root_span_starts_a_separate_trace():
+    local = Tracer()
+
+    with local.span("request"):
+        with local.span("validation", root=True):
+            pass
+
+    assert sorted(trace.root.name for trace in local.recent()) == [
+        "request",
+        "validation",
+    ]
+
+
+def test_errors_are_recorded_on_the_span():
+    local = Tracer()
+
+    with pytest.raises(RuntimeError):
+        with local.span("request"):
+            raise RuntimeError("search down")
+
+    (trace,) = local.recent()
+    assert trace.root.error == "RuntimeError: search down"
+    assert trace.waterfall()[1].endswith("!")
+
+
+def test_recent_filters_by_duration_and_exports_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    local = Tracer(exporters=[JsonlExporter(str(path))])
+
+    with local.span("fast"):
+        pass
+
+    assert local.recent(min_duration_ms=1000) == []
+
+    (line,) = path.read_text().splitlines()
+    assert json.loads(line)["name"] == "fast"
+
+
+def test_middleware_traces_api_requests_only():
+    app = FastAPI()
+    app.add_middleware(TraceMiddleware, path_prefix="/api")
+
+    @app.get("/api/ping")
+    async def ping():
+        with tracer.span("handler"):
+            return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/api/ping")
+
+    latest = max(tracer.recent(limit=1000), key=lambda trace: trace.started_at)
+    names = [span["name"] for span in latest.to_dict()["spans"]]
+    assert names == ["GET /api/ping", "handler"]
+    assert latest.root.attributes["status"] == 200
@@ -0,0 +1,42 @@
+import threading
+from app.core.validation_dispatcher import ValidationDispatcher
+
+ANSWER = "The model uses self-attention to relate positions in a sequence."
+
+
+def test_results_reach_sink_off_thread():
+    seen = []
+    done = threading.Event()
+
+    def sink(results, question):
+        seen.append((threading.current_thread().name, question, results))
+        done.set()
+
+    dispatcher = ValidationDispatcher(workers=1, sample_rate=1.0, sink=sink)
+    assert dispatcher.submit(ANSWER, "How is attention used?", [ANSWER])
+    assert done.wait(5)
+    dispatcher.shutdown()
+
+    thread_name, question, results = seen[0]
+    assert thread_name.startswith("validation")
+    assert question == "How is attention used?"
+    assert "evidence_coverage" in results
+    assert dispatcher.stats()["completed"] == 1
+
+
+def test_sampling_and_queue_bound():
+    release = threading.Event()
+    dispatcher = ValidationDispatcher(
+        workers=1, sample_rate=1.0, max_pending=1, sink=lambda r, q: release.wait(5)
+    )
+
+    assert dispatcher.submit(ANSWER, "q", [ANSWER])
+    assert not dispatcher.submit(ANSWER, "q", [ANSWER])
+    release.set()
+    dispatcher.shutdown()
+    assert dispatcher.stats()["dropped"] == 1
+
+    sampled = ValidationDispatcher(workers=1, sample_rate=0.0)
+    assert not sampled.submit(ANSWER, "q", [ANSWER])
+    assert sampled.stats()["sampled_out"] == 1
+    sampled.shutdown()
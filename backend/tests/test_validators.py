@@ -185,6 +185,46 @@ def test_evidence_coverage():
     assert not result.passed
 
 
+def test_factual_support_uses_shared_context_index():
+    """Test claim support lookups against one prebuilt context index"""
+    from app.utils.validators import ContextIndex
+
+    validator = AnswerValidator()
+    context = [
+        "The Transformer relies on attention mechanisms and residual connections."
+    ]
+    index = ContextIndex(context)
+
+    # "mechanism" is supported by "mechanisms" in the context
+    result = validator.evidence.validate_factual_claims_have_support(
+        answer="The architecture uses an attention mechanism throughout.",
+        context_chunks=context,
+        index=index,
+    )
+    assert result.passed
+
+    result = validator.evidence.validate_factual_claims_have_support(
+        answer="The network uses recurrent gating for memory retention.",
+        context_chunks=context,
+        index=index,
+    )
+    assert not result.passed
+
+
+def test_context_index_is_linear_in_long_tokens():
+    """Test a huge extracted token does not index every prefix"""
+    from app.utils.validators import MAX_SUPPORT_PREFIX_LENGTH, ContextIndex
+
+    token = "aq" * 50_000
+    index = ContextIndex([f"see https {token} and normalization layers"])
+
+    assert max(len(term) for term in index.support_terms) == MAX_SUPPORT_PREFIX_LENGTH
+    assert index.supports("normaliz")
+    assert index.supports("aq" * 20)
+    assert index.supports(token)
+    assert not index.supports("aq" * 20 + "x")
+
+
 if __name__ == "__main__":
     # Run regression tests manually
     print("Running Regression Test Suite...\n")